@@ -0,0 +1,72 @@
+"""Extraction pool: fairness between guilds and isolation from rendering.
+
+One guild floods the pool with slow extractions (a playlist-sized burst),
+then a second guild asks for one song and a collage render is started with
+asyncio.to_thread. Compared with sending everything to the loop's default
+executor, as /music play used to.
+
+Run from the repo root: python -m benchmarks.bench_extraction
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.music import ExtractionPool
+
+BURST = 40
+EXTRACT_SECONDS = 0.05  # Stands in for a yt-dlp round-trip (blocks its thread)
+RENDER_SECONDS = 0.02
+WORKERS = 4
+
+
+def extract(query):
+    time.sleep(EXTRACT_SECONDS)
+    return query
+
+
+def render():
+    time.sleep(RENDER_SECONDS)
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def scenario(submit):
+    burst = [asyncio.ensure_future(submit(1, f"song {n}")) for n in range(BURST)]
+    await asyncio.sleep(0)
+    other, collage = await asyncio.gather(
+        timed(submit(2, "one song")), timed(asyncio.to_thread(render))
+    )
+    await asyncio.gather(*burst)
+    return other, collage
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    # Default pool as small as the extraction pool, so the two are comparable
+    loop.set_default_executor(ThreadPoolExecutor(WORKERS))
+
+    async def shared(guild_id, query):
+        return await loop.run_in_executor(None, extract, query)
+
+    pool = ExtractionPool(workers=WORKERS)
+
+    async def pooled(guild_id, query):
+        return await pool.run(guild_id, extract, query)
+
+    print(
+        f"{BURST} queued by guild 1, {WORKERS} workers, {EXTRACT_SECONDS * 1000:.0f}ms each"
+    )
+    print("                   guild 2's song   collage render")
+    for name, submit in (("default executor", shared), ("extraction pool", pooled)):
+        other, collage = await scenario(submit)
+        print(f"{name:<18} {other * 1000:>11.0f}ms   {collage * 1000:>11.0f}ms")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
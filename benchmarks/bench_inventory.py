@@ -0,0 +1,154 @@
+"""Legacy one-row-per-catch collection vs inventory stacks for a heavy user.
+
+Release and evolve by name are the two paths that consume duplicates.
+
+Run from the repo root: python -m benchmarks.bench_inventory
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import aiosqlite
+
+from utils.database import initialize_database
+from utils.inventory import add_pokemon, take_units
+
+CATCHES = 20_000
+SPECIES = 300
+RELEASES = 200  # /pokemon release <name> 5, repeated
+EVOLVES = 200  # /pokemon evolve <name>: 3 duplicates in, 1 evolution out
+EVOLUTION_COST = 3
+USER = "bench-user"
+
+
+def catches():
+    rng = random.Random(42)
+    return [(rng.randint(1, SPECIES), rng.random() < 0.05) for _ in range(CATCHES)]
+
+
+async def build(path, stacked):
+    await initialize_database(path)
+    db = await aiosqlite.connect(path)
+    rows = [(USER, p, f"Mon{p}", s, False) for p, s in catches()]
+    if stacked:
+        await add_pokemon(db, [row + (1,) for row in rows])
+    else:
+        await db.executemany(
+            "INSERT INTO collection (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+    await db.commit()
+    await db.execute("VACUUM")
+    return db
+
+
+async def stats(db):
+    async with db.execute("SELECT count(*) FROM collection") as cursor:
+        (rows,) = await cursor.fetchone()
+    async with db.execute("PRAGMA page_count") as cursor:
+        (pages,) = await cursor.fetchone()
+    async with db.execute("PRAGMA page_size") as cursor:
+        (page_size,) = await cursor.fetchone()
+    start = time.perf_counter()
+    async with db.execute(
+        "SELECT id, pokemon_id, pokemon_name, is_shiny, nickname, quantity FROM collection WHERE user_uuid = ? ORDER BY id DESC",
+        (USER,),
+    ) as cursor:
+        await cursor.fetchall()
+    box_ms = (time.perf_counter() - start) * 1000
+    return rows, pages * page_size / 1024, box_ms
+
+
+async def release_legacy(db, name):
+    await db.execute(
+        "DELETE FROM collection WHERE id IN (SELECT id FROM collection WHERE user_uuid = ? AND pokemon_name = ? LIMIT ?)",
+        (USER, name, 5),
+    )
+    await db.commit()
+
+
+async def release_stacked(db, name):
+    await take_units(db, USER, name, 5)
+    await db.commit()
+
+
+async def evolve_legacy(db, name, next_id):
+    # The pre-stack /pokemon evolve: pick 3 rows, delete them, insert the evolution
+    async with db.execute(
+        "SELECT id, is_shiny, is_legendary FROM collection WHERE user_uuid = ? AND pokemon_name = ? ORDER BY is_shiny ASC LIMIT ?",
+        (USER, name, EVOLUTION_COST),
+    ) as cursor:
+        duplicates = await cursor.fetchall()
+    if len(duplicates) < EVOLUTION_COST:
+        return
+    placeholders = ",".join("?" * len(duplicates))
+    await db.execute(
+        f"DELETE FROM collection WHERE id IN ({placeholders})",
+        tuple(d[0] for d in duplicates),
+    )
+    await db.execute(
+        "INSERT INTO collection (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary) VALUES (?, ?, ?, ?, ?)",
+        (
+            USER,
+            next_id,
+            f"Mon{next_id}",
+            any(d[1] for d in duplicates),
+            any(d[2] for d in duplicates),
+        ),
+    )
+    await db.commit()
+
+
+async def evolve_stacked(db, name, next_id):
+    duplicates, _ = await take_units(db, USER, name, EVOLUTION_COST)
+    if duplicates:
+        await add_pokemon(
+            db,
+            [
+                (
+                    USER,
+                    next_id,
+                    f"Mon{next_id}",
+                    any(d[1] for d in duplicates),
+                    any(d[2] for d in duplicates),
+                    1,
+                )
+            ],
+        )
+    await db.commit()
+
+
+async def timed(db, count, action):
+    """Mean ms of `action(db, name, next_id)` over `count` random species."""
+    picks = [random.Random(i).randint(1, SPECIES) for i in range(count)]
+    start = time.perf_counter()
+    for p in picks:
+        await action(db, f"Mon{p}", p % SPECIES + 1)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+async def run(label, stacked, release, evolve):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await build(os.path.join(tmp, "bench.db"), stacked)
+        rows, size_kb, box_ms = await stats(db)
+        release_ms = await timed(db, RELEASES, lambda db, name, _: release(db, name))
+        evolve_ms = await timed(db, EVOLVES, evolve)
+        await db.close()
+
+    print(
+        f"{label:<8} {rows:>7,} rows  {size_kb:>8,.0f} KiB  "
+        f"box {box_ms:6.2f} ms  release {release_ms:5.2f} ms  evolve {evolve_ms:5.2f} ms"
+    )
+
+
+async def main():
+    print(f"{CATCHES:,} catches over {SPECIES} species")
+    await run("legacy", False, release_legacy, evolve_legacy)
+    await run("stacked", True, release_stacked, evolve_stacked)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Order book matching throughput with 100k open orders.
+
+Run from the repo root: python -m benchmarks.bench_market
+"""
+
+import random
+import time
+
+from utils.market import BUY, SELL, Order, OrderBook
+
+OPEN_ORDERS = 100_000
+INCOMING = 200_000
+SPECIES = 1025
+USERS = 5_000
+
+
+def main():
+    rng = random.Random(7)
+    book = OrderBook()
+    next_id = 1
+
+    # Resting book: bids at 50-99, asks at 100-149, so nothing crosses yet
+    start = time.perf_counter()
+    for _ in range(OPEN_ORDERS):
+        side = rng.choice((BUY, SELL))
+        price = rng.randint(50, 99) if side == BUY else rng.randint(100, 149)
+        book.submit(
+            Order(
+                next_id,
+                f"user-{rng.randrange(USERS)}",
+                side,
+                rng.randint(1, SPECIES),
+                rng.random() < 0.05,
+                price,
+                rng.randint(1, 5),
+            )
+        )
+        next_id += 1
+    build = time.perf_counter() - start
+
+    # Incoming orders, about half of them cross the spread
+    incoming = []
+    for _ in range(INCOMING):
+        side = rng.choice((BUY, SELL))
+        price = rng.randint(80, 169) if side == BUY else rng.randint(30, 119)
+        incoming.append(
+            Order(
+                next_id,
+                f"user-{rng.randrange(USERS)}",
+                side,
+                rng.randint(1, SPECIES),
+                rng.random() < 0.05,
+                price,
+                rng.randint(1, 5),
+            )
+        )
+        next_id += 1
+
+    fills = 0
+    start = time.perf_counter()
+    for order in incoming:
+        fills += len(book.submit(order))
+    elapsed = time.perf_counter() - start
+
+    print(f"Built a {OPEN_ORDERS:,}-order book in {build:.2f}s")
+    print(
+        f"{INCOMING:,} orders in {elapsed:.2f}s -> {INCOMING / elapsed:,.0f} orders/s, "
+        f"{fills:,} fills ({fills / elapsed:,.0f} fills/s), {len(book):,} still open"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Ranked queue: join and sweep cost as the queue grows.
+
+Compares the sorted queue against scanning every waiting player for the
+closest rating. Run from the repo root: python -m benchmarks.bench_matchmaking
+"""
+
+import random
+import time
+
+from utils.ranked import MatchQueue
+
+SIZES = [100, 1_000, 10_000]
+JOINS = 2_000
+
+
+def naive_join(waiting, rating, now):
+    """Closest waiting player within their window, by scanning everyone."""
+    best = None
+    for other in waiting:
+        gap = abs(other[0] - rating)
+        if gap <= 50 + 5 * (now - other[1]) and (
+            best is None or gap < abs(best[0] - rating)
+        ):
+            best = other
+    return best
+
+
+def main():
+    rng = random.Random(5)
+    print("queued    sorted join   naive join   sweep")
+    for size in SIZES:
+        # Spread ratings wide so few joins match and the queue stays full
+        ratings = [rng.uniform(0, 100_000) for _ in range(size + JOINS)]
+        queue = MatchQueue()
+        for i, rating in enumerate(ratings[:size]):
+            queue.join((i, "", ""), rating, 0.0)
+
+        start = time.perf_counter()
+        for i, rating in enumerate(ratings[size:], start=size):
+            queue.join((i, "", ""), rating, 0.0)
+        sorted_us = (time.perf_counter() - start) / JOINS * 1e6
+
+        waiting = [(rating, 0.0) for rating in ratings[:size]]
+        start = time.perf_counter()
+        for rating in ratings[size:]:
+            naive_join(waiting, rating, 0.0)
+        naive_us = (time.perf_counter() - start) / JOINS * 1e6
+
+        start = time.perf_counter()
+        queue.pair(0.0)
+        sweep_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"{size:>6,}   {sorted_us:>8.1f} µs   {naive_us:>8.1f} µs   {sweep_ms:>5.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
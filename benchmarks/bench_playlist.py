@@ -0,0 +1,93 @@
+"""Queueing a 500-track playlist: flat listing vs resolving every entry.
+
+A flat extraction is one yt-dlp request that lists the whole playlist; each
+entry is then queued as a title + page URL and resolved just before it plays.
+Resolving everything up front costs one request per entry (spread over the
+extraction pool) and holds a signed stream URL per queued song, most of which
+expire before they'd play. Every request takes ROUND_TRIP seconds here.
+
+Run from the repo root: python -m benchmarks.bench_playlist
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+from utils.music import EXTRACT_WORKERS, ExtractionPool, GuildPlayer, placeholders
+
+TRACKS = 500
+ROUND_TRIP = 0.02
+STREAM_URL = (
+    "https://rr3---sn-4g5e6nsz.googlevideo.com/videoplayback?expire=1760000000"
+    "&ei=" + "x" * 40 + "&ip=203.0.113.7&id=o-" + "A" * 44 + "&itag=251"
+    "&source=youtube&requiressl=yes&mime=audio%2Fwebm&dur=213.441"
+    "&sparams=expire%2Cei%2Cip%2Cid%2Citag%2Csource%2Crequiressl"
+    "&sig=" + "B" * 120 + "&lsig=" + "C" * 100
+)
+
+
+def page(n: int) -> str:
+    return f"https://www.youtube.com/watch?v={n:011d}"
+
+
+def flat_listing(url=None, delay=ROUND_TRIP):
+    time.sleep(delay)
+    entries = [{"title": f"Track {n}", "url": page(n)} for n in range(TRACKS)]
+    return "Playlist", placeholders(entries)
+
+
+def resolve_one(url, delay=ROUND_TRIP):
+    time.sleep(delay)
+    n = int(url.rsplit("=", 1)[1])
+    return {
+        "source": f"{STREAM_URL}&n={n}",
+        "title": f"Track {n}",
+        "url": url,
+        "expires_at": 1760000000.0 - 300,
+    }
+
+
+class IdleVoice:
+    def play(self, source, after):
+        pass
+
+
+async def queued_bytes(make) -> float:
+    """Bytes per entry held by a player queue of make()'s songs."""
+    tracemalloc.start()
+    player = GuildPlayer(1, asyncio.get_running_loop(), lambda song: song)
+    player.voice = IdleVoice()
+    await player.enqueue_many(make())
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / TRACKS
+
+
+async def main():
+    pool = ExtractionPool()
+
+    start = time.perf_counter()
+    _, lazy = await pool.run(1, flat_listing, "playlist")
+    lazy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.run(1, resolve_one, song["url"]) for song in lazy))
+    eager_seconds = time.perf_counter() - start
+    pool.shutdown()
+
+    flat = await queued_bytes(lambda: flat_listing(delay=0)[1])
+    resolved = await queued_bytes(
+        lambda: [resolve_one(page(n), delay=0) for n in range(TRACKS)]
+    )
+
+    print(
+        f"{TRACKS} tracks, {ROUND_TRIP * 1000:.0f}ms per request, "
+        f"{EXTRACT_WORKERS} workers"
+    )
+    print("            queued in   requests   bytes/entry")
+    print(f"flat        {lazy_seconds:>8.2f}s {1:>10} {flat:>13,.0f}")
+    print(f"resolved    {eager_seconds:>8.2f}s {TRACKS:>10} {resolved:>13,.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
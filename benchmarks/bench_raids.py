@@ -0,0 +1,87 @@
+"""Raid damage aggregation: in-memory + batched flushes vs a write per click.
+
+Run from the repo root: python -m benchmarks.bench_raids
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import aiosqlite
+
+from utils.database import initialize_database
+from utils.raids import Raid
+
+CLICKS = 100_000
+PLAYERS = 500
+FLUSH_EVERY = 2_000  # Clicks per flush (~10s at 200 clicks/s)
+PER_CLICK_SAMPLE = 5_000  # The per-click path is too slow to run in full
+
+
+UPSERT = """
+    INSERT INTO raid_damage (raid_id, user_uuid, damage, attacks)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(raid_id, user_uuid) DO UPDATE SET
+        damage = damage + excluded.damage,
+        attacks = attacks + excluded.attacks
+"""
+
+
+async def main():
+    rng = random.Random(5)
+    clicks = [
+        (f"user-{rng.randrange(PLAYERS)}", rng.randint(20, 200)) for _ in range(CLICKS)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "raids.db")
+        await initialize_database(path)
+        async with aiosqlite.connect(path) as db:
+            await db.execute(
+                "INSERT INTO raids (pokemon_id, max_hp, hp) VALUES (150, ?, ?)",
+                (10**9, 10**9),
+            )
+            await db.commit()
+
+            # Aggregated: attack() in memory, one transaction per flush
+            raid = Raid(1, 150, "Mewtwo", {}, 10**9, 0)
+            start = time.perf_counter()
+            for i, (user, damage) in enumerate(clicks, 1):
+                raid.attack(user, damage)
+                if i % FLUSH_EVERY == 0:
+                    await db.executemany(
+                        UPSERT, [(1, *row) for row in raid.take_unflushed()]
+                    )
+                    await db.execute("UPDATE raids SET hp = ? WHERE id = 1", (raid.hp,))
+                    await db.commit()
+            batched = time.perf_counter() - start
+
+            # Per click: one upsert + commit for every button press
+            start = time.perf_counter()
+            for user, damage in clicks[:PER_CLICK_SAMPLE]:
+                await db.execute(UPSERT, (2, user, damage, 1))
+                await db.execute("UPDATE raids SET hp = hp - ? WHERE id = 2", (damage,))
+                await db.commit()
+            per_click = (time.perf_counter() - start) / PER_CLICK_SAMPLE * CLICKS
+
+            async with db.execute(
+                "SELECT SUM(damage), SUM(attacks) FROM raid_damage WHERE raid_id = 1"
+            ) as cursor:
+                total, attacks = await cursor.fetchone()
+    assert total == sum(d for _, d in clicks) and attacks == CLICKS
+
+    print(f"{CLICKS:,} clicks from {PLAYERS} players")
+    print(
+        f"  batched:   {batched:.2f}s ({CLICKS / batched:,.0f} clicks/s, "
+        f"{CLICKS // FLUSH_EVERY} commits)"
+    )
+    print(
+        f"  per click: {per_click:.2f}s est. ({CLICKS / per_click:,.0f} clicks/s, "
+        f"{CLICKS:,} commits)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""Rank card render time (target: < 10 ms per card).
+
+Run from the repo root: python -m benchmarks.bench_rank_card
+"""
+
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from utils.images import prepare_avatar, render_rank_card
+
+CARDS = 500
+
+
+def main():
+    buffer = BytesIO()
+    Image.new("RGB", (256, 256), (200, 80, 40)).save(buffer, format="PNG")
+    avatar = prepare_avatar(buffer.getvalue())
+
+    render_rank_card(avatar, "warmup", 1, 1, 0, 100)  # Builds the template/fonts
+
+    start = time.perf_counter()
+    for i in range(CARDS):
+        render_rank_card(avatar, f"Trainer{i}", 12, i + 1, i % 800, 1000)
+    elapsed = time.perf_counter() - start
+
+    print(f"{CARDS} cards in {elapsed:.2f}s -> {elapsed / CARDS * 1000:.2f} ms/card")
+
+
+if __name__ == "__main__":
+    main()
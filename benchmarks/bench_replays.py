@@ -0,0 +1,85 @@
+"""Replay size and scan speed.
+
+Records AI-vs-AI battles, then compares the binary replays with the same
+battles' text logs, and times an analytics scan (super effective share) and
+a full re-run through the engine. Run from the repo root:
+python -m benchmarks.bench_replays
+"""
+
+import json
+import random
+import time
+
+from utils.battle import (
+    EFFECT,
+    EFFECT_SUPER,
+    SURRENDER,
+    Battle,
+    choose_move,
+    replay,
+    replay_turns,
+    transcript,
+)
+from utils.species import TYPES
+
+BATTLES = 2_000
+
+
+def random_fighter(rng, name):
+    types = rng.sample(TYPES, rng.choice((1, 2)))
+    return {
+        "name": name,
+        "type": types[0],
+        "types": types,
+        "ability": rng.choice(("overgrow", "intimidate", "static", "huge-power")),
+        "stats": {stat: rng.randint(40, 130) for stat in ("hp", "attack", "defense")},
+    }
+
+
+def main():
+    rng = random.Random(3)
+    replays = []
+    turns = 0
+    for n in range(BATTLES):
+        battle = Battle(
+            random_fighter(rng, f"A{n}"), random_fighter(rng, f"B{n}"), record=True
+        )
+        while not battle.play(choose_move(battle, rng)):
+            pass
+        replays.append(bytes(battle.replay))
+        turns += battle.turns
+
+    binary = sum(map(len, replays))
+    text = sum(len(json.dumps(transcript(data)).encode()) for data in replays[:200])
+    text = text * len(replays) / 200
+    print(f"{BATTLES:,} battles, {turns:,} turns ({turns / BATTLES:.1f} per battle)")
+    print(
+        f"binary: {binary / BATTLES:7.1f} B/battle  "
+        f"({binary / turns:.1f} B/turn incl. header, 4 B/turn without)"
+    )
+    print(f"text log (JSON): {text / BATTLES:7.1f} B/battle")
+
+    start = time.perf_counter()
+    moves = super_effective = 0
+    for data in replays:
+        for flags, _, _ in replay_turns(data):
+            if flags & SURRENDER:
+                continue
+            moves += 1
+            super_effective += (flags & EFFECT) >> 1 == EFFECT_SUPER
+    elapsed = time.perf_counter() - start
+    print(
+        f"scan: {moves / elapsed:,.0f} turns/s "
+        f"({super_effective / moves:.0%} super effective)"
+    )
+
+    start = time.perf_counter()
+    for data in replays:
+        for _ in replay(data):
+            pass
+    elapsed = time.perf_counter() - start
+    print(f"engine re-run: {BATTLES / elapsed:,.0f} battles/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""PvE search: playouts per turn budget, and how strong each difficulty plays.
+
+Run from the repo root: python -m benchmarks.bench_search
+"""
+
+import random
+import time
+
+from cogs.combat import PVE_LEVELS
+from utils.battle import Battle, choose_move, search_move
+from utils.species import TYPES
+
+BUDGETS = [0.005, 0.02, 0.1, 0.4]  # Seconds per turn
+POSITIONS = 20
+GAMES = 400  # Matchups played per level (side 1 moves second); ~±2.5% std. error
+LEVEL_BUDGET = 0.005  # Search time in the strength games, so they finish
+
+
+def random_fighter(rng, name):
+    types = rng.sample(TYPES, rng.choice((1, 2)))
+    return {
+        "name": name,
+        "type": types[0],
+        "types": types,
+        "ability": rng.choice(("overgrow", "intimidate", "static", "blaze")),
+        "stats": {stat: rng.randint(40, 130) for stat in ("hp", "attack", "defense")},
+    }
+
+
+def main():
+    rng = random.Random(11)
+    matchups = [
+        (random_fighter(rng, "A"), random_fighter(rng, "B")) for _ in range(POSITIONS)
+    ]
+
+    print("budget   playouts/turn   playouts/s")
+    for budget in BUDGETS:
+        total = 0
+        start = time.perf_counter()
+        for a, b in matchups:
+            total += search_move(Battle(a, b, log=False), budget, seed=1)[1]
+        elapsed = time.perf_counter() - start
+        print(
+            f"{budget * 1000:>5.0f}ms   {total / POSITIONS:>13,.0f}   {total / elapsed:>10,.0f}"
+        )
+
+    # Same matchups for every row; side 1 is greedy, then each PvE level.
+    # Levels differ by their mistake chance; search time is capped here
+    games = [(random_fighter(rng, "A"), random_fighter(rng, "B")) for _ in range(GAMES)]
+    print(f"\nside 1 policy   mistakes   win rate vs greedy AI ({GAMES} games)")
+    for level, mistake in [("greedy", None)] + [
+        (level, mistake) for level, (_, mistake) in PVE_LEVELS.items()
+    ]:
+        score = 0.0
+        for game, (a, b) in enumerate(games):
+            play_rng = random.Random(game)
+            battle = Battle(a, b, log=False)
+            over = False
+            while not over:
+                if battle.turn == 1 and mistake is not None:
+                    slot = search_move(
+                        battle, LEVEL_BUDGET, seed=game, mistake=mistake
+                    )[0]
+                else:
+                    slot = choose_move(battle, play_rng)
+                over = battle.play(slot)
+            score += 1.0 if battle.winner == 1 else 0.5 if battle.winner == -1 else 0.0
+        shown = "-" if mistake is None else f"{mistake:.0%}"
+        print(f"{level:<14}  {shown:>8}   {score / GAMES:.0%}")
+
+
+if __name__ == "__main__":
+    main()
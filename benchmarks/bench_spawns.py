@@ -0,0 +1,74 @@
+"""Per-message overhead of the wild spawn tracker and the claim race.
+
+Run from the repo root: python -m benchmarks.bench_spawns
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import aiosqlite
+
+from utils.database import initialize_database
+from utils.spawns import ActivityTracker
+
+MESSAGES = 1_000_000
+CHANNELS = 2_000
+CLAIMERS = 200
+
+
+def bench_hot_path():
+    rng = random.Random(3)
+    tracker = ActivityTracker(rng=rng.random)
+    channels = [rng.randrange(CHANNELS) for _ in range(MESSAGES)]
+    now = time.monotonic()
+
+    spawns = 0
+    start = time.perf_counter()
+    for i, channel_id in enumerate(channels):
+        spawns += tracker.hit(channel_id, now + i * 0.001)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{MESSAGES:,} messages over {CHANNELS:,} channels: "
+        f"{elapsed / MESSAGES * 1e9:.0f} ns/message, {spawns} spawns"
+    )
+
+
+async def bench_claim_race():
+    """CLAIMERS concurrent conditional writes on separate connections."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spawns.db")
+        await initialize_database(path)
+        async with aiosqlite.connect(path) as db:
+            await db.execute(
+                "INSERT INTO wild_spawns (pokemon_id, expires_at) VALUES (25, ?)",
+                (int(time.time()) + 60,),
+            )
+            await db.commit()
+
+        async def claim(user):
+            async with aiosqlite.connect(path, timeout=30) as db:
+                cursor = await db.execute(
+                    """
+                    UPDATE wild_spawns SET claimed_by = ?
+                    WHERE id = 1 AND claimed_by IS NULL AND expires_at > ?
+                    """,
+                    (user, int(time.time())),
+                )
+                await db.commit()
+                return cursor.rowcount
+
+        start = time.perf_counter()
+        wins = await asyncio.gather(*(claim(f"user-{i}") for i in range(CLAIMERS)))
+        elapsed = time.perf_counter() - start
+    print(
+        f"{CLAIMERS} concurrent claimers: {sum(wins)} winner(s) in {elapsed * 1000:.0f} ms"
+    )
+    assert sum(wins) == 1
+
+
+if __name__ == "__main__":
+    bench_hot_path()
+    asyncio.run(bench_claim_race())
@@ -0,0 +1,133 @@
+"""Many guilds using their music players at once.
+
+Each simulated guild queues songs and skips at random against a fake voice
+client whose tracks end on another thread (like discord's audio player).
+Every guild must play only its own songs, in the order it queued them,
+missing at most the ones it skipped while they were still being resolved.
+Songs are queued unresolved; resolving one takes RESOLVE_SECONDS, so the
+gap between tracks shows whether prefetching hid it. Then reports the
+memory held by an idle player.
+
+Run from the repo root: python -m benchmarks.stress_music [--guilds N]
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+import tracemalloc
+
+from utils.metrics import METRICS
+from utils.music import IDLE, GuildPlayer
+
+SONGS_PER_GUILD = 20
+TRACK_SECONDS = (0.01, 0.03)
+RESOLVE_SECONDS = 0.005
+IDLE_PLAYERS = 10_000
+
+
+class FakeVoice:
+    """Plays a track for a random moment on its own thread."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.played = []
+        self.stopped = None
+
+    def play(self, source, after):
+        self.played.append(source)
+        stopped = self.stopped = threading.Event()
+        duration = self.rng.uniform(*TRACK_SECONDS)
+
+        def run():
+            stopped.wait(duration)
+            after(None)  # Like discord: once per track, ended or stopped
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        if self.stopped:
+            self.stopped.set()
+
+    def is_connected(self):
+        return True
+
+    async def disconnect(self):
+        pass
+
+
+async def resolve(song):
+    if not song["ready"]:
+        await asyncio.sleep(RESOLVE_SECONDS)  # Stands in for a yt-dlp extraction
+        song["ready"] = True
+    return True
+
+
+async def run_guild(guild_id, loop):
+    rng = random.Random(guild_id)
+    voice = FakeVoice(rng)
+    player = GuildPlayer(guild_id, loop, lambda song: song["source"], resolve)
+    player.voice = voice
+    queued = []
+    skips = 0
+    for n in range(SONGS_PER_GUILD):
+        song = {"source": f"{guild_id}:{n}", "title": f"Song {n}", "ready": False}
+        queued.append(song["source"])
+        await player.enqueue(song)
+        await asyncio.sleep(rng.uniform(0, 0.01))
+        if rng.random() < 0.3:
+            skips += await player.skip()
+    while player.state != IDLE or player.queue:
+        await asyncio.sleep(0.01)
+    return queued, voice.played, skips
+
+
+def in_order(queued, played, skips):
+    """played is queued minus at most `skips` songs, order kept."""
+    remaining = iter(queued)
+    return (
+        all(song in remaining for song in played) and len(queued) - len(played) <= skips
+    )
+
+
+async def stress(guilds):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_guild(g, loop) for g in range(guilds)))
+    elapsed = time.perf_counter() - start
+    bad = sum(not in_order(*result) for result in results)
+    print(
+        f"{guilds} guilds x {SONGS_PER_GUILD} songs in {elapsed:.2f}s: "
+        f"{'OK, no crosstalk' if not bad else f'{bad} guilds played the wrong songs'}"
+    )
+    for metric, _, n, p50, p95, _ in METRICS.summary():
+        if metric == "music.gap":
+            print(
+                f"gap between tracks: p50 {p50 * 1000:.2f}ms, p95 {p95 * 1000:.2f}ms "
+                f"over the last {n} (resolving takes {RESOLVE_SECONDS * 1000:.0f}ms)"
+            )
+    return bad
+
+
+async def idle_memory():
+    loop = asyncio.get_running_loop()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    players = [GuildPlayer(g, loop, str) for g in range(IDLE_PLAYERS)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"idle player: {(after - before) / len(players):,.0f} bytes each")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=100)
+    args = parser.parse_args()
+    bad = asyncio.run(stress(args.guilds))
+    asyncio.run(idle_memory())
+    raise SystemExit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
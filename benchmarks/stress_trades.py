@@ -0,0 +1,155 @@
+"""Hammer the trade engine with conflicting concurrent trades.
+
+Several connections to one SQLite file accept trades at the same time. The
+trades are built from ownership reads that go stale immediately, and some are
+accepted twice (double-clicks), so many must be rejected. At the end:
+
+- every Pokémon still exists exactly once and the coin total is unchanged;
+- replaying the completed trades in commit order (the trades table's rowid)
+  from the starting state gives exactly the final database.
+
+Run from the repo root: python -m benchmarks.stress_trades [--trades N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import aiosqlite
+
+from utils.database import initialize_database
+from utils.trading import TRADE_COMPLETED, TradeLeg, execute_trade
+
+USERS = 20
+POKEMON_PER_USER = 40
+START_COINS = 500
+CONNECTIONS = 8
+REPLAY_CHANCE = 0.1  # Accept the same trade_id twice
+
+
+async def seed(path):
+    await initialize_database(path)
+    async with aiosqlite.connect(path) as db:
+        users = [f"user-{i}" for i in range(USERS)]
+        await db.executemany(
+            "INSERT INTO game_profile (user_uuid, coins) VALUES (?, ?)",
+            [(u, START_COINS) for u in users],
+        )
+        await db.executemany(
+            "INSERT INTO collection (user_uuid, pokemon_id, pokemon_name) VALUES (?, ?, ?)",
+            [(u, p, f"Mon{p}") for u in users for p in range(1, POKEMON_PER_USER + 1)],
+        )
+        await db.commit()
+        return users, await snapshot(db)
+
+
+async def snapshot(db):
+    async with db.execute("SELECT id, user_uuid FROM collection") as cursor:
+        owners = dict(await cursor.fetchall())
+    async with db.execute("SELECT user_uuid, coins FROM game_profile") as cursor:
+        coins = dict(await cursor.fetchall())
+    return owners, coins
+
+
+def random_legs(rng, users, owners):
+    """A 2- or 3-party trade built from a (possibly stale) ownership read."""
+    parties = rng.sample(users, rng.choice((2, 3)))
+    by_owner = {}
+    for row_id, owner in owners.items():
+        by_owner.setdefault(owner, []).append(row_id)
+    legs = []
+    for i, giver in enumerate(parties):
+        receiver = parties[(i + 1) % len(parties)]
+        mine = by_owner.get(giver, [])
+        items = rng.sample(mine, min(len(mine), rng.randint(0, 3)))
+        coins = rng.choice((0, 0, 10, 50, 200))
+        if items or coins:
+            legs.append(TradeLeg(giver, receiver, [(i, 1) for i in items], coins))
+    return legs
+
+
+async def worker(path, jobs, users, seed_value, stats):
+    rng = random.Random(seed_value)
+    async with aiosqlite.connect(path, timeout=60) as db:
+        while jobs:
+            trade_id, legs = jobs.pop()
+            if legs is None:
+                # Optimistic read: by the time we accept, it may be outdated
+                owners, _ = await snapshot(db)
+                legs = random_legs(rng, users, owners)
+                if not legs:
+                    continue
+                if rng.random() < REPLAY_CHANCE:
+                    jobs.append((trade_id, legs))  # Second click, later
+                stats["legs"][trade_id] = legs
+
+            status, replayed = await execute_trade(db, trade_id, legs)
+            await db.commit()
+            stats["replayed" if replayed else status] += 1
+
+
+def replay(owners, coins, legs):
+    """Apply a completed trade to the in-memory model, checking it was legal."""
+    for leg in legs:
+        for row_id, _ in leg.units:
+            assert owners[row_id] == leg.giver, "trade moved a Pokémon it didn't own"
+            owners[row_id] = leg.receiver
+        assert coins[leg.giver] >= leg.coins, "trade spent coins that didn't exist"
+        coins[leg.giver] -= leg.coins
+        coins[leg.receiver] += leg.coins
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent trade stress test")
+    parser.add_argument("--trades", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trades.db")
+        users, (owners, coins) = await seed(path)
+
+        jobs = [(f"trade-{i}", None) for i in range(args.trades)]
+        stats = {"completed": 0, "rejected": 0, "replayed": 0, "legs": {}}
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                worker(path, jobs, users, args.seed * 1000 + i, stats)
+                for i in range(CONNECTIONS)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+        async with aiosqlite.connect(path) as db:
+            final_owners, final_coins = await snapshot(db)
+            async with db.execute(
+                "SELECT trade_id FROM trades WHERE status = ? ORDER BY rowid",
+                (TRADE_COMPLETED,),
+            ) as cursor:
+                committed = [row[0] for row in await cursor.fetchall()]
+
+    # 1. Nothing duplicated or lost
+    assert sorted(final_owners) == sorted(owners), "Pokémon appeared or vanished"
+    assert sum(final_coins.values()) == sum(coins.values()), "coins not conserved"
+    assert min(final_coins.values()) >= 0, "negative balance"
+
+    # 2. The final state is exactly the completed trades, in commit order
+    for trade_id in committed:
+        replay(owners, coins, stats["legs"][trade_id])
+    assert owners == final_owners, "final owners differ from the trade log"
+    assert coins == final_coins, "final coins differ from the trade log"
+
+    total = stats["completed"] + stats["rejected"] + stats["replayed"]
+    print(
+        f"{total} accepts on {CONNECTIONS} connections in {elapsed:.1f}s: "
+        f"{stats['completed']} completed, {stats['rejected']} rejected, "
+        f"{stats['replayed']} double-clicks ignored"
+    )
+    print("✅ No Pokémon or coins duplicated or lost")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,7 +2,8 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from utils.data_manager import get_guild_data, save_data
+from utils.data_manager import update_guild_settings
+from utils.metrics import METRICS
 
 
 class Admin(commands.Cog):
@@ -21,19 +22,30 @@ class Admin(commands.Cog):
     async def set_log_channel(
         self, interaction: discord.Interaction, channel: discord.TextChannel
     ):
-        # 1. Get the data for this server
-        data = get_guild_data(interaction.guild.id)
-
-        # 2. Update the setting
-        data["settings"]["log_channel_id"] = channel.id
-
-        # 3. Save to file
-        save_data()
+        # Saves this guild's row and notifies cogs that cache the channel
+        await update_guild_settings(interaction.guild.id, log_channel_id=channel.id)
 
         await interaction.response.send_message(
             f"✅ Log channel has been set to {channel.mention}"
         )
 
+    # --- COMMAND: LATENCY METRICS ---
+    @app_commands.command(name="perf", description="Show command latency metrics")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def perf(self, interaction: discord.Interaction):
+        rows = METRICS.summary()
+        if not rows:
+            await interaction.response.send_message("No samples yet.", ephemeral=True)
+            return
+        lines = ["metric              size     n    p50    p95    max"]
+        for metric, label, n, p50, p95, worst in rows:
+            lines.append(
+                f"{metric:<18} {label!s:>5} {n:>5} {p50 * 1000:>5.0f}ms {p95 * 1000:>5.0f}ms {worst * 1000:>5.0f}ms"
+            )
+        await interaction.response.send_message(
+            "```\n" + "\n".join(lines)[:1900] + "\n```", ephemeral=True
+        )
+
 
 async def setup(bot):
     await bot.add_cog(Admin(bot))
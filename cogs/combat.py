@@ -1,351 +1,187 @@
 import asyncio
+import io
+import json
 import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from uuid import uuid4
 
 import aiohttp
 import discord
+import numpy as np
 from discord import app_commands
-from discord.ext import commands
-
-from utils.database import get_or_create_uuid
-
-# --- 1. TYPE CHART (Simplified) ---
-# Multipliers for damage calculations
-TYPE_CHART = {
-    "normal": {"rock": 0.5, "ghost": 0.0, "steel": 0.5},
-    "fire": {
-        "fire": 0.5,
-        "water": 0.5,
-        "grass": 2.0,
-        "ice": 2.0,
-        "bug": 2.0,
-        "rock": 0.5,
-        "dragon": 0.5,
-        "steel": 2.0,
-    },
-    "water": {
-        "fire": 2.0,
-        "water": 0.5,
-        "grass": 0.5,
-        "ground": 2.0,
-        "rock": 2.0,
-        "dragon": 0.5,
-    },
-    "grass": {
-        "fire": 0.5,
-        "water": 2.0,
-        "grass": 0.5,
-        "poison": 0.5,
-        "ground": 2.0,
-        "flying": 0.5,
-        "bug": 0.5,
-        "rock": 2.0,
-        "dragon": 0.5,
-        "steel": 0.5,
-    },
-    "electric": {
-        "water": 2.0,
-        "grass": 0.5,
-        "electric": 0.5,
-        "ground": 0.0,
-        "flying": 2.0,
-        "dragon": 0.5,
-    },
-    "ice": {
-        "fire": 0.5,
-        "water": 0.5,
-        "grass": 2.0,
-        "ice": 0.5,
-        "ground": 2.0,
-        "flying": 2.0,
-        "dragon": 2.0,
-        "steel": 0.5,
-    },
-    "fighting": {
-        "normal": 2.0,
-        "ice": 2.0,
-        "poison": 0.5,
-        "flying": 0.5,
-        "psychic": 0.5,
-        "bug": 0.5,
-        "rock": 2.0,
-        "ghost": 0.0,
-        "dark": 2.0,
-        "steel": 2.0,
-        "fairy": 0.5,
-    },
-    "poison": {
-        "grass": 2.0,
-        "poison": 0.5,
-        "ground": 0.5,
-        "rock": 0.5,
-        "ghost": 0.5,
-        "steel": 0.0,
-        "fairy": 2.0,
-    },
-    "ground": {
-        "fire": 2.0,
-        "water": 0.5,
-        "grass": 0.5,
-        "ice": 0.5,
-        "poison": 2.0,
-        "flying": 0.0,
-        "electric": 2.0,
-        "rock": 2.0,
-        "steel": 2.0,
-    },
-    "flying": {
-        "grass": 2.0,
-        "electric": 0.5,
-        "fighting": 2.0,
-        "bug": 2.0,
-        "rock": 0.5,
-        "steel": 0.5,
-    },
-    "psychic": {
-        "fighting": 2.0,
-        "poison": 2.0,
-        "psychic": 0.5,
-        "dark": 0.0,
-        "steel": 0.5,
-    },
-    "bug": {
-        "fire": 0.5,
-        "grass": 2.0,
-        "fighting": 0.5,
-        "poison": 0.5,
-        "flying": 0.5,
-        "psychic": 2.0,
-        "ghost": 0.5,
-        "dark": 2.0,
-        "steel": 0.5,
-        "fairy": 0.5,
-    },
-    "rock": {
-        "fire": 2.0,
-        "ice": 2.0,
-        "fighting": 0.5,
-        "ground": 0.5,
-        "flying": 2.0,
-        "bug": 2.0,
-        "steel": 0.5,
-    },
-    "ghost": {"normal": 0.0, "psychic": 2.0, "ghost": 2.0, "dark": 0.5},
-    "dragon": {"dragon": 2.0, "steel": 0.5, "fairy": 0.0},
-    "dark": {"fighting": 0.5, "psychic": 2.0, "ghost": 2.0, "dark": 0.5, "fairy": 0.5},
-    "steel": {
-        "fire": 0.5,
-        "water": 0.5,
-        "electric": 0.5,
-        "ice": 2.0,
-        "rock": 2.0,
-        "steel": 0.5,
-        "fairy": 2.0,
-    },
-    "fairy": {
-        "fire": 0.5,
-        "fighting": 2.0,
-        "poison": 0.5,
-        "dragon": 2.0,
-        "dark": 2.0,
-        "steel": 0.5,
-    },
-}
-
-# --- 2. MOVES POOL (Auto-Assigned based on Type) ---
-MOVES_DB = {
-    "normal": [("Tackle", 40), ("Quick Attack", 40), ("Hyper Beam", 120), ("Rest", 0)],
-    "fire": [
-        ("Ember", 40),
-        ("Flamethrower", 90),
-        ("Fire Blast", 110),
-        ("Will-O-Wisp", 0),
-    ],
-    "water": [("Water Gun", 40), ("Surf", 90), ("Hydro Pump", 110), ("Rain Dance", 0)],
-    "grass": [
-        ("Vine Whip", 45),
-        ("Razor Leaf", 55),
-        ("Solar Beam", 120),
-        ("Synthesis", 0),
-    ],
-    "electric": [
-        ("Thundershock", 40),
-        ("Thunderbolt", 90),
-        ("Thunder", 110),
-        ("Thunder Wave", 0),
-    ],
-    "ice": [("Ice Shard", 40), ("Ice Beam", 90), ("Blizzard", 110), ("Hail", 0)],
-    "fighting": [
-        ("Karate Chop", 50),
-        ("Brick Break", 75),
-        ("Close Combat", 120),
-        ("Bulk Up", 0),
-    ],
-    "poison": [("Acid", 40), ("Sludge Bomb", 90), ("Gunk Shot", 120), ("Toxic", 0)],
-    "ground": [
-        ("Mud Shot", 55),
-        ("Earthquake", 100),
-        ("Fissure", 120),
-        ("Sandstorm", 0),
-    ],
-    "flying": [("Peck", 35), ("Aerial Ace", 60), ("Brave Bird", 120), ("Roost", 0)],
-    "psychic": [
-        ("Confusion", 50),
-        ("Psychic", 90),
-        ("Future Sight", 120),
-        ("Calm Mind", 0),
-    ],
-    "bug": [
-        ("Bug Bite", 60),
-        ("X-Scissor", 80),
-        ("Megahorn", 120),
-        ("Quiver Dance", 0),
-    ],
-    "rock": [
-        ("Rock Throw", 50),
-        ("Rock Slide", 75),
-        ("Stone Edge", 100),
-        ("Polish", 0),
-    ],
-    "ghost": [
-        ("Lick", 30),
-        ("Shadow Ball", 80),
-        ("Poltergeist", 110),
-        ("Confuse Ray", 0),
-    ],
-    "dragon": [
-        ("Twister", 40),
-        ("Dragon Claw", 80),
-        ("Outrage", 120),
-        ("Dragon Dance", 0),
-    ],
-    "dark": [("Bite", 60), ("Crunch", 80), ("Dark Pulse", 80), ("Nasty Plot", 0)],
-    "steel": [
-        ("Metal Claw", 50),
-        ("Iron Head", 80),
-        ("Flash Cannon", 80),
-        ("Iron Defense", 0),
-    ],
-    "fairy": [
-        ("Fairy Wind", 40),
-        ("Moonblast", 95),
-        ("Play Rough", 90),
-        ("Moonlight", 0),
-    ],
-}
+from discord.ext import commands, tasks
+
+from utils.battle import (
+    SHOWN_ABILITIES,
+    Battle,
+    footprint,
+    parse_battle_data,
+    replay,
+    search_move,
+    transcript,
+)
+from utils.database import get_or_create_uuid, transaction
+from utils.metrics import METRICS
+from utils.species import MAX_SPECIES_ID, SPECIES
+from utils.typechart import (
+    MOVE_INDEX,
+    MOVE_NAMES,
+    MOVE_POWER,
+    deck_damage,
+    deck_of,
+    type_ids,
+)
 
 # --- 3. BATTLE LOGIC ---
+# Type chart and moves live in utils.typechart as NumPy tables
 
 
 def get_moves_for_type(p_type):
-    # Get moves specific to type, fallback to Normal
-    moves = MOVES_DB.get(p_type, MOVES_DB["normal"])
-    # Return 4 moves: 2 Type moves + 1 Normal Move + 1 Heal/Status
-    normal_moves = MOVES_DB["normal"]
-
     # Simple set: Move 1 (Weak), Move 2 (Strong), Move 3 (Tackle), Move 4 (Heal/Status)
-    deck = [moves[0], moves[1], normal_moves[0], moves[3]]
-    return deck
+    return [(MOVE_NAMES[i], int(MOVE_POWER[i])) for i in deck_of(p_type)]
 
 
 def calculate_damage(
     move_name,
     move_power,
-    attacker_type,
-    defender_type,
+    attacker_types,
+    defender_types,
     attacker_stats,
     defender_stats,
     ability,
 ):
     """
     Advanced Damage Formula with Type Effectiveness and Abilities
+    (one move; score a whole deck at once with deck_damage)
     """
     if move_power == 0:
         return 0, "status"  # Heals/Buffs handled separately
 
-    level = 50
-    atk = attacker_stats["attack"]
-    defense = defender_stats["defense"]
-
-    # 1. Base Damage
-    damage = (((2 * level / 5 + 2) * move_power * (atk / defense)) / 50) + 2
-
-    # 2. Type Effectiveness
-    multiplier = 1.0
+    damage, multiplier = deck_damage(
+        np.array([MOVE_INDEX[move_name]]),
+        type_ids(attacker_types),
+        type_ids(defender_types),
+        attacker_stats["attack"],
+        defender_stats["defense"],
+        ability,
+    )
+    msg = " (Huge Power!)" if ability == "huge-power" else ""
+    return int(damage[0]), float(multiplier[0]), msg
+
+
+# --- CONFIGURATION ---
+DUEL_FLUSH_INTERVAL = 2  # Seconds between batched snapshot writes
+DUEL_IDLE = 5 * 60  # Idle duels leave memory (reloaded from the DB on a click)
+DUEL_EXPIRY = 24 * 60 * 60  # Untouched duels are deleted after this long
+DUEL_REWARD = 50
+PVE_REWARD = 20
+PVE_WORKERS = 2  # Processes running the bot trainer's search
+PVE_SIDE = 1  # The bot trainer always moves second
+# Difficulty -> (search seconds per turn, chance of playing a worse move).
+# The mistakes are what set the strength: see benchmarks/bench_search.py
+PVE_LEVELS = {
+    "easy": (0.02, 0.8),
+    "normal": (0.1, 0.25),
+    "hard": (0.4, 0.0),
+}
+REPLAY_FRAMES = 15  # Most embed edits one /replay makes (long battles skip turns)
+REPLAY_DELAY = 1.5  # Seconds between replay frames
+
+Player = namedtuple("Player", "id name")
+
+
+class Duel:
+    """One open duel: who plays each side, and the battle itself."""
+
+    __slots__ = ("id", "players", "battle", "difficulty", "mode", "touched")
+
+    def __init__(
+        self, duel_id: str, players, battle: Battle, difficulty=None, mode=None
+    ):
+        self.id = duel_id
+        self.players = tuple(Player(*player) for player in players)
+        self.battle = battle
+        self.difficulty = difficulty  # PVE_LEVELS key when side 1 is the bot
+        self.mode = mode  # Set for ranked and tournament games (see cogs.ranked)
+        self.touched = time.monotonic()
+
+    def snapshot(self) -> str:
+        return json.dumps(
+            {
+                "players": self.players,
+                "battle": self.battle.snapshot(),
+                "difficulty": self.difficulty,
+                "mode": self.mode,
+            },
+            separators=(",", ":"),
+        )
 
-    # Check if attacker type matches move type (STAB - Same Type Attack Bonus)
-    # For MVP, we assume move type = attacker type for the first 2 moves
-    if attacker_type in MOVES_DB and move_name in [
-        m[0] for m in MOVES_DB[attacker_type]
-    ]:
-        damage *= 1.5  # STAB
+    @classmethod
+    def restore(cls, duel_id: str, state: str) -> "Duel":
+        data = json.loads(state)
+        return cls(
+            duel_id,
+            data["players"],
+            Battle.restore(data["battle"]),
+            data.get("difficulty"),
+            data.get("mode"),
+        )
 
-    # Check Weakness/Resistance
-    if attacker_type in TYPE_CHART:
-        multiplier = TYPE_CHART[attacker_type].get(defender_type, 1.0)
 
-    damage *= multiplier
+class DuelButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"duel:(?P<duel>[0-9a-f]{32}):(?P<slot>[0-9]|surrender)",
+):
+    """A move or surrender button; the custom_id alone finds the duel again."""
+
+    def __init__(self, duel_id, slot, label=None, style=None, row=0):
+        super().__init__(
+            discord.ui.Button(
+                label=label,
+                style=style or discord.ButtonStyle.secondary,
+                row=row,
+                custom_id=f"duel:{duel_id}:{slot}",
+            )
+        )
+        self.duel_id = duel_id
+        self.slot = slot
 
-    # 3. Ability Logic (Simplified)
-    msg = ""
-    # "Blaze/Torrent/Overgrow" - Boost damage when low HP (Handled in Battle loop?)
-    # "Huge Power" - Double Attack
-    if ability == "huge-power":
-        damage *= 2
-        msg = " (Huge Power!)"
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["duel"], match["slot"])
 
-    return int(damage), multiplier, msg
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.client.get_cog("Combat").on_duel_click(
+            interaction, self.duel_id, self.slot
+        )
 
 
 class DuelView(discord.ui.View):
-    def __init__(self, bot, p1, p2, p1_data, p2_data):
-        super().__init__(timeout=300)
-        self.bot = bot
-        self.p1 = p1
-        self.p2 = p2
-
-        self.p1_data = p1_data
-        self.p2_data = p2_data
+    """Discord side of a duel; the rules live in utils.battle.Battle.
 
-        # Setup HP (Level 50 approximation: Base HP * 2 + 110)
-        self.p1_max_hp = p1_data["stats"]["hp"] * 2 + 50
-        self.p2_max_hp = p2_data["stats"]["hp"] * 2 + 50
-        self.p1_hp = self.p1_max_hp
-        self.p2_hp = self.p2_max_hp
-
-        # Moves
-        self.p1_moves = get_moves_for_type(p1_data["type"])
-        self.p2_moves = get_moves_for_type(p2_data["type"])
-
-        # State
-        self.turn = p1.id
-        self.logs = [f"🛑 Battle Start!"]
+    Built fresh for every render. Buttons are DynamicItems, so nothing is
+    kept per message and clicks still work after a restart.
+    """
 
-        # ABILITY: Intimidate Check (On Entry)
-        self.apply_entry_abilities()
+    def __init__(self, cog, duel: Duel):
+        super().__init__(timeout=None)
+        self.cog = cog
+        self.bot = cog.bot
+        self.duel = duel
+        self.battle = duel.battle
+        self.players = duel.players
+        self.p1, self.p2 = duel.players
 
         # Create Buttons for Moves
         self.update_buttons()
 
-    def apply_entry_abilities(self):
-        # P1 Ability
-        if self.p1_data["ability"] == "intimidate":
-            self.p2_data["stats"]["attack"] *= 0.66
-            self.logs.append(
-                f"😤 {self.p1_data['name']}'s Intimidate cut {self.p2_data['name']}'s Attack!"
-            )
-        # P2 Ability
-        if self.p2_data["ability"] == "intimidate":
-            self.p1_data["stats"]["attack"] *= 0.66
-            self.logs.append(
-                f"😤 {self.p2_data['name']}'s Intimidate cut {self.p1_data['name']}'s Attack!"
-            )
-
-        # Drizzle / Drought could go here
-
     def update_buttons(self):
         self.clear_items()
 
-        current_moves = self.p1_moves if self.turn == self.p1.id else self.p2_moves
+        current_moves = self.battle.fighters[self.battle.turn].moves
 
         for i, (move_name, power) in enumerate(current_moves):
             style = discord.ButtonStyle.secondary
@@ -356,173 +192,342 @@ class DuelView(discord.ui.View):
             elif i == 1:
                 style = discord.ButtonStyle.danger  # Strong Move
 
-            btn = discord.ui.Button(label=f"{move_name}", style=style, row=0)
-            btn.callback = self.make_callback(move_name, power)
-            self.add_item(btn)
+            self.add_item(DuelButton(self.duel.id, i, f"{move_name}", style, row=0))
 
         # Surrender Button
-        surrender_btn = discord.ui.Button(
-            label="🏳️ Surrender", style=discord.ButtonStyle.red, row=1
+        self.add_item(
+            DuelButton(
+                self.duel.id,
+                "surrender",
+                "🏳️ Surrender",
+                discord.ButtonStyle.red,
+                row=1,
+            )
         )
-        surrender_btn.callback = self.surrender
-        self.add_item(surrender_btn)
 
-    def make_callback(self, name, power):
-        async def callback(interaction: discord.Interaction):
-            await self.handle_turn(interaction, name, power)
-
-        return callback
+    async def edit(self, interaction, **kwargs):
+        """Edit the duel message, whether or not this click was answered yet."""
+        if interaction.response.is_done():
+            await interaction.edit_original_response(**kwargs)
+        else:
+            await interaction.response.edit_message(**kwargs)
 
-    async def handle_turn(self, interaction, move_name, move_power):
-        if interaction.user.id != self.turn:
-            await interaction.response.send_message("⏳ Not your turn!", ephemeral=True)
+    async def handle_turn(self, interaction, slot):
+        if interaction.user.id not in {player.id for player in self.players}:
+            await interaction.response.send_message(
+                "❌ This isn't your duel!", ephemeral=True
+            )
             return
 
-        # Define Attacker/Defender
-        if self.turn == self.p1.id:
-            attacker, defender = self.p1, self.p2
-            a_data, d_data = self.p1_data, self.p2_data
-            is_p1_attacking = True
-        else:
-            attacker, defender = self.p2, self.p1
-            a_data, d_data = self.p2_data, self.p1_data
-            is_p1_attacking = False
-
-        # HEAL / STATUS
-        if move_power == 0:
-            heal_amt = int(a_data["stats"]["hp"] * 0.5)  # Heal 50% base HP
-            if is_p1_attacking:
-                self.p1_hp = min(self.p1_max_hp, self.p1_hp + heal_amt)
-            else:
-                self.p2_hp = min(self.p2_max_hp, self.p2_hp + heal_amt)
+        if self.duel.difficulty and self.battle.turn == PVE_SIDE:
+            if self.duel.id in self.cog.thinking:
+                await interaction.response.send_message(
+                    "⏳ Your rival is thinking...", ephemeral=True
+                )
+                return
+            # Restarted during the rival's turn: let it move now. Marked as
+            # thinking before any await so a second click can't start it too
+            self.cog.thinking.add(self.duel.id)
+            try:
+                await interaction.response.defer()
+            except BaseException:
+                self.cog.thinking.discard(self.duel.id)
+                raise
+            await self.rival_turn(interaction)
+            return
 
-            self.logs.append(f"💚 {a_data['name']} used {move_name} and healed!")
+        if interaction.user.id != self.players[self.battle.turn].id:
+            await interaction.response.send_message("⏳ Not your turn!", ephemeral=True)
+            return
 
-        # DAMAGE
-        else:
-            dmg, multiplier, ability_msg = calculate_damage(
-                move_name,
-                move_power,
-                a_data["type"],
-                d_data["type"],
-                a_data["stats"],
-                d_data["stats"],
-                a_data["ability"],
-            )
+        finished = self.battle.play(slot)
+        self.cog.save_duel(self.duel)
+        if finished:
+            await self.end_game(interaction)
+            return
 
-            # Ability Check: Blaze/Torrent/Overgrow (Boosts Type moves at < 1/3 HP)
-            current_hp = self.p1_hp if is_p1_attacking else self.p2_hp
-            max_hp = self.p1_max_hp if is_p1_attacking else self.p2_max_hp
-
-            starter_abilities = ["blaze", "torrent", "overgrow", "swarm"]
-            if a_data["ability"] in starter_abilities and (current_hp < max_hp / 3):
-                dmg = int(dmg * 1.5)
-                ability_msg = f" ({a_data['ability'].upper()}!)"
-
-            # Apply Damage
-            if is_p1_attacking:
-                self.p2_hp -= dmg
-            else:
-                self.p1_hp -= dmg
-
-            # Log Text
-            eff_text = ""
-            if multiplier > 1:
-                eff_text = " It's Super Effective! 💥"
-            elif multiplier < 1:
-                eff_text = " It's not very effective..."
-
-            self.logs.append(
-                f"⚔️ {a_data['name']} used {move_name}!{eff_text}{ability_msg} (-{dmg})"
-            )
+        self.update_buttons()
+        if not self.duel.difficulty:
+            await interaction.response.edit_message(embed=self.get_embed(), view=self)
+            return
 
-        # Win Check
-        if self.p1_hp <= 0 or self.p2_hp <= 0:
+        # PvE: show the player's move at once, then the rival's answer
+        self.cog.thinking.add(self.duel.id)
+        for item in self.children:
+            item.item.disabled = True
+        try:
+            await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        except BaseException:
+            self.cog.thinking.discard(self.duel.id)
+            raise
+        await self.rival_turn(interaction)
+
+    async def rival_turn(self, interaction):
+        """Play the bot trainer's move; the duel is already in cog.thinking."""
+        finished = await self.cog.pve_turn(self.duel)
+        if finished is None:
+            return
+        if finished:
             await self.end_game(interaction)
             return
-
-        # Switch Turn
-        self.turn = self.p2.id if self.turn == self.p1.id else self.p1.id
         self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        await self.edit(interaction, embed=self.get_embed(), view=self)
 
     async def surrender(self, interaction):
         if interaction.user.id == self.p1.id:
-            self.p1_hp = 0
+            self.battle.surrender(0)
         elif interaction.user.id == self.p2.id:
-            self.p2_hp = 0
+            self.battle.surrender(1)
         else:
             return
         await self.end_game(interaction)
 
     async def end_game(self, interaction):
-        winner = self.p1 if self.p2_hp <= 0 else self.p2
-        loser_name = self.p2_data["name"] if self.p2_hp <= 0 else self.p1_data["name"]
-
-        self.logs.append(f"🏆 {winner.name}'s Pokemon fainted {loser_name}!")
+        self.cog.close_duel(self.duel)
+        ranked = self.bot.get_cog("Ranked")
+        if self.duel.mode and ranked:
+            ranked.record(self.duel)
+        if self.battle.winner == -1:  # Ran out of turns: nobody is paid
+            embed = self.get_embed()
+            embed.title = "🤝 Draw!"
+            embed.set_footer(text="Both Pokémon are still standing")
+            await self.edit(interaction, embed=embed, view=None)
+            self.stop()
+            return
+        winner = self.players[self.battle.winner]
+        loser_name = self.battle.fighters[1 - self.battle.winner].name
 
-        # Payout
-        winner_uuid = await get_or_create_uuid(self.bot.db, winner.id, winner.name)
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
-                "UPDATE game_profile SET coins = coins + 50 WHERE user_uuid = ?",
-                (winner_uuid,),
-            )
-        await self.bot.db.commit()
+        self.battle.log(f"🏆 {winner.name}'s Pokemon fainted {loser_name}!")
 
         embed = self.get_embed()
         embed.color = discord.Color.gold()
         embed.title = f"🏆 {winner.name} Wins!"
-        embed.set_footer(text="Winner received 50 Coins")
+
+        # Payout (the bot trainer is never paid)
+        if self.duel.difficulty and self.battle.winner == PVE_SIDE:
+            embed.set_footer(text="Better luck next time!")
+        else:
+            reward = PVE_REWARD if self.duel.difficulty else DUEL_REWARD
+            winner_uuid = await get_or_create_uuid(self.bot.db, winner.id, winner.name)
+            async with transaction(self.bot.db):
+                await self.bot.db.execute(
+                    "UPDATE game_profile SET coins = coins + ? WHERE user_uuid = ?",
+                    (reward, winner_uuid),
+                )
+            embed.set_footer(text=f"Winner received {reward} Coins")
 
         self.clear_items()
-        await interaction.response.edit_message(embed=embed, view=None)
+        await self.edit(interaction, embed=embed, view=None)
         self.stop()
 
     def get_embed(self):
-        # Visualize HP Bars
-        def get_bar(curr, maxi):
-            ratio = max(0, curr / maxi)
-            filled = int(ratio * 10)
-            color = "🟩" if ratio > 0.5 else "🟨" if ratio > 0.2 else "🟥"
-            return color * filled + "⬛" * (10 - filled)
-
-        embed = discord.Embed(title="⚔️ Pokémon Battle", color=discord.Color.red())
-
-        # P1
-        p1_status = ""
-        if self.p1_data["ability"] in ["intimidate", "blaze", "huge-power"]:
-            p1_status = f" | Abil: {self.p1_data['ability']}"
-        embed.add_field(
-            name=f"{self.p1.name}'s {self.p1_data['name']}",
-            value=f"{get_bar(self.p1_hp, self.p1_max_hp)}\n**{int(self.p1_hp)}/{self.p1_max_hp} HP**{p1_status}",
-            inline=True,
-        )
+        embed = battle_embed(self.players, self.battle)
+        turn_name = self.players[self.battle.turn].name
+        embed.set_footer(text=f"Waiting for {turn_name} to choose a move...")
+        return embed
 
-        # P2
-        p2_status = ""
-        if self.p2_data["ability"] in ["intimidate", "blaze", "huge-power"]:
-            p2_status = f" | Abil: {self.p2_data['ability']}"
-        embed.add_field(
-            name=f"{self.p2.name}'s {self.p2_data['name']}",
-            value=f"{get_bar(self.p2_hp, self.p2_max_hp)}\n**{int(self.p2_hp)}/{self.p2_max_hp} HP**{p2_status}",
-            inline=True,
-        )
 
-        # Log
-        log_text = "\n".join(self.logs[-4:])
+def battle_embed(players, battle: Battle):
+    """HP bars and the last log lines (live duels and replays)."""
+
+    # Visualize HP Bars
+    def get_bar(curr, maxi):
+        ratio = max(0, curr / maxi)
+        filled = int(ratio * 10)
+        color = "🟩" if ratio > 0.5 else "🟨" if ratio > 0.2 else "🟥"
+        return color * filled + "⬛" * (10 - filled)
+
+    embed = discord.Embed(title="⚔️ Pokémon Battle", color=discord.Color.red())
+
+    for player, fighter in zip(players, battle.fighters):
+        status = ""
+        if fighter.ability in SHOWN_ABILITIES:
+            status = f" | Abil: {fighter.ability}"
         embed.add_field(
-            name="📜 Battle Log", value=f"```\n{log_text}\n```", inline=False
+            name=f"{player.name}'s {fighter.name}",
+            value=f"{get_bar(fighter.hp, fighter.max_hp)}\n**{int(fighter.hp)}/{fighter.max_hp} HP**{status}",
+            inline=True,
         )
 
-        turn_name = self.p1.name if self.turn == self.p1.id else self.p2.name
-        embed.set_footer(text=f"Waiting for {turn_name} to choose a move...")
-        return embed
+    # Log
+    log_text = "\n".join(list(battle.logs)[-4:])
+    embed.add_field(name="📜 Battle Log", value=f"```\n{log_text}\n```", inline=False)
+    return embed
 
 
 class Combat(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.duels = {}  # duel id -> Duel (recently active only)
+        self.dirty = set()  # Duel ids whose snapshot changed since the last flush
+        self.closed = set()  # Finished duels, deleted on the next flush
+        self.replays = []  # Rows for finished duels, appended on the next flush
+        self.thinking = set()  # PvE duels whose rival is searching right now
+        self.ai_pool = None
+
+    async def cog_load(self):
+        self.bot.add_dynamic_items(DuelButton)
+        # Search is CPU-bound: run it in processes, away from the event loop
+        self.ai_pool = ProcessPoolExecutor(max_workers=PVE_WORKERS)
+        self.flush_loop.start()
+        self.cleanup_loop.start()
+
+    async def cog_unload(self):
+        self.flush_loop.cancel()
+        self.cleanup_loop.cancel()
+        await self.flush_duels()
+        self.bot.remove_dynamic_items(DuelButton)
+        self.ai_pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- PVE ---
+    async def pve_turn(self, duel: Duel):
+        """Let the bot trainer search and play its move.
+
+        Callers add the duel to `thinking` before their first await, so two
+        clicks can't both start a search. True if the move ended the duel,
+        None if nothing was played (not the rival's turn, or the player
+        surrendered while it was thinking).
+        """
+        try:
+            if duel.battle.turn != PVE_SIDE or duel.battle.winner is not None:
+                return None
+            budget, mistake = PVE_LEVELS[duel.difficulty]
+            start = time.perf_counter()
+            slot, _ = await asyncio.get_running_loop().run_in_executor(
+                self.ai_pool,
+                partial(search_move, duel.battle.copy(), budget, mistake=mistake),
+            )
+            METRICS.since("pve.search", duel.difficulty, start)
+        finally:
+            self.thinking.discard(duel.id)
+        if duel.battle.winner is not None or duel.battle.turn != PVE_SIDE:
+            return None
+        finished = duel.battle.play(slot)
+        self.save_duel(duel)
+        return finished
+
+    # --- DUEL PERSISTENCE ---
+    def save_duel(self, duel: Duel):
+        duel.touched = time.monotonic()
+        self.dirty.add(duel.id)
+
+    def close_duel(self, duel: Duel):
+        if duel.id in self.closed:
+            return
+        self.duels.pop(duel.id, None)
+        self.dirty.discard(duel.id)
+        self.closed.add(duel.id)
+        battle = duel.battle
+        if battle.replay is not None:
+            (a, name_a), (b, name_b) = duel.players
+            mode = duel.mode or ("pve" if duel.difficulty else "duel")
+            self.replays.append(
+                (
+                    a,
+                    b,
+                    name_a,
+                    name_b,
+                    mode.split(":")[0],
+                    battle.winner,
+                    battle.turns,
+                    bytes(battle.replay),
+                )
+            )
+
+    async def get_duel(self, duel_id: str):
+        """The open duel with this id, reloaded from its snapshot if needed."""
+        if duel_id in self.closed:
+            return None
+        duel = self.duels.get(duel_id)
+        if duel is None:
+            async with self.bot.db.execute(
+                "SELECT state FROM duels WHERE id = ?", (duel_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            duel = self.duels.setdefault(duel_id, Duel.restore(duel_id, row[0]))
+        duel.touched = time.monotonic()
+        return duel
+
+    @tasks.loop(seconds=DUEL_FLUSH_INTERVAL)
+    async def flush_loop(self):
+        # Failed snapshots are requeued; raising would stop the loop for good
+        try:
+            await self.flush_duels()
+        except Exception as e:
+            print(f"Duel flush failed, retrying next time: {e}")
+
+    async def flush_duels(self):
+        """Write every changed snapshot (and drop finished duels) in one transaction."""
+        if not self.dirty and not self.closed and not self.replays:
+            return
+        now = int(time.time())
+        rows = [
+            (duel_id, self.duels[duel_id].snapshot(), now)
+            for duel_id in self.dirty
+            if duel_id in self.duels
+        ]
+        closed = [(duel_id,) for duel_id in self.closed]
+        replays, self.replays = self.replays, []
+        dirty, self.dirty = self.dirty, set()
+        finished, self.closed = self.closed, set()
+
+        try:
+            await self.write_duels(rows, closed, replays)
+        except Exception:
+            # Nothing was written: retry it all (with newer changes) next time
+            self.dirty |= dirty
+            self.closed |= finished
+            self.replays[:0] = replays
+            raise
+
+    async def write_duels(self, rows, closed, replays):
+        db = self.bot.db
+        async with transaction(db):
+            await db.executemany(
+                """
+                INSERT INTO duels (id, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    state = excluded.state, updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+            await db.executemany("DELETE FROM duels WHERE id = ?", closed)
+            await db.executemany(
+                """
+                INSERT INTO replays
+                    (player_a, player_b, name_a, name_b, mode, winner, turns, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                replays,
+            )
+
+    @tasks.loop(minutes=5)
+    async def cleanup_loop(self):
+        # Idle duels stay in the DB only; abandoned ones are dropped entirely
+        cutoff = time.monotonic() - DUEL_IDLE
+        for duel_id, duel in list(self.duels.items()):
+            if duel.touched < cutoff and duel_id not in self.dirty:
+                del self.duels[duel_id]
+        async with transaction(self.bot.db):
+            await self.bot.db.execute(
+                "DELETE FROM duels WHERE updated_at < ?",
+                (int(time.time()) - DUEL_EXPIRY,),
+            )
+
+    async def on_duel_click(self, interaction: discord.Interaction, duel_id, slot):
+        duel = await self.get_duel(duel_id)
+        if duel is None:
+            await interaction.response.send_message(
+                "⌛ This duel is over.", ephemeral=True
+            )
+            return
+        view = DuelView(self, duel)
+        if slot == "surrender":
+            await view.surrender(interaction)
+        else:
+            await view.handle_turn(interaction, int(slot))
 
     async def get_buddy_data(self, user_id, user_name):
         user_uuid = await get_or_create_uuid(self.bot.db, user_id, user_name)
@@ -551,17 +556,43 @@ class Combat(commands.Cog):
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
+                    return parse_battle_data(await resp.json())
+        return None
 
-                    # 1. Stats
-                    stats = {s["stat"]["name"]: s["base_stat"] for s in data["stats"]}
-                    # 2. Type (Primary)
-                    p_type = data["types"][0]["type"]["name"]
-                    # 3. Ability (First one)
-                    ability = data["abilities"][0]["ability"]["name"]
+    async def create_duel(self, p1, p2, mode=None):
+        """Start a duel between two (id, name) players: (duel, None) or (None, error)."""
+        # 1. Get Buddies
+        p1_base = await self.get_buddy_data(*p1)
+        p2_base = await self.get_buddy_data(*p2)
 
-                    return {"stats": stats, "type": p_type, "ability": ability}
-        return None
+        if not p1_base:
+            return None, f"❌ {p1[1]} has no buddy! `/pokemon buddy`"
+        if not p2_base:
+            return None, f"❌ {p2[1]} has no buddy!"
+
+        # 2. Fetch Full API Data (Stats, Type, Abilities)
+        p1_full, p2_full = await asyncio.gather(
+            self.fetch_full_data(p1_base["pokedex_id"]),
+            self.fetch_full_data(p2_base["pokedex_id"]),
+        )
+        if not p1_full or not p2_full:
+            return None, "❌ Could not load the battle. Try again."
+
+        # 3. Start Duel
+        duel = Duel(
+            uuid4().hex,
+            [p1, p2],
+            Battle({**p1_base, **p1_full}, {**p2_base, **p2_full}, record=True),
+            mode=mode,
+        )
+        self.duels[duel.id] = duel
+        self.save_duel(duel)
+        return duel, None
+
+    async def send_duel(self, channel, duel: Duel, content: str):
+        """Post a duel started outside a command (ranked matches, tournaments)."""
+        view = DuelView(self, duel)
+        await channel.send(content, embed=view.get_embed(), view=view)
 
     @app_commands.command(
         name="duel", description="Challenge a friend to a Real Pokemon Battle!"
@@ -574,34 +605,159 @@ class Combat(commands.Cog):
             return
 
         await interaction.response.defer()
+        duel, error = await self.create_duel(
+            (interaction.user.id, interaction.user.name), (opponent.id, opponent.name)
+        )
+        if error:
+            await interaction.followup.send(error)
+            return
+        view = DuelView(self, duel)
+        await interaction.followup.send(
+            f"⚔️ **BATTLE START!**\n{interaction.user.mention} 🆚 {opponent.mention}",
+            embed=view.get_embed(),
+            view=view,
+        )
+
+    @app_commands.command(
+        name="pve", description="Battle a bot trainer with your buddy"
+    )
+    @app_commands.choices(
+        difficulty=[
+            app_commands.Choice(name="Easy", value="easy"),
+            app_commands.Choice(name="Normal", value="normal"),
+            app_commands.Choice(name="Hard", value="hard"),
+        ]
+    )
+    async def pve(self, interaction: discord.Interaction, difficulty: str = "normal"):
+        await interaction.response.defer()
 
-        # 1. Get Buddies
         p1_base = await self.get_buddy_data(interaction.user.id, interaction.user.name)
-        p2_base = await self.get_buddy_data(opponent.id, opponent.name)
-
         if not p1_base:
             await interaction.followup.send("❌ Set a buddy first! `/pokemon buddy`")
             return
-        if not p2_base:
-            await interaction.followup.send(f"❌ {opponent.name} has no buddy!")
-            return
 
-        # 2. Fetch Full API Data (Stats, Type, Abilities)
-        p1_full = await self.fetch_full_data(p1_base["pokedex_id"])
-        p2_full = await self.fetch_full_data(p2_base["pokedex_id"])
-
-        # Merge Data
-        p1_data = {**p1_base, **p1_full}
-        p2_data = {**p2_base, **p2_full}
+        # The rival uses a random species the bot already knows the name of
+        rival_id = (
+            random.choice(list(SPECIES.names))
+            if SPECIES.names
+            else random.randint(1, MAX_SPECIES_ID)
+        )
+        p1_full, rival_full = await asyncio.gather(
+            self.fetch_full_data(p1_base["pokedex_id"]),
+            self.fetch_full_data(rival_id),
+        )
+        if not p1_full or not rival_full:
+            await interaction.followup.send("❌ Could not load the battle. Try again.")
+            return
 
-        # 3. Start Duel
-        view = DuelView(self.bot, interaction.user, opponent, p1_data, p2_data)
+        duel = Duel(
+            uuid4().hex,
+            [
+                (interaction.user.id, interaction.user.name),
+                (self.bot.user.id, "Rival"),
+            ],
+            Battle(
+                {**p1_base, **p1_full},
+                {"name": SPECIES.name(rival_id), **rival_full},
+                record=True,
+            ),
+            difficulty,
+        )
+        self.duels[duel.id] = duel
+        self.save_duel(duel)
+        view = DuelView(self, duel)
         await interaction.followup.send(
-            f"⚔️ **BATTLE START!**\n{interaction.user.mention} 🆚 {opponent.mention}",
+            f"🤖 **PVE BATTLE!** {interaction.user.mention} 🆚 Rival ({difficulty})",
             embed=view.get_embed(),
             view=view,
         )
 
+    @app_commands.command(name="replay", description="Watch a past battle again")
+    @app_commands.describe(
+        replay_id="Replay number (default: your latest battle)",
+        text="Send the whole battle as a text transcript instead",
+    )
+    async def show_replay(
+        self,
+        interaction: discord.Interaction,
+        replay_id: int | None = None,
+        text: bool = False,
+    ):
+        await interaction.response.defer()
+        await self.flush_duels()  # A battle that just ended may not be written yet
+        query = "SELECT id, name_a, name_b, winner, turns, data FROM replays"
+        if replay_id is None:
+            query += " WHERE player_a = ? OR player_b = ? ORDER BY id DESC LIMIT 1"
+            params = (interaction.user.id, interaction.user.id)
+        else:
+            query += " WHERE id = ?"
+            params = (replay_id,)
+        async with self.bot.db.execute(query, params) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            await interaction.followup.send("❌ No replay found.")
+            return
+        replay_id, name_a, name_b, winner, turns, data = row
+        players = (Player(None, name_a), Player(None, name_b))
+        if winner is None:
+            result = "Unfinished"
+        elif winner == -1:
+            result = "Draw"
+        else:
+            result = f"{players[winner].name} won"
+
+        try:
+            if text:
+                lines = await asyncio.to_thread(transcript, data)
+                body = f"Replay #{replay_id}: {name_a} vs {name_b} ({result})\n\n"
+                await interaction.followup.send(
+                    f"📼 Replay #{replay_id} • {turns} turns • {len(data)} bytes",
+                    file=discord.File(
+                        io.BytesIO((body + "\n".join(lines)).encode()),
+                        filename=f"replay-{replay_id}.txt",
+                    ),
+                )
+                return
+
+            # Animated: one embed edited every REPLAY_DELAY seconds
+            step = max(1, -(-turns // REPLAY_FRAMES))
+            message = None
+            for battle in replay(data):
+                if battle.turns % step and battle.winner is None:
+                    continue
+                embed = battle_embed(players, battle)
+                embed.title = f"📼 Replay #{replay_id}"
+                embed.set_footer(
+                    text=f"Turn {battle.turns}/{turns}"
+                    + (f" • {result}" if battle.turns == turns else "")
+                )
+                if message is None:
+                    message = await interaction.followup.send(embed=embed, wait=True)
+                else:
+                    await asyncio.sleep(REPLAY_DELAY)
+                    await message.edit(embed=embed)
+        except ValueError:  # Recorded with different move or type data
+            await interaction.followup.send(
+                "❌ This replay no longer matches the battle rules."
+            )
+
+    @app_commands.command(
+        name="duelstats", description="ADMIN: Open duels and their memory use"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def duel_stats(self, interaction: discord.Interaction):
+        async with self.bot.db.execute("SELECT COUNT(*) FROM duels") as cursor:
+            (stored,) = await cursor.fetchone()
+        sizes = [footprint(duel) for duel in self.duels.values()]
+        average = sum(sizes) / len(sizes) if sizes else 0
+        await interaction.response.send_message(
+            f"⚔️ **Duels**\n"
+            f"In memory: **{len(sizes)}** • {average / 1024:.1f} KiB each, "
+            f"{sum(sizes) / 1024:.1f} KiB total\n"
+            f"Saved snapshots: **{stored}** • Waiting to be written: **{len(self.dirty)}**",
+            ephemeral=True,
+        )
+
 
 async def setup(bot):
     await bot.add_cog(Combat(bot))
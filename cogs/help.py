@@ -2,6 +2,8 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from utils.gacha import DEFAULT_RATES
+
 
 # --- THE DROPDOWN MENU ---
 class HelpSelect(discord.ui.Select):
@@ -43,8 +45,14 @@ class HelpSelect(discord.ui.Select):
                     "`/pokemon pull [amount]` - Summon 1-10 Pokémon\n"
                     "`/pokemon daily` - Claim 5 Free Pulls (24h Cooldown)\n"
                     "`/pokemon box` - View your Pokémon & **Unique IDs**\n"
-                    "`/pokemon trade` - Trade with a friend\n"
+                    "`/pokemon evolve <name|all>` - Merge 3 duplicates into an evolution\n"
+                    "`/pokemon trade` - Trade Pokémon (several at once) and coins\n"
                     "`/pokemon pokedex` - View collection progress\n"
+                    "`/pokemon compare` - Compare Pokédex with a friend\n"
+                    "Chat in a server to make wild Pokémon appear - first to catch keeps it\n"
+                    "`/raid start` - (Admin) Summon a raid boss, everyone attacks with their buddy\n"
+                    "`/ranked queue|ladder|rating` - Rated battles; `/ranked join` for tournaments\n"
+                    "`/replay [id] [text]` - Watch your last battle again (or read its transcript)\n"
                 ),
                 inline=False,
             )
@@ -54,6 +62,8 @@ class HelpSelect(discord.ui.Select):
                     "`/pokemon balance` - Check Coins & Pulls\n"
                     "`/pokemon shop` - Buy Pulls (100 Coins)\n"
                     "`/pokemon release` - Sell Pokémon for 20 Coins\n"
+                    "`/pokemon release duplicates` - Sell all spares, keep one of each\n"
+                    "`/market buy|sell|book|orders|cancel` - Trade with other players\n"
                 ),
                 inline=False,
             )
@@ -71,15 +81,28 @@ class HelpSelect(discord.ui.Select):
                 "The Gacha system uses real-time RNG. Here are the odds:"
             )
 
-            embed.add_field(name="⚪ Common Pull", value="**93%** Chance", inline=True)
+            # Read the live rate table so this page can't drift from the engine
+            game = interaction.client.get_cog("PokemonGame")
+            rates = game.gacha.rates if game else DEFAULT_RATES
+
+            def odds(chance):
+                if not chance:
+                    return "**0%** Chance"
+                return f"**{chance:.0%}** Chance (1 in {round(1 / chance)})"
+
+            embed.add_field(
+                name="⚪ Common Pull",
+                value=f"**{rates.tiers.get('common', 0):.0%}** Chance",
+                inline=True,
+            )
             embed.add_field(
                 name="🔥 Legendary Pull",
-                value="**5%** Chance (1 in 20)\n*Includes Mewtwo, Rayquaza, Arceus, etc.*",
+                value=f"{odds(rates.tiers.get('legendary', 0))}\n*Includes Mewtwo, Rayquaza, Arceus, etc.*",
                 inline=True,
             )
             embed.add_field(
                 name="✨ Shiny Chance",
-                value="**2%** Chance (1 in 50)\n*Any Pokémon (Common or Legendary) can be Shiny.*",
+                value=f"{odds(rates.shiny_chance)}\n*Any Pokémon (Common or Legendary) can be Shiny.*",
                 inline=False,
             )
 
@@ -117,7 +140,7 @@ class HelpSelect(discord.ui.Select):
             )
             embed.add_field(
                 name="How to get Coins?",
-                value="• **Release Duplicates:** `/pokemon release` gives 20 coins.\n• **Daily:** `/pokemon daily` gives coins + pulls.",
+                value="• **Release Duplicates:** `/pokemon release` gives 20 coins (`duplicates` sells every spare at once).\n• **Daily:** `/pokemon daily` gives coins + pulls.",
                 inline=False,
             )
             embed.add_field(
@@ -1,10 +1,18 @@
+import asyncio
 import random
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
-from utils.database import get_or_create_uuid
+from utils.database import get_or_create_uuid, transaction
+from utils.images import (
+    cache_avatar,
+    get_cached_avatar,
+    prepare_avatar,
+    render_rank_card,
+)
+from utils.leaderboard import XPBuckets
 
 
 class Leveling(commands.Cog):
@@ -14,6 +22,23 @@ class Leveling(commands.Cog):
         self._cd = commands.CooldownMapping.from_cooldown(
             1, 60.0, commands.BucketType.user
         )
+        # Daily/Weekly/Monthly XP, buffered and written in batches
+        self.xp_buckets = XPBuckets()
+
+    async def cog_load(self):
+        self.flush_buckets.start()
+
+    async def cog_unload(self):
+        self.flush_buckets.cancel()
+        await self.xp_buckets.flush(self.bot.db)
+
+    @tasks.loop(seconds=30)
+    async def flush_buckets(self):
+        # A failed batch stays buffered; raising here would stop the loop for good
+        try:
+            await self.xp_buckets.flush(self.bot.db)
+        except Exception as e:
+            print(f"XP flush failed, retrying next time: {e}")
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -33,7 +58,7 @@ class Leveling(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message(self, message):
-        if message.author.bot:
+        if message.author.bot or message.guild is None:
             return
 
         # Check cooldown (prevents spamming for XP)
@@ -50,8 +75,10 @@ class Leveling(commands.Cog):
 
     async def add_xp(self, db, user_uuid, user, guild, channel):
         xp_to_add = random.randint(15, 35)
+        self.xp_buckets.record(guild.id, user_uuid, xp_to_add)
 
-        async with db.cursor() as cursor:
+        new_level = None
+        async with transaction(db), db.cursor() as cursor:
             await cursor.execute(
                 "SELECT xp, level FROM levels WHERE user_uuid = ?", (user_uuid,)
             )
@@ -76,12 +103,6 @@ class Leveling(commands.Cog):
                         "INSERT INTO game_profile (user_uuid, available_pulls, coins) VALUES (?, 1, 0) ON CONFLICT(user_uuid) DO UPDATE SET available_pulls = available_pulls + 1",
                         (user_uuid,),
                     )
-
-                    # Send Level Up Message
-                    await channel.send(
-                        f"🎉 {user.mention} has reached **Level {new_level}**! \n🎁 **Bonus:** +1 Pull added."
-                    )
-
                     await cursor.execute(
                         "UPDATE levels SET xp = ?, level = ? WHERE user_uuid = ?",
                         (remaining_xp, new_level, user_uuid),
@@ -92,8 +113,11 @@ class Leveling(commands.Cog):
                         (new_xp, user_uuid),
                     )
 
-        # IMPORTANT: Commit changes using the shared connection
-        await db.commit()
+        # Send Level Up Message (after the commit: no Discord calls inside a write)
+        if new_level is not None:
+            await channel.send(
+                f"🎉 {user.mention} has reached **Level {new_level}**! \n🎁 **Bonus:** +1 Pull added."
+            )
 
     # --- COMMANDS ---
 
@@ -121,45 +145,77 @@ class Leveling(commands.Cog):
         current_xp, level = result
         xp_needed_total = self.calculate_xp_for_next_level(level)
 
-        # Calculate progress bar
-        percentage = min(1.0, max(0.0, current_xp / xp_needed_total))
-        blocks = int(percentage * 10)
-        bar = "🟦" * blocks + "⬜" * (10 - blocks)
+        await interaction.response.defer()
 
-        embed = discord.Embed(title=f"Rank: {target.name}", color=discord.Color.blue())
-        embed.add_field(name="Level", value=f"**{level}**", inline=True)
-        embed.add_field(
-            name="XP Progress", value=f"{current_xp} / {xp_needed_total}", inline=True
-        )
-        embed.add_field(
-            name="Progress", value=f"{bar} {int(percentage * 100)}%", inline=False
-        )
-        embed.set_thumbnail(
-            url=target.avatar.url if target.avatar else target.default_avatar.url
+        # Server Rank (same ordering as /xp leaderboard)
+        async with db.cursor() as cursor:
+            await cursor.execute(
+                "SELECT COUNT(*) + 1 FROM levels WHERE level > ? OR (level = ? AND xp > ?)",
+                (level, level, current_xp),
+            )
+            (server_rank,) = await cursor.fetchone()
+
+        # Avatars are decoded once per avatar hash, then reused
+        asset = target.display_avatar.with_size(256)
+        avatar = get_cached_avatar(asset.key)
+        if avatar is None:
+            try:
+                avatar = await asyncio.to_thread(prepare_avatar, await asset.read())
+                cache_avatar(asset.key, avatar)
+            except (discord.HTTPException, OSError):
+                avatar = None
+
+        card = await asyncio.to_thread(
+            render_rank_card,
+            avatar,
+            target.name,
+            level,
+            server_rank,
+            current_xp,
+            xp_needed_total,
         )
-
-        await interaction.response.send_message(embed=embed)
+        file = discord.File(card, filename="rank.jpg")
+        await interaction.followup.send(file=file)
 
     @xp_group.command(name="leaderboard", description="See the top users")
-    async def leaderboard(self, interaction: discord.Interaction):
+    @app_commands.choices(
+        period=[
+            app_commands.Choice(name="All Time", value="all"),
+            app_commands.Choice(name="Today", value="daily"),
+            app_commands.Choice(name="This Week", value="weekly"),
+            app_commands.Choice(name="This Month", value="monthly"),
+        ]
+    )
+    async def leaderboard(
+        self,
+        interaction: discord.Interaction,
+        period: app_commands.Choice[str] = None,
+    ):
         await interaction.response.defer()
 
         db = self.bot.db
 
-        async with db.cursor() as cursor:
-            await cursor.execute("""
-                    SELECT users.username, levels.level, levels.xp
-                    FROM levels
-                    JOIN users ON levels.user_uuid = users.user_uuid
-                    ORDER BY levels.level DESC, levels.xp DESC LIMIT 10
-                """)
-            rows = await cursor.fetchall()
+        if period and period.value != "all":
+            await self.xp_buckets.flush(db)
+            rows = await self.xp_buckets.top(db, interaction.guild.id, period.value)
+            title = f"🏆 Server Leaderboard ({period.name})"
+            rows = [(username, None, xp) for username, xp in rows]
+        else:
+            async with db.cursor() as cursor:
+                await cursor.execute("""
+                        SELECT users.username, levels.level, levels.xp
+                        FROM levels
+                        JOIN users ON levels.user_uuid = users.user_uuid
+                        ORDER BY levels.level DESC, levels.xp DESC LIMIT 10
+                    """)
+                rows = await cursor.fetchall()
+            title = "🏆 Server Leaderboard"
 
         if not rows:
             await interaction.followup.send("No data found!")
             return
 
-        embed = discord.Embed(title="🏆 Server Leaderboard", color=discord.Color.gold())
+        embed = discord.Embed(title=title, color=discord.Color.gold())
         description = ""
 
         for index, row in enumerate(rows, start=1):
@@ -175,7 +231,10 @@ class Leveling(commands.Cog):
                 if index == 3
                 else f"#{index}"
             )
-            description += f"{medal} **{name}** — Lv {level} ({xp} XP)\n"
+            if level is None:
+                description += f"{medal} **{name}** — {xp} XP\n"
+            else:
+                description += f"{medal} **{name}** — Lv {level} ({xp} XP)\n"
 
         embed.description = description
         await interaction.followup.send(embed=embed)
@@ -0,0 +1,359 @@
+from collections import defaultdict
+
+import aiohttp
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from utils.autocomplete import OWNED, SPECIES_NAMES
+from utils.database import get_or_create_uuid, transaction
+from utils.inventory import add_pokemon, take_units
+from utils.market import BUY, SELL, Order, OrderBook
+from utils.species import SPECIES, mark_caught, refresh_lost
+
+# --- CONFIGURATION ---
+MARKET_FEE = 0.05  # Taken from the seller's coins on every fill (coin sink)
+MAX_PRICE = 1_000_000
+MAX_QUANTITY = 100
+MAX_OPEN_ORDERS = 25  # Per player
+
+
+class Market(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.book = OrderBook()
+        self.pending_fills = []  # Matched in memory, not written yet
+
+    async def cog_load(self):
+        await self.rebuild_book()
+        self.flush_loop.start()
+
+    async def cog_unload(self):
+        self.flush_loop.cancel()
+        await self.flush_fills()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print("Market Cog is ready.")
+
+    # --- ORDER BOOK PERSISTENCE ---
+    async def rebuild_book(self):
+        """Replay open orders in id order (re-matches fills lost in a restart)."""
+        async with self.bot.db.execute(
+            """
+            SELECT id, user_uuid, side, pokemon_id, is_shiny, price, remaining
+            FROM market_orders WHERE remaining > 0 ORDER BY id
+            """
+        ) as cursor:
+            rows = await cursor.fetchall()
+        for row in rows:
+            self.pending_fills.extend(self.book.submit(Order(*row)))
+        await self.flush_fills()
+        print(f"--- Market: {len(self.book)} open orders ---")
+
+    @tasks.loop(seconds=5)
+    async def flush_loop(self):
+        # Failed fills are queued again; raising here would stop the loop for good
+        try:
+            await self.flush_fills()
+        except Exception as e:
+            print(f"Market flush failed, retrying next time: {e}")
+
+    async def flush_fills(self):
+        """Write all matched fills in one transaction."""
+        if not self.pending_fills:
+            return
+        fills, self.pending_fills = self.pending_fills, []
+
+        orders = {}
+        coins = defaultdict(int)
+        received = defaultdict(int)  # (buyer, pokemon_id, is_shiny) -> quantity
+        for fill in fills:
+            orders[fill.buy.id] = fill.buy
+            orders[fill.sell.id] = fill.sell
+            proceeds = fill.price * fill.quantity
+            coins[fill.sell.user_uuid] += proceeds - int(proceeds * MARKET_FEE)
+            # Buyers escrowed their own limit price, refund the difference
+            coins[fill.buy.user_uuid] += (fill.buy.price - fill.price) * fill.quantity
+            received[(fill.buy.user_uuid, *fill.buy.key)] += fill.quantity
+
+        db = self.bot.db
+        try:
+            async with transaction(db):
+                await db.executemany(
+                    "INSERT INTO market_fills (buy_order_id, sell_order_id, price, quantity) VALUES (?, ?, ?, ?)",
+                    [(f.buy.id, f.sell.id, f.price, f.quantity) for f in fills],
+                )
+                # Absolute values from memory: the book is the source of truth
+                await db.executemany(
+                    "UPDATE market_orders SET remaining = ? WHERE id = ?",
+                    [(order.remaining, order.id) for order in orders.values()],
+                )
+                await db.executemany(
+                    """
+                    INSERT INTO game_profile (user_uuid, coins) VALUES (?, ?)
+                    ON CONFLICT(user_uuid) DO UPDATE SET coins = coins + excluded.coins
+                    """,
+                    [(user, amount) for user, amount in coins.items() if amount],
+                )
+                await add_pokemon(
+                    db,
+                    [
+                        (
+                            buyer,
+                            pokemon_id,
+                            SPECIES.name(pokemon_id),
+                            is_shiny,
+                            SPECIES.is_legendary(pokemon_id),
+                            quantity,
+                        )
+                        for (buyer, pokemon_id, is_shiny), quantity in received.items()
+                    ],
+                )
+                for buyer, pokemon_id, _ in received:
+                    await mark_caught(db, buyer, [pokemon_id])
+        except Exception:
+            # Nothing was written: keep the fills (and their escrow) for the next flush
+            self.pending_fills[:0] = fills
+            raise
+
+        if not received:
+            return
+        # Buyers' boxes changed; autocomplete caches are keyed by Discord ID
+        async with db.execute(
+            f"SELECT discord_id FROM users WHERE user_uuid IN ({','.join('?' * len(received))})",
+            list({buyer for buyer, _, _ in received}),
+        ) as cursor:
+            OWNED.invalidate(*(row[0] for row in await cursor.fetchall()))
+
+    market_group = app_commands.Group(name="market", description="Player Market")
+
+    # --- POSTING ORDERS ---
+    async def place_order(
+        self,
+        interaction: discord.Interaction,
+        side: str,
+        species: str,
+        price: int,
+        quantity: int,
+        shiny: bool,
+    ):
+        await interaction.response.defer()
+        db = self.bot.db
+        user_uuid = await get_or_create_uuid(
+            db, interaction.user.id, interaction.user.name
+        )
+        pokemon_id = SPECIES.id_of(species)
+        if pokemon_id is None:
+            await interaction.followup.send(f"❌ Unknown species **{species}**.")
+            return
+        if pokemon_id not in SPECIES.names:  # Learn its name before storing it
+            game = self.bot.get_cog("PokemonGame")
+            try:
+                async with aiohttp.ClientSession() as session:
+                    await game.fetch_pokemon(session, pokemon_id, False, False)
+            except aiohttp.ClientError:
+                pass
+            if pokemon_id not in SPECIES.names:
+                await interaction.followup.send(
+                    "❌ PokeAPI is not responding, try again later."
+                )
+                return
+        name = SPECIES.name(pokemon_id)
+
+        async with db.execute(
+            "SELECT COUNT(*) FROM market_orders WHERE user_uuid = ? AND remaining > 0",
+            (user_uuid,),
+        ) as cursor:
+            (open_orders,) = await cursor.fetchone()
+        if open_orders >= MAX_OPEN_ORDERS:
+            await interaction.followup.send(
+                f"❌ You already have **{MAX_OPEN_ORDERS}** open orders."
+            )
+            return
+
+        # Escrow first: sold Pokémon leave the box, bid coins leave the balance
+        error = None
+        async with transaction(db):
+            if side == SELL:
+                taken, available = await take_units(
+                    db, user_uuid, name, quantity, is_shiny=shiny
+                )
+                if not taken:
+                    error = f"❌ You only have **{available}** {name} to sell."
+                else:
+                    await refresh_lost(db, user_uuid, [pokemon_id])
+            else:
+                cost = price * quantity
+                cursor = await db.execute(
+                    "UPDATE game_profile SET coins = coins - ? WHERE user_uuid = ? AND coins >= ?",
+                    (cost, user_uuid, cost),
+                )
+                if cursor.rowcount != 1:
+                    error = f"❌ You need **{cost} Coins** for this order."
+            if error is None:
+                cursor = await db.execute(
+                    """
+                    INSERT INTO market_orders
+                        (user_uuid, side, pokemon_id, is_shiny, price, quantity, remaining)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (user_uuid, side, pokemon_id, shiny, price, quantity, quantity),
+                )
+                order_id = cursor.lastrowid
+        if error:
+            await interaction.followup.send(error)
+            return
+        if side == SELL:
+            OWNED.invalidate(interaction.user.id)
+
+        order = Order(order_id, user_uuid, side, pokemon_id, shiny, price, quantity)
+        fills = self.book.submit(order)
+        self.pending_fills.extend(fills)
+
+        filled = quantity - order.remaining
+        label = f"{'✨ ' if shiny else ''}{name}"
+        verb = "Buy" if side == BUY else "Sell"
+        msg = f"📈 {verb} order `#{order_id}`: **{quantity}x {label}** at **{price}** each."
+        if filled:
+            msg += f"\n✅ **{filled}** filled right away."
+        if order.remaining:
+            msg += f"\n⏳ **{order.remaining}** waiting on the book."
+        await interaction.followup.send(msg)
+
+    @market_group.command(name="sell", description="Offer Pokémon for coins")
+    @app_commands.describe(price="Coins per Pokémon", shiny="Sell shinies")
+    async def sell(
+        self,
+        interaction: discord.Interaction,
+        species: str,
+        price: app_commands.Range[int, 1, MAX_PRICE],
+        quantity: app_commands.Range[int, 1, MAX_QUANTITY] = 1,
+        shiny: bool = False,
+    ):
+        await self.place_order(interaction, SELL, species, price, quantity, shiny)
+
+    @market_group.command(name="buy", description="Bid coins for Pokémon")
+    @app_commands.describe(price="Max coins per Pokémon", shiny="Buy shinies")
+    async def buy(
+        self,
+        interaction: discord.Interaction,
+        species: str,
+        price: app_commands.Range[int, 1, MAX_PRICE],
+        quantity: app_commands.Range[int, 1, MAX_QUANTITY] = 1,
+        shiny: bool = False,
+    ):
+        await self.place_order(interaction, BUY, species, price, quantity, shiny)
+
+    # --- VIEWING / CANCELLING ---
+    @market_group.command(name="book", description="Best prices for a species")
+    async def show_book(
+        self, interaction: discord.Interaction, species: str, shiny: bool = False
+    ):
+        pokemon_id = SPECIES.id_of(species)
+        if pokemon_id is None:
+            await interaction.response.send_message(
+                f"❌ Unknown species **{species}**.", ephemeral=True
+            )
+            return
+        bids, asks = self.book.depth(pokemon_id, shiny)
+
+        def levels(rows):
+            return "\n".join(f"**{p}** 🪙 × {q}" for p, q in rows) or "*None*"
+
+        embed = discord.Embed(
+            title=f"📊 {'✨ ' if shiny else ''}{SPECIES.name(pokemon_id)}",
+            color=discord.Color.gold(),
+        )
+        embed.add_field(name="Buyers", value=levels(bids), inline=True)
+        embed.add_field(name="Sellers", value=levels(asks), inline=True)
+        embed.set_footer(text=f"{MARKET_FEE:.0%} fee on sales")
+        await interaction.response.send_message(embed=embed)
+
+    @sell.autocomplete("species")
+    @buy.autocomplete("species")
+    @show_book.autocomplete("species")
+    async def species_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in SPECIES_NAMES.complete(current)
+        ]
+
+    @market_group.command(name="orders", description="Your open orders")
+    async def my_orders(self, interaction: discord.Interaction):
+        user_uuid = await get_or_create_uuid(
+            self.bot.db, interaction.user.id, interaction.user.name
+        )
+        mine = sorted(
+            (o for o in self.book.orders.values() if o.user_uuid == user_uuid),
+            key=lambda o: o.id,
+        )
+        if not mine:
+            await interaction.response.send_message(
+                "You have no open orders.", ephemeral=True
+            )
+            return
+        lines = [
+            f"`#{o.id}` {o.side.upper()} {o.remaining}x "
+            f"{'✨ ' if o.is_shiny else ''}{SPECIES.name(o.pokemon_id)} @ {o.price}"
+            for o in mine
+        ]
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+    @market_group.command(name="cancel", description="Cancel an open order")
+    async def cancel(self, interaction: discord.Interaction, order_id: int):
+        await interaction.response.defer(ephemeral=True)
+        db = self.bot.db
+        user_uuid = await get_or_create_uuid(
+            db, interaction.user.id, interaction.user.name
+        )
+        order = self.book.orders.get(order_id)
+        if order is None or order.user_uuid != user_uuid:
+            await interaction.followup.send("❌ No open order with that ID.")
+            return
+
+        await self.flush_fills()  # Fills so far are written before the refund
+        left = self.book.cancel(order_id)
+        if left is None:  # Filled while the fills were being written
+            await interaction.followup.send("ℹ️ That order was just filled.")
+            return
+        async with transaction(db):
+            await db.execute(
+                "UPDATE market_orders SET remaining = 0, cancelled = 1 WHERE id = ?",
+                (order_id,),
+            )
+            if left.side == SELL:
+                await add_pokemon(
+                    db,
+                    [
+                        (
+                            user_uuid,
+                            left.pokemon_id,
+                            SPECIES.name(left.pokemon_id),
+                            left.is_shiny,
+                            SPECIES.is_legendary(left.pokemon_id),
+                            left.remaining,
+                        )
+                    ],
+                )
+                await mark_caught(db, user_uuid, [left.pokemon_id])
+            else:
+                await db.execute(
+                    "UPDATE game_profile SET coins = coins + ? WHERE user_uuid = ?",
+                    (left.price * left.remaining, user_uuid),
+                )
+        OWNED.invalidate(interaction.user.id)
+        refund = (
+            f"{left.remaining}x {SPECIES.name(left.pokemon_id)}"
+            if left.side == SELL
+            else f"{left.price * left.remaining} Coins"
+        )
+        await interaction.followup.send(
+            f"🗑️ Order `#{order_id}` cancelled, **{refund}** returned."
+        )
+
+
+async def setup(bot):
+    await bot.add_cog(Market(bot))
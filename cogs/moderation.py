@@ -2,13 +2,31 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from utils.data_manager import get_guild_data
-from utils.database import get_or_create_uuid
+from utils.data_manager import GUILD_SETTINGS, get_guild_settings
+from utils.database import get_or_create_uuid, transaction
 
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Resolved log channels (guild_id -> channel), dropped when the setting changes
+        self._log_channels = {}
+        GUILD_SETTINGS.subscribe("log_channel_id", self._on_log_channel_changed)
+
+    async def cog_unload(self):
+        GUILD_SETTINGS.unsubscribe("log_channel_id", self._on_log_channel_changed)
+
+    def _on_log_channel_changed(self, settings, old_channel_id):
+        self._log_channels.pop(settings.guild_id, None)
+
+    async def get_log_channel(self, guild: discord.Guild):
+        if guild.id not in self._log_channels:
+            settings = await get_guild_settings(guild.id)
+            channel_id = settings.log_channel_id
+            self._log_channels[guild.id] = (
+                guild.get_channel(channel_id) if channel_id else None
+            )
+        return self._log_channels[guild.id]
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -26,10 +44,10 @@ class Moderation(commands.Cog):
         action_type: str,
         reason: str,
     ):
-        target_uuid = await get_or_create_uuid(user_id)
-        mod_uuid = await get_or_create_uuid(mod_id)
+        target_uuid = await get_or_create_uuid(self.bot.db, user_id)
+        mod_uuid = await get_or_create_uuid(self.bot.db, mod_id)
 
-        async with self.bot.db.cursor() as cursor:
+        async with transaction(self.bot.db), self.bot.db.cursor() as cursor:
             await cursor.execute(
                 """
                 INSERT INTO mod_logs (target_uuid, mod_uuid, action_type, reason)
@@ -37,23 +55,18 @@ class Moderation(commands.Cog):
             """,
                 (target_uuid, mod_uuid, action_type, reason),
             )
-        await self.bot.db.commit()
-
-        data = get_guild_data(guild.id)
-        channel_id = data["settings"].get("log_channel_id")
-
-        if channel_id:
-            channel = guild.get_channel(channel_id)
-            if channel:
-                embed = discord.Embed(
-                    title=f"Action: {action_type}", color=discord.Color.red()
-                )
-                embed.add_field(name="User", value=f"<@{user_id}>", inline=True)
-                embed.add_field(name="Moderator", value=f"<@{mod_id}>", inline=True)
-                embed.add_field(name="Reason", value=reason, inline=False)
-                embed.set_footer(text=f"UUID: {target_uuid}")
-                embed.timestamp = discord.utils.utcnow()
-                await channel.send(embed=embed)
+
+        channel = await self.get_log_channel(guild)
+        if channel:
+            embed = discord.Embed(
+                title=f"Action: {action_type}", color=discord.Color.red()
+            )
+            embed.add_field(name="User", value=f"<@{user_id}>", inline=True)
+            embed.add_field(name="Moderator", value=f"<@{mod_id}>", inline=True)
+            embed.add_field(name="Reason", value=reason, inline=False)
+            embed.set_footer(text=f"UUID: {target_uuid}")
+            embed.timestamp = discord.utils.utcnow()
+            await channel.send(embed=embed)
 
     # --- COMMANDS (Attached to mod_group) ---
 
@@ -125,7 +138,7 @@ class Moderation(commands.Cog):
 
     @mod_group.command(name="history", description="View a user's moderation history")
     async def history(self, interaction: discord.Interaction, member: discord.Member):
-        target_uuid = await get_or_create_uuid(member.id)
+        target_uuid = await get_or_create_uuid(self.bot.db, member.id)
 
         async with self.bot.db.cursor() as cursor:
             await cursor.execute(
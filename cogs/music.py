@@ -1,17 +1,35 @@
 import asyncio
+import threading
+import time
+from collections import Counter
+from functools import partial
 
 import discord
 import yt_dlp
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
+
+from utils.metrics import METRICS
+from utils.music import (
+    CLOSED,
+    IDLE_TIMEOUT,
+    ExtractionPool,
+    GuildPlayer,
+    StreamCache,
+    is_playlist,
+    placeholders,
+    stream_expiry,
+)
 
 
 class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.queue = []
-        self.is_playing = False
-        self.current_song = None
+        self.players = {}  # guild_id -> GuildPlayer, created on first use
+        self.cache = StreamCache()
+        # (guild_id, cache key) -> extraction in flight, shared by that guild's callers
+        self.resolving = {}
+        self.waiters = Counter()  # (guild_id, cache key) -> callers awaiting it
 
         # Optimization for speed
         self.ytdl_opts = {
@@ -22,6 +40,13 @@ class Music(commands.Cog):
             "no_warnings": True,
             "skip_download": True,
             "no_check_certificate": True,
+            "socket_timeout": 10,  # A stuck request can't hold a worker for long
+        }
+        # Playlists: one request lists every entry (title and page URL only)
+        self.playlist_opts = {
+            **self.ytdl_opts,
+            "noplaylist": False,
+            "extract_flat": "in_playlist",
         }
 
         # Network optimization
@@ -30,7 +55,19 @@ class Music(commands.Cog):
             "options": "-vn",
         }
 
-        self.ytdl = yt_dlp.YoutubeDL(self.ytdl_opts)
+        # YoutubeDL isn't thread-safe: each extraction worker builds its own
+        self.local = threading.local()
+        self.extractor = ExtractionPool()
+
+    async def cog_load(self):
+        self.cleanup_loop.start()
+
+    async def cog_unload(self):
+        self.cleanup_loop.cancel()
+        for player in list(self.players.values()):
+            await player.close()
+        self.players.clear()
+        self.extractor.shutdown()
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -38,23 +75,35 @@ class Music(commands.Cog):
 
     music_group = app_commands.Group(name="music", description="Music commands")
 
-    # --- AUTO-DISCONNECT LOGIC ---
-    async def check_inactivity(self, interaction):
-        """Waits 3 minutes. If still not playing, disconnects."""
-        await asyncio.sleep(180)  # 3 Minutes
-
-        voice_client = interaction.guild.voice_client
-        # If connected, queue is empty, and audio is not playing
-        if (
-            voice_client
-            and voice_client.is_connected()
-            and not voice_client.is_playing()
-            and len(self.queue) == 0
-        ):
-            await voice_client.disconnect()
-            await interaction.channel.send(
-                "💤 Left the voice channel due to inactivity."
+    # --- PLAYERS ---
+    def get_player(self, guild) -> GuildPlayer:
+        player = self.players.get(guild.id)
+        if player is None or player.state == CLOSED:
+            player = self.players[guild.id] = GuildPlayer(
+                guild.id,
+                self.bot.loop,
+                lambda song: discord.FFmpegPCMAudio(song["source"], **self.ffmpeg_opts),
+                partial(self.refresh, guild.id),
             )
+        return player
+
+    # --- AUTO-DISCONNECT LOGIC ---
+    @tasks.loop(minutes=1)
+    async def cleanup_loop(self):
+        """Players idle for IDLE_TIMEOUT leave their voice channel and are dropped."""
+        now = time.monotonic()
+        for guild_id, player in list(self.players.items()):
+            if player.state != CLOSED and player.idle_for(now) < IDLE_TIMEOUT:
+                continue
+            del self.players[guild_id]
+            if player.state == CLOSED:
+                continue
+            was_connected = player.voice is not None and player.voice.is_connected()
+            await player.close()
+            if was_connected and player.channel:
+                await player.channel.send(
+                    "💤 Left the voice channel due to inactivity."
+                )
 
     # --- CORE PLAYER ---
     def get_stream_source(self, query):
@@ -62,48 +111,95 @@ class Music(commands.Cog):
             if not query.startswith("http"):
                 query = f"ytsearch1:{query}"
 
-            data = self.ytdl.extract_info(query, download=False)
+            ytdl = getattr(self.local, "ytdl", None)
+            if ytdl is None:
+                ytdl = self.local.ytdl = yt_dlp.YoutubeDL(self.ytdl_opts)
+            data = ytdl.extract_info(query, download=False)
 
             if "entries" in data:
                 data = data["entries"][0]
 
-            return {"source": data["url"], "title": data["title"]}
+            return {
+                "source": data["url"],
+                "title": data["title"],
+                "url": data.get("webpage_url"),
+            }
         except Exception as e:
             print(f"Error finding song: {e}")
             return None
 
-    def play_next(self, interaction):
-        if len(self.queue) > 0:
-            self.is_playing = True
+    def get_playlist(self, url):
+        """(title, entries) of a playlist, without resolving any of its songs."""
+        try:
+            ytdl = getattr(self.local, "playlist_ytdl", None)
+            if ytdl is None:
+                ytdl = self.local.playlist_ytdl = yt_dlp.YoutubeDL(self.playlist_opts)
+            data = ytdl.extract_info(url, download=False)
+            songs = placeholders(data.get("entries") or ())
+            return data.get("title") or "Playlist", songs
+        except Exception as e:
+            print(f"Error loading playlist: {e}")
+            return None
 
-            song = self.queue.pop(0)
-            self.current_song = song["title"]
+    @staticmethod
+    def cache_key(query: str) -> str:
+        query = query.strip()
+        return query if query.startswith("http") else f"ytsearch1:{query.lower()}"
 
-            voice_client = interaction.guild.voice_client
+    async def resolve(self, guild_id: int, query: str):
+        """Song for a search or URL: cached until its stream URL expires, else yt-dlp."""
+        start = time.perf_counter()
+        key = self.cache_key(query)
+        song = self.cache.get(key, time.time())
+        if song is not None:
+            METRICS.since("music.resolve", "hit", start)
+            return dict(song)
 
-            asyncio.run_coroutine_threadsafe(
-                interaction.channel.send(f"🎶 **Now Playing:** {song['title']}"),
-                self.bot.loop,
+        task = self.resolving.get((guild_id, key))
+        if task is None:  # The same query asked twice at once extracts once
+            task = self.resolving[guild_id, key] = asyncio.ensure_future(
+                self.extractor.run(guild_id, self.get_stream_source, query)
             )
+            task.add_done_callback(lambda _: self.resolving.pop((guild_id, key), None))
+        self.waiters[guild_id, key] += 1
+        try:
+            # Shielded: a skipped caller mustn't cancel it for the others
+            song = await asyncio.shield(task)
+        except TimeoutError:
+            METRICS.since("music.resolve", "timeout", start)
+            return None
+        except asyncio.CancelledError:
+            if task.cancelled():  # Dropped by /music stop, not by our caller
+                return None
+            if self.waiters[guild_id, key] == 1:
+                task.cancel()  # Skipped and nobody else wants it: free its slot
+            raise
+        finally:
+            self.waiters[guild_id, key] -= 1
+            if not self.waiters[guild_id, key]:
+                del self.waiters[guild_id, key]
+        METRICS.since("music.resolve", "miss", start)
+        if not song:
+            return None
+        song["expires_at"] = stream_expiry(song["source"], time.time())
+        self.cache.put((key, song["url"]), song)
+        return dict(song)
 
-            voice_client.play(
-                discord.FFmpegPCMAudio(song["source"], **self.ffmpeg_opts),
-                after=lambda e: self.play_next(interaction),
-            )
-        else:
-            self.is_playing = False
-            self.current_song = None
-            asyncio.run_coroutine_threadsafe(
-                interaction.channel.send(
-                    "✅ Queue finished. Waiting for more songs..."
-                ),
-                self.bot.loop,
-            )
-            self.bot.loop.create_task(self.check_inactivity(interaction))
+    async def refresh(self, guild_id: int, song: dict) -> bool:
+        """GuildPlayer hook: re-resolve a queued song whose stream URL went stale."""
+        if song.get("expires_at", 0) > time.time():
+            return True
+        fresh = await self.resolve(guild_id, song.get("url") or song["title"])
+        if fresh is None:
+            return False
+        song.update(fresh)
+        return True
 
     # --- COMMANDS ---
 
-    @music_group.command(name="play", description="Stream a song from YouTube")
+    @music_group.command(
+        name="play", description="Stream a song (or a whole playlist) from YouTube"
+    )
     async def play(self, interaction: discord.Interaction, search: str):
         # 1. Join if needed
         if not interaction.guild.voice_client:
@@ -114,46 +210,99 @@ class Music(commands.Cog):
                     "❌ Join a voice channel first.", ephemeral=True
                 )
                 return
+        player = self.get_player(interaction.guild)
+        player.voice = interaction.guild.voice_client
+        player.channel = interaction.channel
 
         await interaction.response.defer()
 
-        loop = asyncio.get_running_loop()
-        song = await loop.run_in_executor(None, lambda: self.get_stream_source(search))
+        if is_playlist(search):
+            await self.play_playlist(interaction, player, search)
+            return
+
+        song = await self.resolve(interaction.guild.id, search)
 
         if not song:
             await interaction.followup.send("❌ Could not find song.")
             return
 
-        self.queue.append(song)
-        voice_client = interaction.guild.voice_client
-
-        if not self.is_playing:
-            self.play_next(interaction)
-            await interaction.followup.send(
-                f"🔎 Found: **{song['title']}** (Loading...)"
-            )
+        try:
+            position = await player.enqueue(song)
+        except RuntimeError:  # /music stop while we were searching
+            await interaction.followup.send("🛑 Playback was stopped.")
+            return
+        if position == 0:
+            await interaction.followup.send(f"🎶 **Now Playing:** {song['title']}")
         else:
             await interaction.followup.send(f"📝 Added to queue: **{song['title']}**")
 
+    async def play_playlist(self, interaction, player: GuildPlayer, url: str):
+        """Queue a whole playlist; each song is resolved just before it plays."""
+        task = asyncio.ensure_future(
+            self.extractor.run(interaction.guild.id, self.get_playlist, url)
+        )
+        try:
+            playlist = await asyncio.shield(task)
+        except TimeoutError:
+            playlist = None
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            await interaction.followup.send("🛑 Playback was stopped.")
+            return
+        if not playlist or not playlist[1]:
+            await interaction.followup.send("❌ Could not load playlist.")
+            return
+
+        title, songs = playlist
+        try:
+            position = await player.enqueue_many(songs)
+        except RuntimeError:  # /music stop while we were loading it
+            await interaction.followup.send("🛑 Playback was stopped.")
+            return
+        queued = f"📜 Queued **{len(songs)}** songs from **{title}**"
+        if position == 0 and player.current is not None:
+            queued += f"\n🎶 **Now Playing:** {player.current['title']}"
+        await interaction.followup.send(queued)
+
+    @music_group.command(name="stats", description="ADMIN: Music players and cache")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def stats(self, interaction: discord.Interaction):
+        lookups = self.cache.hits + self.cache.misses
+        playing = sum(player.current is not None for player in self.players.values())
+        await interaction.response.send_message(
+            f"🎶 **Music**\n"
+            f"Players: **{len(self.players)}** ({playing} playing)\n"
+            f"Extractions: **{self.extractor.running}** running, "
+            f"{len(self.extractor)} waiting\n"
+            f"Stream cache: **{len(self.cache)}** entries • "
+            f"hit rate {self.cache.hits / lookups if lookups else 0:.0%} "
+            f"of {lookups} lookups\n"
+            f"Resolve latency and gaps between tracks: `/perf` (music.*)",
+            ephemeral=True,
+        )
+
     @music_group.command(name="skip", description="Skip current song")
     async def skip(self, interaction: discord.Interaction):
-        if (
-            interaction.guild.voice_client
-            and interaction.guild.voice_client.is_playing()
-        ):
-            interaction.guild.voice_client.stop()
+        player = self.players.get(interaction.guild.id)
+        if player and await player.skip():
             await interaction.response.send_message("⏭️ Skipped.")
         else:
             await interaction.response.send_message("❌ Nothing playing.")
 
     @music_group.command(name="stop", description="Disconnect")
     async def stop(self, interaction: discord.Interaction):
-        if interaction.guild.voice_client:
-            self.queue.clear()
-            await interaction.guild.voice_client.disconnect()
-            await interaction.response.send_message("🛑 Disconnected.")
-        else:
+        player = self.players.pop(interaction.guild.id, None)
+        voice_client = interaction.guild.voice_client
+        if player is None and voice_client is None:
             await interaction.response.send_message("❌ Not connected.")
+            return
+        self.extractor.cancel(interaction.guild.id)
+        if player:
+            await player.close()
+        if voice_client and voice_client.is_connected():
+            await voice_client.disconnect()
+        await interaction.response.send_message("🛑 Disconnected.")
 
 
 async def setup(bot):
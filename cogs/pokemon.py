@@ -1,119 +1,50 @@
 import asyncio
 import datetime
 import random
+import time
+import uuid
+from collections import Counter
 from io import BytesIO
 
 import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
-from PIL import Image, ImageDraw, ImageFont
-
-from utils.database import get_or_create_uuid
+from PIL import Image, ImageDraw
+
+from utils.autocomplete import OWNED, SPECIES_NAMES, load_species_names
+from utils.database import get_or_create_uuid, transaction
+from utils.gacha import GachaEngine, load_rates
+from utils.images import load_font
+from utils.inventory import (
+    LOOSE_SINGLE,
+    add_pokemon,
+    box_key,
+    box_page,
+    box_totals,
+    detach_unit,
+    evolve_spares,
+    release_duplicates,
+    spare_species,
+    take_units,
+)
+from utils.metrics import METRICS
+from utils.species import (
+    SPECIES,
+    check_shiny_art,
+    completion,
+    get_caught,
+    ids_in,
+    mark_caught,
+    refresh_lost,
+    sprite_url,
+)
+from utils.trading import TRADE_COMPLETED, TRADE_REJECTED, TradeLeg, execute_trade
 
 # --- CONFIGURATION ---
-
-# Complete list of Legendaries (Gen 1-9)
-LEGENDARY_IDS = [
-    144,
-    145,
-    146,
-    150,
-    151,
-    243,
-    244,
-    245,
-    249,
-    250,
-    251,
-    377,
-    378,
-    379,
-    380,
-    381,
-    382,
-    383,
-    384,
-    385,
-    386,
-    480,
-    481,
-    482,
-    483,
-    484,
-    485,
-    486,
-    487,
-    488,
-    490,
-    491,
-    492,
-    493,
-    494,
-    638,
-    639,
-    640,
-    641,
-    642,
-    643,
-    644,
-    645,
-    646,
-    647,
-    648,
-    649,
-    716,
-    717,
-    718,
-    719,
-    720,
-    721,
-    772,
-    773,
-    785,
-    786,
-    787,
-    788,
-    789,
-    790,
-    791,
-    792,
-    800,
-    801,
-    802,
-    807,
-    793,
-    794,
-    795,
-    796,
-    797,
-    798,
-    799,
-    803,
-    804,
-    805,
-    806,
-    888,
-    889,
-    890,
-    891,
-    892,
-    894,
-    895,
-    896,
-    897,
-    898,
-    1001,
-    1002,
-    1003,
-    1004,
-    1007,
-    1008,
-]
-
-SHINY_CHANCE = 0.05
-LEGENDARY_CHANCE = 0.02
+# Rarity odds live in utils/gacha.py (DEFAULT_RATES / data/gacha_rates.json)
 EVOLUTION_COST = 3  # You need 3 duplicates to evolve 1
+MAX_TRADE_ITEMS = 10  # Pokémon per side of a trade
 
 
 # --- HELPER: Image Collage ---
@@ -137,17 +68,8 @@ def generate_collage(images_data, counts=None, names=None):
     canvas = Image.new("RGBA", (columns * cell_w, rows * cell_h), (0, 0, 0, 0))
     draw = ImageDraw.Draw(canvas)
 
-    # Load Font
-    font = None
-    try:
-        font = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 45
-        )
-    except:
-        try:
-            font = ImageFont.truetype("arial.ttf", 45)
-        except:
-            font = ImageFont.load_default()
+    # Load Font (cached, shared with the rank card)
+    font = load_font(45)
 
     for i, (img_bytes, is_shiny) in enumerate(images_data):
         try:
@@ -215,29 +137,54 @@ def generate_collage(images_data, counts=None, names=None):
 
 # --- VIEW: Box Pagination ---
 class BoxView(discord.ui.View):
-    def __init__(self, full_data, user_name):
+    """Pages through a box one query at a time; only the current page is kept."""
+
+    def __init__(self, db, user_uuid, user_name, totals, **query):
         super().__init__(timeout=60)
-        self.full_data = full_data
+        self.db = db
+        self.user_uuid = user_uuid
         self.user_name = user_name
-        self.page = 0
+        self.query = query  # species / flags / sort, passed to box_page
+        self.sort = query.get("sort", "newest")
+        self.total_rows, self.total_units = totals
         self.items_per_page = 20
-        self.total_pages = (
-            len(full_data) + self.items_per_page - 1
-        ) // self.items_per_page
+        self.total_pages = max(
+            1, (self.total_rows + self.items_per_page - 1) // self.items_per_page
+        )
+        self.page = 0
+        self.rows = []
+        self.has_prev = self.has_next = False
+
+    async def load(self, after=None, before=None):
+        rows, more = await box_page(
+            self.db,
+            self.user_uuid,
+            after=after,
+            before=before,
+            limit=self.items_per_page,
+            **self.query,
+        )
+        if not rows:  # The edge moved (Pokémon released meanwhile)
+            return False
+        self.rows = rows
+        if before is not None:
+            self.has_prev, self.has_next = more, True
+        else:
+            self.has_prev, self.has_next = after is not None, more
+        self.prev_btn.disabled = not self.has_prev
+        self.next_btn.disabled = not self.has_next
+        return True
 
     def get_embed(self):
-        start = self.page * self.items_per_page
-        end = start + self.items_per_page
-        page_data = self.full_data[start:end]
-
         desc = "Use the **ID** to rename, buddy, or trade!\n\n"
-        for row in page_data:
-            unique_id, p_id, name, shiny, nickname = row
+        for row in self.rows:
+            unique_id, p_id, name, shiny, nickname, quantity = row
             display_name = f"**{nickname}** ({name})" if nickname else f"**{name}**"
             icon = "✨" if shiny else ""
-            if p_id in LEGENDARY_IDS:
+            if SPECIES.is_legendary(p_id):
                 display_name = f"🔥 {display_name} 🔥"
-            desc += f"`ID: {unique_id}` — {display_name} {icon}\n"
+            count = f" ×{quantity}" if quantity > 1 else ""
+            desc += f"`ID: {unique_id}` — {display_name}{count} {icon}\n"
 
         embed = discord.Embed(
             title=f"📦 {self.user_name}'s Box",
@@ -245,31 +192,34 @@ class BoxView(discord.ui.View):
             color=discord.Color.blue(),
         )
         embed.set_footer(
-            text=f"Page {self.page + 1}/{self.total_pages} • Total: {len(self.full_data)}"
+            text=f"Page {self.page + 1}/{self.total_pages} • Total: {self.total_units}"
         )
         return embed
 
-    @discord.ui.button(label="◀", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.primary, disabled=True)
     async def prev_btn(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
-        self.page = self.page - 1 if self.page > 0 else self.total_pages - 1
-        await interaction.response.edit_message(embed=self.get_embed())
+        if await self.load(before=box_key(self.sort, self.rows[0])):
+            self.page = max(0, self.page - 1)
+        await interaction.response.edit_message(embed=self.get_embed(), view=self)
 
     @discord.ui.button(label="▶", style=discord.ButtonStyle.primary)
     async def next_btn(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
-        self.page = self.page + 1 if self.page < self.total_pages - 1 else 0
-        await interaction.response.edit_message(embed=self.get_embed())
+        if await self.load(after=box_key(self.sort, self.rows[-1])):
+            self.page = min(self.total_pages - 1, self.page + 1)
+        await interaction.response.edit_message(embed=self.get_embed(), view=self)
 
 
 # --- VIEW: Visual Pokedex ---
 class PokedexView(discord.ui.View):
-    def __init__(self, full_data, user_name):
+    def __init__(self, full_data, user_name, caught=0):
         super().__init__(timeout=60)
         self.full_data = full_data
         self.user_name = user_name
+        self.caught = caught  # Caught-species bitmap
         self.page = 0
         self.items_per_page = 20  # 5x4 Grid
 
@@ -317,7 +267,7 @@ class PokedexView(discord.ui.View):
         )
         embed.set_image(url="attachment://pokedex.png")
         embed.set_footer(
-            text=f"Page {self.page + 1} • Total Unique: {len(self.full_data)}"
+            text=f"Page {self.page + 1} • Total Unique: {len(self.full_data)} • {completion(self.caught):.1%} complete"
         )
 
         await interaction.edit_original_response(
@@ -343,13 +293,15 @@ class PokedexView(discord.ui.View):
 
 # --- VIEW: Trade Confirmation ---
 class TradeView(discord.ui.View):
-    def __init__(self, bot, author, partner, author_poke_id, partner_poke_id):
+    def __init__(self, bot, author, partner, offer):
         super().__init__(timeout=60)
         self.bot = bot
         self.author = author
         self.partner = partner
-        self.author_poke_id = author_poke_id
-        self.partner_poke_id = partner_poke_id
+        # Legs are built when the offer is made; accepting only executes them
+        self.legs = offer["legs"]
+        self.species = offer["species"]  # user_uuid -> species ids they give
+        self.trade_id = uuid.uuid4().hex
         self.value = None
 
     @discord.ui.button(label="✅ Accept Trade", style=discord.ButtonStyle.green)
@@ -363,52 +315,31 @@ class TradeView(discord.ui.View):
             return
 
         db = self.bot.db
-        author_uuid = await get_or_create_uuid(db, self.author.id, self.author.name)
-        partner_uuid = await get_or_create_uuid(db, self.partner.id, self.partner.name)
-
-        async with db.cursor() as cursor:
-            await cursor.execute(
-                "SELECT user_uuid FROM collection WHERE id = ?", (self.author_poke_id,)
-            )
-            check_a = await cursor.fetchone()
-            await cursor.execute(
-                "SELECT user_uuid FROM collection WHERE id = ?", (self.partner_poke_id,)
-            )
-            check_b = await cursor.fetchone()
-
-            if (
-                not check_a
-                or check_a[0] != author_uuid
-                or not check_b
-                or check_b[0] != partner_uuid
-            ):
-                await interaction.response.send_message(
-                    "❌ Trade Failed: Ownership changed!", ephemeral=True
-                )
-                return
-
-            # Clear Buddy status before trading
-            await cursor.execute(
-                "UPDATE game_profile SET buddy_id = NULL WHERE buddy_id = ?",
-                (self.author_poke_id,),
-            )
-            await cursor.execute(
-                "UPDATE game_profile SET buddy_id = NULL WHERE buddy_id = ?",
-                (self.partner_poke_id,),
-            )
-
-            await cursor.execute(
-                "UPDATE collection SET user_uuid = ? WHERE id = ?",
-                (partner_uuid, self.author_poke_id),
-            )
-            await cursor.execute(
-                "UPDATE collection SET user_uuid = ? WHERE id = ?",
-                (author_uuid, self.partner_poke_id),
+        async with transaction(db):
+            status, replayed = await execute_trade(db, self.trade_id, self.legs)
+            if status == TRADE_COMPLETED and not replayed:
+                # Pokédex bitmaps: receivers gain species, givers may lose some
+                for leg in self.legs:
+                    await mark_caught(db, leg.receiver, self.species[leg.giver])
+                for leg in self.legs:
+                    await refresh_lost(db, leg.giver, self.species[leg.giver])
+
+        if replayed:  # Double-click: the first click already answered
+            await interaction.response.send_message(
+                "ℹ️ This trade was already handled.", ephemeral=True
             )
+            return
 
-        await db.commit()
-        self.value = True
+        self.value = status == TRADE_COMPLETED
         self.stop()
+        if status == TRADE_REJECTED:
+            await interaction.response.edit_message(
+                content="❌ Trade Failed: Ownership or coins changed!",
+                view=None,
+                embed=None,
+            )
+            return
+        OWNED.invalidate(self.author.id, self.partner.id)
         await interaction.response.edit_message(
             content=f"🤝 **Trade Complete!**\n{self.author.mention} ↔ {self.partner.mention}",
             view=None,
@@ -430,7 +361,24 @@ class TradeView(discord.ui.View):
 class PokemonGame(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.NON_LEGENDARY_IDS = list(set(range(1, 1026)) - set(LEGENDARY_IDS))
+        self.gacha = GachaEngine(load_rates())
+
+    async def cog_load(self):
+        await SPECIES.load(self.bot.db)
+        OWNED.bind(self.bot.db)
+        # Autocomplete works with known names until the full list arrives
+        self.names_task = asyncio.create_task(self.load_names())
+
+    async def cog_unload(self):
+        self.names_task.cancel()
+
+    async def load_names(self):
+        try:
+            async with aiohttp.ClientSession() as session:
+                await load_species_names(session, SPECIES.names.values())
+        except aiohttp.ClientError as e:
+            print(f"⚠️ Could not load species names: {e}")
+        print(f"--- Autocomplete: {len(SPECIES_NAMES)} species names ---")
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -441,15 +389,8 @@ class PokemonGame(commands.Cog):
     )
 
     # --- CORE LOGIC: Fetch Pokemon ---
-    async def fetch_pokemon(self, session):
-        is_legendary = random.random() < LEGENDARY_CHANCE
-        is_shiny = random.random() < SHINY_CHANCE
-        poke_id = (
-            random.choice(LEGENDARY_IDS)
-            if is_legendary
-            else random.choice(self.NON_LEGENDARY_IDS)
-        )
-
+    # Rolls happen up front in one batch (self.gacha.pulls), this only fetches data
+    async def fetch_pokemon(self, session, poke_id, is_shiny, is_legendary):
         url = f"https://pokeapi.co/api/v2/pokemon/{poke_id}"
         async with session.get(url) as response:
             if response.status == 200:
@@ -461,6 +402,15 @@ class PokemonGame(commands.Cog):
                 )
                 if not sprite_url:
                     sprite_url = data["sprites"]["front_default"]
+                SPECIES.shiny_art[data["id"]] = bool(data["sprites"]["front_shiny"])
+
+                await SPECIES.learn(
+                    self.bot.db,
+                    data["id"],
+                    data["name"].capitalize(),
+                    [t["type"]["name"] for t in data["types"]],
+                )
+                SPECIES_NAMES.insert(data["name"].capitalize())
 
                 return {
                     "id": data["id"],
@@ -514,81 +464,99 @@ class PokemonGame(commands.Cog):
 
         return next_id, next_name
 
+    async def fetch_sprite(self, session, url):
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    return await resp.read()
+        except aiohttp.ClientError:
+            pass
+        return None
+
     # --- COMMANDS ---
 
     @pokemon_group.command(
         name="evolve", description="Merge 3 duplicates to get the next evolution!"
     )
-    @app_commands.describe(name="Name of the Pokemon (e.g. Charmander)")
+    @app_commands.describe(
+        name="Name of the Pokemon (e.g. Charmander), or 'all' to evolve everything"
+    )
     async def evolve(self, interaction: discord.Interaction, name: str):
         await interaction.response.defer()
         pokemon_name = name.capitalize()
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
+        if name.lower() == "all":
+            await self.evolve_all(interaction, user_uuid)
+            return
 
         async with self.bot.db.cursor() as cursor:
             # 1. Check if user has enough duplicates (Need 3)
-            # We sort by is_shiny ASC so we sacrifice Normal ones before Shiny ones!
+            # Nicknamed Pokémon and the buddy are never merged
             await cursor.execute(
-                """
-                SELECT id, pokemon_id, is_shiny, is_legendary
+                f"""
+                SELECT MIN(pokemon_id), COALESCE(SUM(quantity), 0)
                 FROM collection
-                WHERE user_uuid = ? AND pokemon_name = ?
-                ORDER BY is_shiny ASC
-                LIMIT ?
+                WHERE user_uuid = ? AND pokemon_name = ? AND (stacked = 1 OR ({LOOSE_SINGLE}))
             """,
-                (user_uuid, pokemon_name, EVOLUTION_COST),
+                (user_uuid, pokemon_name),
             )
+            current_poke_id, owned = await cursor.fetchone()
 
-            duplicates = await cursor.fetchall()
-
-            if len(duplicates) < EVOLUTION_COST:
-                await interaction.followup.send(
-                    f"❌ You need **{EVOLUTION_COST}** {pokemon_name} to evolve, but you only have **{len(duplicates)}**."
-                )
-                return
-
-            current_poke_id = duplicates[0][1]
-
-            # 2. Fetch Evolution Data (API)
-            async with aiohttp.ClientSession() as session:
-                evo_result = await self.get_next_evolution(session, current_poke_id)
-
-            if not evo_result:
-                await interaction.followup.send(
-                    f"❌ **{pokemon_name}** cannot evolve any further!"
-                )
-                return
-
-            next_id, next_name = evo_result
+        if owned < EVOLUTION_COST:
+            await interaction.followup.send(
+                f"❌ You need **{EVOLUTION_COST}** {pokemon_name} to evolve, but you only have **{owned}**."
+            )
+            return
 
-            # 3. EXECUTE EVOLUTION
-            # Delete the 3 duplicates
-            ids_to_delete = [d[0] for d in duplicates]
-            placeholders = ",".join("?" * len(ids_to_delete))
+        # 2. Fetch Evolution Data (API)
+        async with aiohttp.ClientSession() as session:
+            evo_result = await self.get_next_evolution(session, current_poke_id)
 
-            await cursor.execute(
-                f"DELETE FROM collection WHERE id IN ({placeholders})",
-                tuple(ids_to_delete),
+        if not evo_result:
+            await interaction.followup.send(
+                f"❌ **{pokemon_name}** cannot evolve any further!"
             )
+            return
 
-            # Determine Stats of new Pokemon (Inherit Shiny/Legendary if lucky?)
-            # Logic: If you sacrifice a Shiny, the evolution is Shiny.
-            # (Since we ordered by ASC, if the last one is Shiny, it means we used a shiny)
-            is_shiny_evo = any(d[2] for d in duplicates)
-            is_legendary_evo = any(d[3] for d in duplicates)
+        next_id, next_name = evo_result
 
-            # Insert the New Pokemon
-            await cursor.execute(
-                """
-                INSERT INTO collection (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary)
-                VALUES (?, ?, ?, ?, ?)
-            """,
-                (user_uuid, next_id, next_name, is_shiny_evo, is_legendary_evo),
+        # 3. EXECUTE EVOLUTION
+        db = self.bot.db
+        async with transaction(db):
+            # Take the 3 duplicates (Normal ones are sacrificed before Shiny ones)
+            duplicates, owned = await take_units(
+                db, user_uuid, pokemon_name, EVOLUTION_COST
             )
-
-        await self.bot.db.commit()
+            if duplicates:
+                # Determine Stats of new Pokemon (Inherit Shiny/Legendary if lucky?)
+                # Logic: If you sacrifice a Shiny, the evolution is Shiny.
+                is_shiny_evo = any(d[1] for d in duplicates)
+                is_legendary_evo = any(d[2] for d in duplicates)
+
+                # Add the New Pokemon to its stack
+                await add_pokemon(
+                    db,
+                    [
+                        (
+                            user_uuid,
+                            next_id,
+                            next_name,
+                            is_shiny_evo,
+                            is_legendary_evo,
+                            1,
+                        )
+                    ],
+                )
+                await mark_caught(db, user_uuid, [next_id])
+                await refresh_lost(db, user_uuid, [current_poke_id])
+        if not duplicates:  # Released/traded while we were asking the API
+            await interaction.followup.send(
+                f"❌ You need **{EVOLUTION_COST}** {pokemon_name} to evolve, but you only have **{owned}**."
+            )
+            return
+        OWNED.invalidate(interaction.user.id)
 
         # Fetch Image for cool embed
         img_url = ""
@@ -616,6 +584,51 @@ class PokemonGame(commands.Cog):
 
         await interaction.followup.send(embed=embed)
 
+    async def evolve_all(self, interaction: discord.Interaction, user_uuid: str):
+        """Evolve every species with enough spares in one transaction."""
+        db = self.bot.db
+        candidates = await spare_species(db, user_uuid, EVOLUTION_COST)
+        if not candidates:
+            await interaction.followup.send(
+                f"❌ You have no species with **{EVOLUTION_COST}** spare Pokémon to evolve."
+            )
+            return
+
+        # One API lookup per species, all at once
+        async with aiohttp.ClientSession() as session:
+            lookups = await asyncio.gather(
+                *(self.get_next_evolution(session, p_id) for p_id in candidates)
+            )
+        evolutions = {
+            p_id: evo for p_id, evo in zip(candidates, lookups) if evo is not None
+        }
+
+        async with transaction(db):
+            results = await evolve_spares(db, user_uuid, evolutions, EVOLUTION_COST)
+            await mark_caught(db, user_uuid, [next_id for _, next_id, _, _ in results])
+        OWNED.invalidate(interaction.user.id)
+
+        if not results:
+            await interaction.followup.send("❌ None of your spare Pokémon can evolve.")
+            return
+
+        evolved = sum(count for *_, count in results)
+        lines = [
+            f"**{count * EVOLUTION_COST}x {name}** → **{count}x {next_name}**"
+            for name, _, next_name, count in results
+        ]
+        embed = discord.Embed(
+            title="🧬 Mass Evolution Complete!",
+            description="\n".join(lines[:25]),
+            color=discord.Color.teal(),
+        )
+        if len(lines) > 25:
+            embed.description += f"\n...and {len(lines) - 25} more species"
+        embed.set_footer(
+            text=f"Merged {evolved * EVOLUTION_COST} Pokémon into {evolved} • Shinies, nicknamed Pokémon and your buddy were kept"
+        )
+        await interaction.followup.send(embed=embed)
+
     @pokemon_group.command(name="rename", description="Give your Pokemon a nickname")
     @app_commands.describe(id="The ID from /pokemon box", name="The new nickname")
     async def rename(self, interaction: discord.Interaction, id: int, name: str):
@@ -626,20 +639,19 @@ class PokemonGame(commands.Cog):
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
-                "SELECT pokemon_name FROM collection WHERE id = ? AND user_uuid = ?",
-                (id, user_uuid),
-            )
-            result = await cursor.fetchone()
-            if not result:
-                await interaction.followup.send(f"❌ You don't own Pokemon ID `{id}`.")
-                return
-            await cursor.execute(
-                "UPDATE collection SET nickname = ? WHERE id = ?", (name, id)
-            )
-        await self.bot.db.commit()
-        await interaction.followup.send(f"✅ ID `{id}` is now **{name}**!")
+        db = self.bot.db
+        async with transaction(db):
+            # A nickname makes it unique: a stacked one gets its own ID
+            unique_id = await detach_unit(db, user_uuid, id)
+            if unique_id:
+                await db.execute(
+                    "UPDATE collection SET nickname = ? WHERE id = ?", (name, unique_id)
+                )
+        if not unique_id:
+            await interaction.followup.send(f"❌ You don't own Pokemon ID `{id}`.")
+            return
+        OWNED.invalidate(interaction.user.id)
+        await interaction.followup.send(f"✅ ID `{unique_id}` is now **{name}**!")
 
     @pokemon_group.command(
         name="pokedex", description="View your collection (Visual Grid)"
@@ -654,7 +666,7 @@ class PokemonGame(commands.Cog):
             # Group by Pokemon ID
             await cursor.execute(
                 """
-                    SELECT pokemon_id, pokemon_name, count(*) as count, sum(is_shiny) as shinies
+                    SELECT pokemon_id, pokemon_name, sum(quantity) as count, sum(is_shiny * quantity) as shinies
                     FROM collection
                     WHERE user_uuid = ?
                     GROUP BY pokemon_id
@@ -668,8 +680,10 @@ class PokemonGame(commands.Cog):
             await interaction.followup.send("Empty collection!")
             return
 
+        caught = await get_caught(self.bot.db, user_uuid)
+
         # Initialize View and Send First Image
-        view = PokedexView(rows, interaction.user.name)
+        view = PokedexView(rows, interaction.user.name, caught)
         img_buffer = await view.generate_page_image()
         file = discord.File(img_buffer, filename="pokedex.png")
 
@@ -677,10 +691,54 @@ class PokemonGame(commands.Cog):
             title=f"📖 Pokedex: {interaction.user.name}", color=discord.Color.red()
         )
         embed.set_image(url="attachment://pokedex.png")
-        embed.set_footer(text=f"Page 1 • Total Unique: {len(rows)}")
+        embed.set_footer(
+            text=f"Page 1 • Total Unique: {len(rows)} • {completion(caught):.1%} complete"
+        )
 
         await interaction.followup.send(embed=embed, file=file, view=view)
 
+    @pokemon_group.command(
+        name="compare", description="Compare your Pokédex with another trainer"
+    )
+    async def compare(self, interaction: discord.Interaction, member: discord.Member):
+        await interaction.response.defer()
+        db = self.bot.db
+        my_uuid = await get_or_create_uuid(
+            db, interaction.user.id, interaction.user.name
+        )
+        their_uuid = await get_or_create_uuid(db, member.id, member.name)
+        mine = await get_caught(db, my_uuid)
+        theirs = await get_caught(db, their_uuid)
+
+        def species_list(mask, limit=15):
+            ids = list(ids_in(mask))
+            text = ", ".join(SPECIES.name(i) for i in ids[:limit])
+            if len(ids) > limit:
+                text += f" *(+{len(ids) - limit} more)*"
+            return text or "None"
+
+        they_have = theirs & ~mine
+        you_have = mine & ~theirs
+
+        embed = discord.Embed(
+            title=f"🔍 {interaction.user.name} vs {member.name}",
+            color=discord.Color.blurple(),
+        )
+        embed.add_field(
+            name=f"They have, you don't ({they_have.bit_count()})",
+            value=species_list(they_have),
+            inline=False,
+        )
+        embed.add_field(
+            name=f"You have, they don't ({you_have.bit_count()})",
+            value=species_list(you_have),
+            inline=False,
+        )
+        embed.set_footer(
+            text=f"Both have: {(mine & theirs).bit_count()} • You: {completion(mine):.1%} • Them: {completion(theirs):.1%}"
+        )
+        await interaction.followup.send(embed=embed)
+
     @pokemon_group.command(name="buddy", description="Set your Partner Pokemon")
     @app_commands.describe(id="The ID from /pokemon box")
     async def buddy(self, interaction: discord.Interaction, id: int):
@@ -688,24 +746,24 @@ class PokemonGame(commands.Cog):
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
-                "SELECT pokemon_name FROM collection WHERE id = ? AND user_uuid = ?",
-                (id, user_uuid),
-            )
-            if not await cursor.fetchone():
-                await interaction.followup.send(f"❌ You don't own Pokemon ID `{id}`.")
-                return
-            await cursor.execute(
-                "INSERT OR IGNORE INTO game_profile (user_uuid) VALUES (?)",
-                (user_uuid,),
-            )
-            await cursor.execute(
-                "UPDATE game_profile SET buddy_id = ? WHERE user_uuid = ?",
-                (id, user_uuid),
-            )
-        await self.bot.db.commit()
-        await interaction.followup.send(f"❤️ Buddy Updated!")
+        db = self.bot.db
+        async with transaction(db), db.cursor() as cursor:
+            # The buddy is always a unique row, so split one off a stack if needed
+            unique_id = await detach_unit(db, user_uuid, id)
+            if unique_id:
+                await cursor.execute(
+                    "INSERT OR IGNORE INTO game_profile (user_uuid) VALUES (?)",
+                    (user_uuid,),
+                )
+                await cursor.execute(
+                    "UPDATE game_profile SET buddy_id = ? WHERE user_uuid = ?",
+                    (unique_id, user_uuid),
+                )
+        if not unique_id:
+            await interaction.followup.send(f"❌ You don't own Pokemon ID `{id}`.")
+            return
+        OWNED.invalidate(interaction.user.id)
+        await interaction.followup.send(f"❤️ Buddy Updated! (ID `{unique_id}`)")
 
     @pokemon_group.command(name="profile", description="View your Trainer Card")
     async def profile(self, interaction: discord.Interaction):
@@ -760,30 +818,122 @@ class PokemonGame(commands.Cog):
         await interaction.followup.send(embed=embed)
 
     @pokemon_group.command(name="box", description="Manage your Pokémon Storage")
-    async def box(self, interaction: discord.Interaction):
+    @app_commands.describe(
+        species="Only show this species",
+        shiny="Only show shinies",
+        legendary="Only show legendaries",
+        nicknamed="Only show nicknamed Pokémon",
+        sort="Order of the box (default: newest first)",
+    )
+    @app_commands.choices(
+        sort=[
+            app_commands.Choice(name="Newest first", value="newest"),
+            app_commands.Choice(name="Oldest first", value="oldest"),
+            app_commands.Choice(name="Pokédex number", value="species"),
+        ]
+    )
+    async def box(
+        self,
+        interaction: discord.Interaction,
+        species: str | None = None,
+        shiny: bool = False,
+        legendary: bool = False,
+        nicknamed: bool = False,
+        sort: app_commands.Choice[str] = None,
+    ):
         await interaction.response.defer()
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
-                "SELECT id, pokemon_id, pokemon_name, is_shiny, nickname FROM collection WHERE user_uuid = ? ORDER BY id DESC",
-                (user_uuid,),
+        flags = [
+            flag
+            for flag, wanted in (
+                ("shiny", shiny),
+                ("legendary", legendary),
+                ("nicknamed", nicknamed),
+            )
+            if wanted
+        ]
+        totals = await box_totals(self.bot.db, user_uuid, species, flags)
+        if not totals[0]:
+            filtered = species or flags
+            await interaction.followup.send(
+                "No Pokémon match those filters!" if filtered else "Box empty!"
             )
-            rows = await cursor.fetchall()
-        if not rows:
-            await interaction.followup.send("Box empty!")
             return
-        view = BoxView(rows, interaction.user.name)
+        view = BoxView(
+            self.bot.db,
+            user_uuid,
+            interaction.user.name,
+            totals,
+            species=species,
+            flags=flags,
+            sort=sort.value if sort else "newest",
+        )
+        await view.load()
         await interaction.followup.send(embed=view.get_embed(), view=view)
 
-    @pokemon_group.command(name="trade", description="Trade Pokemon with a friend")
+    async def prepare_trade_side(self, owner_uuid: str, text: str):
+        """Parse "12, 15" (an ID listed twice = two units of that stack).
+
+        Only reads: stacks are split when the trade is accepted, so an offer
+        that is never accepted changes nothing. Returns
+        [(row_id, quantity, pokemon_id, label)] or an error message.
+        """
+        try:
+            counts = Counter(int(x) for x in text.replace(",", " ").split())
+        except ValueError:
+            return "❌ IDs must be numbers, separated by commas."
+        if sum(counts.values()) > MAX_TRADE_ITEMS:
+            return f"❌ At most **{MAX_TRADE_ITEMS}** Pokémon per side."
+        if not counts:
+            return []
+
+        placeholders = ",".join("?" * len(counts))
+        async with self.bot.db.execute(
+            f"""
+            SELECT id, pokemon_id, pokemon_name, is_shiny, nickname, stacked, quantity
+            FROM collection WHERE user_uuid = ? AND id IN ({placeholders})
+            """,
+            (owner_uuid, *counts),
+        ) as cursor:
+            rows = {row[0]: row[1:] for row in await cursor.fetchall()}
+
+        side = []
+        for row_id, amount in counts.items():
+            if row_id not in rows:
+                return f"❌ Invalid ownership of ID `{row_id}`."
+            p_id, name, shiny, nickname, stacked, quantity = rows[row_id]
+            if amount > (quantity if stacked else 1):
+                return f"❌ ID `{row_id}` only holds **{quantity if stacked else 1}**."
+            count = f" ×{amount}" if amount > 1 else ""
+            side.append(
+                (
+                    row_id,
+                    amount,
+                    p_id,
+                    f"**{nickname or name}**{' ✨' if shiny else ''}{count} (ID: {row_id})",
+                )
+            )
+        return side
+
+    @pokemon_group.command(
+        name="trade", description="Trade Pokemon and coins with a friend"
+    )
+    @app_commands.describe(
+        your_id="IDs you give, comma-separated (e.g. 12, 15; repeat a stack ID for more)",
+        their_id="IDs you want from them, comma-separated",
+        your_coins="Coins you add to the deal",
+        their_coins="Coins you want from them",
+    )
     async def trade(
         self,
         interaction: discord.Interaction,
         partner: discord.Member,
-        your_id: int,
-        their_id: int,
+        your_id: str = "",
+        their_id: str = "",
+        your_coins: app_commands.Range[int, 0] = 0,
+        their_coins: app_commands.Range[int, 0] = 0,
     ):
         if partner.bot or partner.id == interaction.user.id:
             await interaction.response.send_message(
@@ -796,23 +946,38 @@ class PokemonGame(commands.Cog):
             db, interaction.user.id, interaction.user.name
         )
         partner_uuid = await get_or_create_uuid(db, partner.id, partner.name)
-        async with db.cursor() as cursor:
-            await cursor.execute(
-                "SELECT pokemon_name, is_shiny, nickname FROM collection WHERE id = ? AND user_uuid = ?",
-                (your_id, author_uuid),
-            )
-            y = await cursor.fetchone()
-            await cursor.execute(
-                "SELECT pokemon_name, is_shiny, nickname FROM collection WHERE id = ? AND user_uuid = ?",
-                (their_id, partner_uuid),
-            )
-            t = await cursor.fetchone()
-        if not y or not t:
-            await interaction.followup.send("❌ Invalid ownership.")
+
+        yours = await self.prepare_trade_side(author_uuid, your_id)
+        theirs = await self.prepare_trade_side(partner_uuid, their_id)
+        for side in (yours, theirs):
+            if isinstance(side, str):
+                await interaction.followup.send(side)
+                return
+        if not (yours or theirs or your_coins or their_coins):
+            await interaction.followup.send("❌ The trade is empty.")
             return
 
-        y_n = y[2] if y[2] else y[0]
-        t_n = t[2] if t[2] else t[0]
+        offer = {
+            "legs": [
+                TradeLeg(giver, receiver, [u[:2] for u in units], coins)
+                for giver, receiver, units, coins in (
+                    (author_uuid, partner_uuid, yours, your_coins),
+                    (partner_uuid, author_uuid, theirs, their_coins),
+                )
+                if units or coins
+            ],
+            "species": {
+                author_uuid: {u[2] for u in yours},
+                partner_uuid: {u[2] for u in theirs},
+            },
+        }
+
+        def side_text(units, coins):
+            lines = [label for *_, label in units]
+            if coins:
+                lines.append(f"💰 **{coins} Coins**")
+            return "\n".join(lines) or "*Nothing*"
+
         embed = discord.Embed(
             title="🤝 Trade Offer",
             description=f"{interaction.user.mention} wants to trade with {partner.mention}!",
@@ -820,13 +985,13 @@ class PokemonGame(commands.Cog):
         )
         embed.add_field(
             name=f"{interaction.user.name}",
-            value=f"**{y_n}**\n(ID: {your_id})",
+            value=side_text(yours, your_coins),
             inline=True,
         )
         embed.add_field(
-            name=f"{partner.name}", value=f"**{t_n}**\n(ID: {their_id})", inline=True
+            name=f"{partner.name}", value=side_text(theirs, their_coins), inline=True
         )
-        view = TradeView(self.bot, interaction.user, partner, your_id, their_id)
+        view = TradeView(self.bot, interaction.user, partner, offer)
         await interaction.followup.send(content=partner.mention, embed=embed, view=view)
 
     @pokemon_group.command(name="balance", description="Check your Coins and Pulls")
@@ -855,28 +1020,31 @@ class PokemonGame(commands.Cog):
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
-        async with self.bot.db.cursor() as cursor:
+        db = self.bot.db
+        async with transaction(db), db.cursor() as cursor:
             await cursor.execute(
                 "SELECT last_daily FROM game_profile WHERE user_uuid = ?", (user_uuid,)
             )
             row = await cursor.fetchone()
+            next_daily = None
             if row and row[0]:
                 last_daily = datetime.datetime.fromisoformat(row[0])
                 if (datetime.datetime.now() - last_daily).total_seconds() < 86400:
                     next_daily = last_daily + datetime.timedelta(days=1)
-                    timestamp = int(next_daily.timestamp())
-                    await interaction.followup.send(f"⏳ Come back <t:{timestamp}:R>.")
-                    return
-            await cursor.execute(
-                """INSERT INTO game_profile (user_uuid, available_pulls, last_daily, coins) VALUES (?, 5, ?, 0) ON CONFLICT(user_uuid) DO UPDATE SET available_pulls = available_pulls + 5, last_daily = ?""",
-                (
-                    user_uuid,
-                    datetime.datetime.now().isoformat(),
-                    datetime.datetime.now().isoformat(),
-                ),
-            )
-        await self.bot.db.commit()
-        await interaction.followup.send(f"📦 **Supply Drop!** +5 Poké Balls received.")
+            if next_daily is None:
+                await cursor.execute(
+                    """INSERT INTO game_profile (user_uuid, available_pulls, last_daily, coins) VALUES (?, 5, ?, 0) ON CONFLICT(user_uuid) DO UPDATE SET available_pulls = available_pulls + 5, last_daily = ?""",
+                    (
+                        user_uuid,
+                        datetime.datetime.now().isoformat(),
+                        datetime.datetime.now().isoformat(),
+                    ),
+                )
+        if next_daily is not None:
+            timestamp = int(next_daily.timestamp())
+            await interaction.followup.send(f"⏳ Come back <t:{timestamp}:R>.")
+            return
+        await interaction.followup.send("📦 **Supply Drop!** +5 Poké Balls received.")
 
     @pokemon_group.command(name="shop", description="Buy more pulls")
     async def shop(self, interaction: discord.Interaction):
@@ -907,22 +1075,23 @@ class PokemonGame(commands.Cog):
         )
         cost = 100 if item.value == "pull" else 900
         amount = 1 if item.value == "pull" else 10
-        async with self.bot.db.cursor() as cursor:
+        db = self.bot.db
+        async with transaction(db), db.cursor() as cursor:
             await cursor.execute(
                 "SELECT coins FROM game_profile WHERE user_uuid = ?", (user_uuid,)
             )
             row = await cursor.fetchone()
             current_coins = row[0] if row else 0
-            if current_coins < cost:
-                await interaction.followup.send(
-                    f"❌ You need **{cost} Coins** (You have {current_coins})."
+            if current_coins >= cost:
+                await cursor.execute(
+                    "UPDATE game_profile SET coins = coins - ?, available_pulls = available_pulls + ? WHERE user_uuid = ?",
+                    (cost, amount, user_uuid),
                 )
-                return
-            await cursor.execute(
-                "UPDATE game_profile SET coins = coins - ?, available_pulls = available_pulls + ? WHERE user_uuid = ?",
-                (cost, amount, user_uuid),
+        if current_coins < cost:
+            await interaction.followup.send(
+                f"❌ You need **{cost} Coins** (You have {current_coins})."
             )
-        await self.bot.db.commit()
+            return
         await interaction.followup.send(
             f"✅ Purchase successful! Spent **{cost} Coins** for **{amount} Pulls**."
         )
@@ -930,6 +1099,7 @@ class PokemonGame(commands.Cog):
     @pokemon_group.command(name="pull", description="Use Poké Balls")
     @app_commands.describe(amount="How many to pull? (Optional, Default: 1, Max: 10)")
     async def pull(self, interaction: discord.Interaction, amount: int = 1):
+        started = time.perf_counter()
         await interaction.response.defer()
         if amount > 10:
             await interaction.followup.send("❌ Max 10 pulls at a time!")
@@ -940,38 +1110,77 @@ class PokemonGame(commands.Cog):
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
-        async with self.bot.db.cursor() as cursor:
+        db = self.bot.db
+        async with transaction(db), db.cursor() as cursor:
             await cursor.execute(
                 "SELECT available_pulls FROM game_profile WHERE user_uuid = ?",
                 (user_uuid,),
             )
             row = await cursor.fetchone()
             pulls = row[0] if row else 0
-            if pulls < amount:
-                await interaction.followup.send(
-                    f"❌ Not enough pulls! You have {pulls}."
+            if pulls >= amount:
+                await cursor.execute(
+                    "UPDATE game_profile SET available_pulls = available_pulls - ? WHERE user_uuid = ?",
+                    (amount, user_uuid),
                 )
-                return
-            remaining_pulls = pulls - amount
-            await cursor.execute(
-                "UPDATE game_profile SET available_pulls = available_pulls - ? WHERE user_uuid = ?",
-                (amount, user_uuid),
-            )
-        await self.bot.db.commit()
-        # Fetching pokemon
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.fetch_pokemon(session) for _ in range(amount)]
-            results = await asyncio.gather(*tasks)
-        caught = [p for p in results if p is not None]
+        if pulls < amount:
+            await interaction.followup.send(f"❌ Not enough pulls! You have {pulls}.")
+            return
+        remaining_pulls = pulls - amount
+
+        # Names come from the species registry; only species the bot has never
+        # seen cost a PokeAPI call before the first reply
+        rolls = self.gacha.pulls(amount)
+        unknown = {poke_id for poke_id, _, _ in rolls if poke_id not in SPECIES.names}
+        shinies = {poke_id for poke_id, _, is_shiny in rolls if is_shiny}
+        if unknown or shinies:
+            async with aiohttp.ClientSession() as session:
+                await asyncio.gather(
+                    *(
+                        self.fetch_pokemon(session, p_id, False, False)
+                        for p_id in unknown
+                    ),
+                    return_exceptions=True,  # Unresolved pulls are refunded below
+                )
+                # Shinies without a shiny sprite show the regular one
+                await check_shiny_art(session, shinies)
+        caught = [
+            {
+                "id": poke_id,
+                "name": SPECIES.names[poke_id],
+                "image_url": sprite_url(poke_id, is_shiny),
+                "is_shiny": is_shiny,
+                "is_legendary": tier == "legendary",
+            }
+            for poke_id, tier, is_shiny in rolls
+            if poke_id in SPECIES.names
+        ]
 
-        # Saving to the database
-        async with self.bot.db.cursor() as cursor:
-            for p in caught:
-                await cursor.execute(
-                    "INSERT INTO collection (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary) VALUES (?, ?, ?, ?, ?)",
-                    (user_uuid, p["id"], p["name"], p["is_shiny"], p["is_legendary"]),
+        lost = amount - len(caught)
+        async with transaction(db):
+            # Pulls whose species PokeAPI couldn't resolve are given back
+            if lost:
+                remaining_pulls += lost
+                await db.execute(
+                    "UPDATE game_profile SET available_pulls = available_pulls + ? WHERE user_uuid = ?",
+                    (lost, user_uuid),
                 )
-        await self.bot.db.commit()
+            # Saving to the database
+            # Duplicates only bump the quantity of an existing stack
+            await add_pokemon(
+                db,
+                [
+                    (user_uuid, p["id"], p["name"], p["is_shiny"], p["is_legendary"], 1)
+                    for p in caught
+                ],
+            )
+            await mark_caught(db, user_uuid, [p["id"] for p in caught])
+        if not caught:
+            await interaction.followup.send(
+                "❌ PokeAPI is not responding, your pulls were refunded."
+            )
+            return
+        OWNED.invalidate(interaction.user.id)
 
         # Displaying the results aka caught pokemon
         if amount == 1:
@@ -992,34 +1201,48 @@ class PokemonGame(commands.Cog):
             if p["is_shiny"]:
                 embed.set_footer(text=footer_text + " ✨ SHINY PULL!")
             await interaction.followup.send(embed=embed)
+            METRICS.since("pull.first_reply", amount, started)
+            METRICS.since("pull.total", amount, started)
         else:
+            # 1. Text list right away
             desc = ""
             for p in caught:
                 icon = "✨" if p["is_shiny"] else ""
                 bold = "**" if p["is_legendary"] else ""
                 desc += f"• {bold}{p['name']} {icon}{bold}\n"
-            image_data_list = []
-            async with aiohttp.ClientSession() as session:
-                for p in caught:
-                    if p["image_url"]:
-                        async with session.get(p["image_url"]) as resp:
-                            if resp.status == 200:
-                                image_data_list.append(
-                                    (await resp.read(), p["is_shiny"])
-                                )
-            collage = await asyncio.to_thread(generate_collage, image_data_list)
-            file = discord.File(collage, filename="pulls.png") if collage else None
             embed = discord.Embed(
-                title=f"🔥 Pull Results", description=desc, color=discord.Color.gold()
+                title="🔥 Pull Results", description=desc, color=discord.Color.gold()
             )
+            embed.set_footer(
+                text=f"Remaining Pulls: {remaining_pulls} • Loading sprites..."
+            )
+            message = await interaction.followup.send(embed=embed)
+            METRICS.since("pull.first_reply", amount, started)
+
+            # 2. All sprites at once, then the collage replaces the placeholder
+            async with aiohttp.ClientSession() as session:
+                sprites = await asyncio.gather(
+                    *(self.fetch_sprite(session, p["image_url"]) for p in caught)
+                )
+            image_data_list = [
+                (data, p["is_shiny"]) for data, p in zip(sprites, caught) if data
+            ]
+            collage = await asyncio.to_thread(generate_collage, image_data_list)
             embed.set_footer(text=f"Remaining Pulls: {remaining_pulls}")
-            if file:
+            if collage:
                 embed.set_image(url="attachment://pulls.png")
-                await interaction.followup.send(embed=embed, file=file)
+                await message.edit(
+                    embed=embed,
+                    attachments=[discord.File(collage, filename="pulls.png")],
+                )
             else:
-                await interaction.followup.send(embed=embed)
+                await message.edit(embed=embed)
+            METRICS.since("pull.total", amount, started)
 
     @pokemon_group.command(name="release", description="Sell Pokémon for 20 Coins each")
+    @app_commands.describe(
+        name="Name of the Pokemon, or 'duplicates' to keep only one of each"
+    )
     async def release(
         self, interaction: discord.Interaction, name: str, amount: int = 1
     ):
@@ -1030,49 +1253,144 @@ class PokemonGame(commands.Cog):
         user_uuid = await get_or_create_uuid(
             self.bot.db, interaction.user.id, interaction.user.name
         )
+        if name.lower() == "duplicates":
+            await self.release_all_duplicates(interaction, user_uuid)
+            return
         pokemon_name = name.capitalize()
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
-                "SELECT count(*) FROM collection WHERE user_uuid = ? AND pokemon_name = ?",
-                (user_uuid, pokemon_name),
-            )
-            count_row = await cursor.fetchone()
-            owned_count = count_row[0] if count_row else 0
-            if owned_count < amount:
-                await interaction.followup.send(
-                    f"❌ You only have **{owned_count}** {pokemon_name}(s)."
+        sell_price = 20 * amount
+        db = self.bot.db
+        async with transaction(db):
+            # Nicknamed Pokémon and the buddy are never released by species name
+            taken, available = await take_units(db, user_uuid, pokemon_name, amount)
+            if taken:
+                await db.execute(
+                    "UPDATE game_profile SET coins = coins + ? WHERE user_uuid = ?",
+                    (sell_price, user_uuid),
                 )
-                return
-            await cursor.execute(
-                "DELETE FROM collection WHERE id IN (SELECT id FROM collection WHERE user_uuid = ? AND pokemon_name = ? LIMIT ?)",
-                (user_uuid, pokemon_name, amount),
-            )
-            sell_price = 20 * amount
-            await cursor.execute(
-                "UPDATE game_profile SET coins = coins + ? WHERE user_uuid = ?",
-                (sell_price, user_uuid),
+                await refresh_lost(
+                    db, user_uuid, {pokemon_id for pokemon_id, _, _ in taken}
+                )
+        if not taken:
+            await interaction.followup.send(
+                f"❌ You only have **{available}** {pokemon_name}(s) to release."
             )
-        await self.bot.db.commit()
+            return
+        OWNED.invalidate(interaction.user.id)
         await interaction.followup.send(
             f"👋 You released **{amount}x {pokemon_name}**.\n💰 You received **{sell_price} Coins**."
         )
 
+    async def release_all_duplicates(
+        self, interaction: discord.Interaction, user_uuid: str
+    ):
+        """Sell every spare normal Pokémon in one transaction, one of each is kept."""
+        db = self.bot.db
+        async with transaction(db):
+            released, species = await release_duplicates(db, user_uuid)
+            sell_price = 20 * released
+            if released:
+                await db.execute(
+                    "UPDATE game_profile SET coins = coins + ? WHERE user_uuid = ?",
+                    (sell_price, user_uuid),
+                )
+        OWNED.invalidate(interaction.user.id)
+
+        if not released:
+            await interaction.followup.send("❌ You have no duplicates to release.")
+            return
+        await interaction.followup.send(
+            f"👋 You released **{released}** duplicates of **{species}** species.\n"
+            f"💰 You received **{sell_price} Coins**.\n"
+            "-# Shinies, nicknamed Pokémon and your buddy were kept."
+        )
+
     @pokemon_group.command(name="givepulls", description="Admin: Give pulls")
     @app_commands.checks.has_permissions(administrator=True)
     async def give_pulls(
         self, interaction: discord.Interaction, member: discord.Member, amount: int
     ):
         user_uuid = await get_or_create_uuid(self.bot.db, member.id, member.name)
-        async with self.bot.db.cursor() as cursor:
-            await cursor.execute(
+        async with transaction(self.bot.db):
+            await self.bot.db.execute(
                 """INSERT INTO game_profile (user_uuid, available_pulls, last_daily, coins) VALUES (?, ?, ?, 0) ON CONFLICT(user_uuid) DO UPDATE SET available_pulls = available_pulls + ?""",
                 (user_uuid, amount, datetime.datetime.now().isoformat(), amount),
             )
-        await self.bot.db.commit()
         await interaction.response.send_message(
             f"✅ Gave {amount} pulls to {member.name}.", ephemeral=True
         )
 
+    # --- AUTOCOMPLETE ---
+    # Served from memory (trie + per-user cache), far inside Discord's 3s limit
+    async def owned_species_choices(self, interaction, current: str, keyword: str):
+        owned = await OWNED.get(interaction.user.id)
+        names = owned.names.complete(current)
+        if keyword.startswith(current.lower()):
+            names = [keyword, *names[:24]]
+        return [app_commands.Choice(name=name, value=name) for name in names]
+
+    async def unit_choices(self, discord_id: int, current: str):
+        owned = await OWNED.get(discord_id)
+        return [
+            app_commands.Choice(name=label, value=row_id)
+            for row_id, label in owned.match_units(current)
+        ]
+
+    @evolve.autocomplete("name")
+    async def evolve_name_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return await self.owned_species_choices(interaction, current, "all")
+
+    @release.autocomplete("name")
+    async def release_name_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return await self.owned_species_choices(interaction, current, "duplicates")
+
+    @box.autocomplete("species")
+    async def box_species_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in SPECIES_NAMES.complete(current)
+        ]
+
+    async def id_list_choices(self, discord_id: int, current: str):
+        """Complete the last ID of a comma-separated list."""
+        *done, last = current.split(",")
+        done = [x.strip() for x in done if x.strip()]
+        prefix = ", ".join(done)
+        owned = await OWNED.get(discord_id)
+        choices = []
+        for row_id, label in owned.match_units(last.strip()):
+            if str(row_id) in done:
+                continue
+            value = f"{prefix}, {row_id}" if prefix else str(row_id)
+            name = f"{prefix}, {label}" if prefix else label
+            choices.append(app_commands.Choice(name=name[:100], value=value))
+        return choices
+
+    @rename.autocomplete("id")
+    @buddy.autocomplete("id")
+    async def own_id_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await self.unit_choices(interaction.user.id, current)
+
+    @trade.autocomplete("your_id")
+    async def your_ids_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return await self.id_list_choices(interaction.user.id, current)
+
+    @trade.autocomplete("their_id")
+    async def their_ids_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        partner = interaction.namespace.partner
+        if partner is None:  # Partner not picked yet
+            return []
+        return await self.id_list_choices(partner.id, current)
+
     @pokemon_group.command(
         name="repair_db", description="ADMIN: Fix missing database columns"
     )
@@ -1081,7 +1399,7 @@ class PokemonGame(commands.Cog):
         await interaction.response.defer()
         db = self.bot.db
         results = []
-        async with db.cursor() as cursor:
+        async with transaction(db), db.cursor() as cursor:
             try:
                 await cursor.execute(
                     "ALTER TABLE collection ADD COLUMN is_shiny BOOLEAN DEFAULT 0"
@@ -1110,9 +1428,18 @@ class PokemonGame(commands.Cog):
                 results.append("✅ Added 'buddy_id'")
             except Exception as e:
                 results.append(f"ℹ️ Buddy: {e}")
-        await db.commit()
+            try:
+                await cursor.execute(
+                    "ALTER TABLE collection ADD COLUMN stacked BOOLEAN DEFAULT 0"
+                )
+                await cursor.execute(
+                    "ALTER TABLE collection ADD COLUMN quantity INTEGER DEFAULT 1"
+                )
+                results.append("✅ Added 'stacked' and 'quantity'")
+            except Exception as e:
+                results.append(f"ℹ️ Stacks: {e}")
         await interaction.followup.send(
-            f"**Database Repair Report:**\n" + "\n".join(results)
+            "**Database Repair Report:**\n" + "\n".join(results)
         )
 
 
@@ -0,0 +1,375 @@
+import random
+import time
+
+import aiohttp
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from utils.autocomplete import SPECIES_NAMES
+from utils.database import get_or_create_uuid, transaction
+from utils.raids import Raid, reward_shares
+from utils.species import LEGENDARY_IDS, SPECIES, sprite_url
+from utils.typechart import MOVE_NAMES, MOVE_POWER, deck_damage, deck_of, type_ids
+
+# --- CONFIGURATION ---
+RAID_DURATION = 15 * 60  # Seconds before the boss flees
+RAID_HP_SCALE = 150  # Boss HP = duel HP x this
+ATTACK_COOLDOWN = 2.0  # Seconds between two attacks by one player
+EMBED_INTERVAL = 3  # Seconds between boss HP edits (well under Discord's limit)
+FLUSH_INTERVAL = 10  # Seconds between contribution writes
+REWARD_POOL = 2000  # Coins split by share of damage when the boss falls
+MIN_REWARD = 25  # Every attacker gets at least this much
+
+
+class RaidView(discord.ui.View):
+    def __init__(self, cog, raid):
+        super().__init__(timeout=None)  # The raid's own deadline ends it
+        self.cog = cog
+        self.raid = raid
+
+    @discord.ui.button(label="Attack!", emoji="⚔️", style=discord.ButtonStyle.red)
+    async def attack(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.attack(interaction, self.raid)
+
+
+class Raids(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.raids = {}  # channel_id -> Raid (one boss per channel)
+        # Buddy data is looked up on a player's first attack and kept until
+        # no raid is running: later clicks are pure memory
+        self.fighters = {}  # discord_id -> buddy data, deck and cooldown
+        self.names = {}  # user_uuid -> display name (for the final embed)
+        self.finishing = set()  # Raid ids whose final write is in progress
+
+    async def cog_load(self):
+        # Raids live in memory; ones cut short by a restart are closed without rewards
+        async with transaction(self.bot.db):
+            await self.bot.db.execute(
+                "UPDATE raids SET ended_at = CURRENT_TIMESTAMP WHERE ended_at IS NULL"
+            )
+        self.render_loop.start()
+        self.flush_loop.start()
+
+    async def cog_unload(self):
+        self.render_loop.cancel()
+        self.flush_loop.cancel()
+        await self.flush()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print("Raids Cog is ready.")
+
+    # --- EMBED ---
+    def get_embed(self, raid: Raid):
+        ratio = max(0, raid.hp / raid.max_hp)
+        filled = int(ratio * 20)
+        embed = discord.Embed(
+            title=f"👹 Raid Boss: {raid.name}",
+            description=(
+                f"{'🟥' * filled}{'⬛' * (20 - filled)}\n"
+                f"**{raid.hp:,} / {raid.max_hp:,} HP**"
+            ),
+            color=discord.Color.dark_red(),
+        )
+        embed.set_thumbnail(url=sprite_url(raid.pokemon_id, False))
+        if raid.damage:
+            embed.add_field(
+                name="🏅 Top Attackers",
+                value="\n".join(
+                    f"{self.names.get(user, '???')}: **{dealt:,}**"
+                    for user, dealt in raid.top()
+                ),
+                inline=False,
+            )
+        embed.set_footer(
+            text=f"{len(raid.damage)} trainers • Attack with your buddy! (/pokemon buddy)"
+        )
+        return embed
+
+    @tasks.loop(seconds=EMBED_INTERVAL)
+    async def render_loop(self):
+        """The only place a running raid's message is edited."""
+        now = time.monotonic()
+        for raid in list(self.raids.values()):
+            if now >= raid.ends_at or raid.defeated:
+                # Still tracked after a failed finish: retried on the next tick
+                try:
+                    await self.finish(raid)
+                except Exception as e:
+                    print(f"Finishing raid {raid.id} failed, retrying: {e}")
+                continue
+            if not raid.dirty or raid.message is None:
+                continue
+            raid.dirty = False
+            try:
+                await raid.message.edit(embed=self.get_embed(raid))
+            except discord.HTTPException:
+                pass
+
+    # --- PERSISTENCE ---
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def flush_loop(self):
+        # Failed contributions are restored; raising would stop the loop for good
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Raid flush failed, retrying next time: {e}")
+
+    async def flush(self, *raids):
+        """Write contributions since the last flush, one transaction for all raids."""
+        raids = raids or tuple(self.raids.values())
+        taken = [(raid, raid.take_unflushed()) for raid in raids]
+        rows = [
+            (raid.id, user, dealt, hits)
+            for raid, unflushed in taken
+            for user, dealt, hits in unflushed
+        ]
+        if not rows:
+            return
+        db = self.bot.db
+        try:
+            async with transaction(db):
+                await db.executemany(
+                    """
+                    INSERT INTO raid_damage (raid_id, user_uuid, damage, attacks)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(raid_id, user_uuid) DO UPDATE SET
+                        damage = damage + excluded.damage,
+                        attacks = attacks + excluded.attacks
+                    """,
+                    rows,
+                )
+                await db.executemany(
+                    "UPDATE raids SET hp = ? WHERE id = ?",
+                    [(max(0, raid.hp), raid.id) for raid in raids],
+                )
+        except Exception:
+            # Nothing was written: these contributions go with the next flush
+            for raid, unflushed in taken:
+                raid.restore_unflushed(unflushed)
+            raise
+
+    async def finish(self, raid: Raid):
+        channel_id = raid.message.channel.id
+        if self.raids.get(channel_id) is not raid or raid.id in self.finishing:
+            return  # Already finished, or finishing right now
+        # The raid stays tracked until everything is written, so a failed
+        # write is retried by render_loop instead of losing the rewards
+        self.finishing.add(raid.id)
+        try:
+            await self.flush(raid)
+            rewards = reward_shares(raid.damage, REWARD_POOL, MIN_REWARD)
+            db = self.bot.db
+            async with transaction(db):
+                await db.execute(
+                    "UPDATE raids SET ended_at = CURRENT_TIMESTAMP, defeated = ? WHERE id = ?",
+                    (raid.defeated, raid.id),
+                )
+                if raid.defeated:  # One batched credit for every attacker
+                    await db.executemany(
+                        """
+                        INSERT INTO game_profile (user_uuid, coins) VALUES (?, ?)
+                        ON CONFLICT(user_uuid) DO UPDATE SET coins = coins + excluded.coins
+                        """,
+                        list(rewards.items()),
+                    )
+        finally:
+            self.finishing.discard(raid.id)
+        del self.raids[channel_id]
+
+        if not self.raids:
+            self.fighters.clear()
+            self.names.clear()
+
+        embed = self.get_embed(raid)
+        if raid.defeated:
+            embed.title = f"🏆 {raid.name} was defeated!"
+            embed.color = discord.Color.gold()
+            embed.set_footer(
+                text=f"{len(rewards)} trainers shared {REWARD_POOL:,} Coins "
+                f"(at least {MIN_REWARD} each)"
+            )
+        else:
+            embed.title = f"💨 {raid.name} fled..."
+            embed.set_footer(text="No rewards this time.")
+        try:
+            await raid.message.edit(embed=embed, view=None)
+        except discord.HTTPException:
+            pass
+
+    # --- ATTACKING ---
+    async def get_fighter(self, user):
+        fighter = self.fighters.get(user.id)
+        if fighter is not None:
+            return fighter
+        combat = self.bot.get_cog("Combat")
+        buddy = await combat.get_buddy_data(user.id, user.name)
+        if not buddy:
+            return None
+        full = await combat.fetch_full_data(buddy["pokedex_id"])
+        if not full:
+            return None
+        user_uuid = await get_or_create_uuid(self.bot.db, user.id, user.name)
+        fighter = self.fighters[user.id] = {
+            **buddy,
+            **full,
+            "uuid": user_uuid,
+            "deck": deck_of(full["type"]),
+            "scores": {},  # raid id -> (damage, multiplier) of each deck move
+            "ready_at": 0.0,
+        }
+        self.names[user_uuid] = user.display_name
+        return fighter
+
+    async def attack(self, interaction: discord.Interaction, raid: Raid):
+        if raid.defeated:
+            await interaction.response.send_message(
+                "The boss is already down!", ephemeral=True
+            )
+            return
+        if time.monotonic() >= raid.ends_at:
+            await interaction.response.send_message(
+                "💨 The boss is getting away, too late!", ephemeral=True
+            )
+            return
+        fighter = self.fighters.get(interaction.user.id)
+        if fighter is None:  # First attack: look up the buddy once
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            fighter = await self.get_fighter(interaction.user)
+            reply = interaction.followup.send
+        else:
+            reply = interaction.response.send_message
+        if fighter is None:
+            await reply("❌ Set a buddy first! `/pokemon buddy`", ephemeral=True)
+            return
+
+        now = time.monotonic()
+        if now < fighter["ready_at"]:
+            await reply(
+                f"⏳ {fighter['name']} is catching its breath "
+                f"({fighter['ready_at'] - now:.1f}s).",
+                ephemeral=True,
+            )
+            return
+        fighter["ready_at"] = now + ATTACK_COOLDOWN
+
+        scores = fighter["scores"].get(raid.id)
+        if scores is None:  # Whole deck vs this boss in one lookup
+            scores = fighter["scores"][raid.id] = deck_damage(
+                fighter["deck"],
+                type_ids(fighter["types"]),
+                type_ids(raid.boss["types"]),
+                fighter["stats"]["attack"],
+                raid.boss["stats"]["defense"],
+                fighter["ability"],
+            )
+        slot = random.choice(
+            [i for i, move in enumerate(fighter["deck"]) if MOVE_POWER[move]]
+        )
+        damage, multiplier = int(scores[0][slot]), scores[1][slot]
+        move_name = MOVE_NAMES[fighter["deck"][slot]]
+        ability_msg = " (Huge Power!)" if fighter["ability"] == "huge-power" else ""
+        knocked_out = raid.attack(fighter["uuid"], damage)
+
+        eff_text = ""
+        if multiplier > 1:
+            eff_text = " It's Super Effective! 💥"
+        elif multiplier < 1:
+            eff_text = " It's not very effective..."
+        await reply(
+            f"⚔️ {fighter['name']} used {move_name}!{eff_text}{ability_msg} (-{damage})",
+            ephemeral=True,
+        )
+        if knocked_out:
+            await self.finish(raid)
+
+    # --- COMMANDS ---
+    raid_group = app_commands.Group(name="raid", description="Server Raid Bosses")
+
+    @raid_group.command(name="start", description="ADMIN: Summon a raid boss here")
+    @app_commands.describe(species="Boss species (default: a random Legendary)")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def start(self, interaction: discord.Interaction, species: str | None = None):
+        if interaction.channel.id in self.raids:
+            await interaction.response.send_message(
+                "❌ A raid is already running in this channel.", ephemeral=True
+            )
+            return
+        if species:
+            pokemon_id = SPECIES.id_of(species)
+            if pokemon_id is None:
+                await interaction.response.send_message(
+                    f"❌ Unknown species **{species}**.", ephemeral=True
+                )
+                return
+        else:
+            pokemon_id = random.choice(LEGENDARY_IDS)
+        await interaction.response.defer(ephemeral=True)
+
+        game = self.bot.get_cog("PokemonGame")
+        if pokemon_id not in SPECIES.names:  # Learn its name before showing it
+            async with aiohttp.ClientSession() as session:
+                await game.fetch_pokemon(session, pokemon_id, False, True)
+        boss = await self.bot.get_cog("Combat").fetch_full_data(pokemon_id)
+        if not boss:
+            await interaction.followup.send("❌ Could not summon the boss. Try again.")
+            return
+        max_hp = (boss["stats"]["hp"] * 2 + 50) * RAID_HP_SCALE
+
+        db = self.bot.db
+        async with transaction(db):
+            cursor = await db.execute(
+                """
+                INSERT INTO raids (guild_id, channel_id, pokemon_id, max_hp, hp)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    interaction.guild.id,
+                    interaction.channel.id,
+                    pokemon_id,
+                    max_hp,
+                    max_hp,
+                ),
+            )
+        raid = Raid(
+            cursor.lastrowid,
+            pokemon_id,
+            SPECIES.name(pokemon_id),
+            boss,
+            max_hp,
+            time.monotonic() + RAID_DURATION,
+        )
+        # A plain channel message: edits through the interaction's webhook
+        # would stop working when its token expires (15 min), mid-raid
+        try:
+            raid.message = await interaction.channel.send(
+                f"🚨 **A raid boss appeared!** Everyone has {RAID_DURATION // 60} minutes.",
+                embed=self.get_embed(raid),
+                view=RaidView(self, raid),
+            )
+        except discord.HTTPException:
+            async with transaction(db):
+                await db.execute(
+                    "UPDATE raids SET ended_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (raid.id,),
+                )
+            await interaction.followup.send("❌ I can't post the boss in this channel.")
+            return
+        raid.dirty = False
+        self.raids[interaction.channel.id] = raid
+        await interaction.followup.send(f"✅ **{raid.name}** summoned.")
+
+    @start.autocomplete("species")
+    async def species_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in SPECIES_NAMES.complete(current)
+        ]
+
+
+async def setup(bot):
+    await bot.add_cog(Raids(bot))
@@ -0,0 +1,589 @@
+import json
+import time
+
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from utils.database import get_or_create_uuid, transaction
+from utils.metrics import METRICS
+from utils.ranked import DEFAULT_RATING, Bracket, MatchQueue, elo_update
+
+# --- CONFIGURATION ---
+MATCH_INTERVAL = 5  # Seconds between queue sweeps (windows widen meanwhile)
+FLUSH_INTERVAL = 10  # Seconds between batched rating writes
+QUEUE_TIMEOUT = 15 * 60  # Players leave the queue after this long
+LADDER_PAGE = 10
+TOURNAMENT_MATCH_TIME = 20 * 60  # Then the player ahead on HP advances
+TOURNAMENT_PRIZE = 500
+
+
+class Tournament:
+    """A scheduled bracket; `state` is what goes into tournaments.state."""
+
+    __slots__ = (
+        "id",
+        "guild_id",
+        "channel_id",
+        "starts_at",
+        "every_hours",
+        "status",
+        "entrants",
+        "bracket",
+        "matches",
+    )
+
+    def __init__(
+        self, tournament_id, guild_id, channel_id, starts_at, every_hours, status, state
+    ):
+        self.id = tournament_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.starts_at = starts_at
+        self.every_hours = every_hours
+        self.status = status  # signup -> running -> done
+        data = json.loads(state)
+        self.entrants = data.get("entrants", [])  # [discord_id, name], by seed
+        self.bracket = Bracket(data["bracket"]) if "bracket" in data else None
+        self.matches = data.get("matches", {})  # "round:match" -> [duel_id, started]
+
+    def state(self) -> str:
+        data = {"entrants": self.entrants, "matches": self.matches}
+        if self.bracket:
+            data["bracket"] = self.bracket.rounds
+        return json.dumps(data, separators=(",", ":"))
+
+
+class Ranked(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.queue = MatchQueue()
+        self.ratings = {}  # user_uuid -> rating (read-through, kept current by flush)
+        self.pending = []  # (mode, players, winner) of games not rated yet
+        self.tournaments = {}  # id -> Tournament still in signup or running
+        self.dirty = set()  # Tournament ids to write on the next loop
+
+    async def cog_load(self):
+        async with self.bot.db.execute(
+            """
+            SELECT id, guild_id, channel_id, starts_at, every_hours, status, state
+            FROM tournaments WHERE status != 'done'
+            """
+        ) as cursor:
+            for row in await cursor.fetchall():
+                self.tournaments[row[0]] = Tournament(*row)
+        self.match_loop.start()
+        self.flush_loop.start()
+        self.tournament_loop.start()
+
+    async def cog_unload(self):
+        self.match_loop.cancel()
+        self.flush_loop.cancel()
+        self.tournament_loop.cancel()
+        try:
+            await self.flush()
+        finally:
+            await self.flush_tournaments()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print("Ranked Cog is ready.")
+
+    # --- RATINGS ---
+    async def rating_of(self, user_uuid: str) -> float:
+        rating = self.ratings.get(user_uuid)
+        if rating is None:
+            async with self.bot.db.execute(
+                "SELECT rating FROM ratings WHERE user_uuid = ?", (user_uuid,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            rating = self.ratings[user_uuid] = row[0] if row else DEFAULT_RATING
+        return rating
+
+    def record(self, duel):
+        """Called by Combat when a ranked or tournament duel ends."""
+        winner = duel.battle.winner
+        self.pending.append((duel.mode, duel.players, winner))
+        if duel.mode.startswith("cup:"):
+            _, tournament_id, r, m = duel.mode.split(":")
+            self.advance(int(tournament_id), int(r), int(m), max(winner, 0))
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def flush_loop(self):
+        # Failed games are queued again; raising would stop the loop for good
+        try:
+            await self.flush()
+            await self.flush_tournaments()  # Cup results from record()
+        except Exception as e:
+            print(f"Ranked flush failed, retrying next time: {e}")
+
+    async def flush(self):
+        """Rate every finished game since the last flush, in one transaction."""
+        if not self.pending:
+            return
+        results, self.pending = self.pending, []
+        try:
+            await self.rate(results)
+        except Exception:
+            # Nothing was written: these games are rated on the next flush
+            self.pending[:0] = results
+            raise
+
+    async def rate(self, results):
+        db = self.bot.db
+        uuids = {}
+        for _, players, _ in results:
+            for player in players:
+                if player.id not in uuids:
+                    uuids[player.id] = await get_or_create_uuid(db, *player)
+        changed = {}  # user_uuid -> [rating, games, wins]
+        history = []
+        for mode, players, winner in results:
+            a, b = (uuids[player.id] for player in players)
+            for user in (a, b):
+                if user not in changed:
+                    changed[user] = [await self.rating_of(user), 0, 0]
+            # Games are rated in the order they finished
+            rating_a, rating_b = changed[a][0], changed[b][0]
+            if winner == 1:
+                rating_b, rating_a = elo_update(rating_b, rating_a)
+            else:
+                rating_a, rating_b = elo_update(rating_a, rating_b, draw=winner == -1)
+            delta = rating_a - changed[a][0]  # Player b moved by -delta
+            changed[a][0], changed[b][0] = rating_a, rating_b
+            for side, user in enumerate((a, b)):
+                changed[user][1] += 1
+                changed[user][2] += winner == side
+            history.append((a, b, winner, delta, mode.split(":")[0]))
+
+        async with transaction(db):
+            await db.executemany(
+                """
+                INSERT INTO ratings (user_uuid, rating, games, wins) VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_uuid) DO UPDATE SET
+                    rating = excluded.rating,
+                    games = games + excluded.games,
+                    wins = wins + excluded.wins
+                """,
+                [(user, *stats) for user, stats in changed.items()],
+            )
+            await db.executemany(
+                """
+                INSERT INTO ranked_matches (player_a, player_b, winner, delta, mode)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                history,
+            )
+        for user, (rating, _, _) in changed.items():
+            self.ratings[user] = rating
+
+    # --- MATCHMAKING ---
+    @tasks.loop(seconds=MATCH_INTERVAL)
+    async def match_loop(self):
+        now = time.monotonic()
+        self.queue.expire(now - QUEUE_TIMEOUT)
+        start = time.perf_counter()
+        pairs = self.queue.pair(now)
+        METRICS.since("ranked.pair", "sweep", start)
+        for a, b in pairs:
+            await self.start_match(a, b)
+
+    async def start_match(self, a, b):
+        channel = self.bot.get_channel(a.channel_id)
+        combat = self.bot.get_cog("Combat")
+        duel, error = await combat.create_duel(a.player[:2], b.player[:2], "ranked")
+        if channel is None:
+            return
+        if error:
+            await channel.send(f"❌ Ranked match cancelled: {error}")
+            return
+        await combat.send_duel(
+            channel,
+            duel,
+            f"🏅 **RANKED MATCH!**\n<@{a.player[0]}> ({a.rating:.0f}) 🆚 "
+            f"<@{b.player[0]}> ({b.rating:.0f})",
+        )
+
+    # --- TOURNAMENTS ---
+    async def schedule(self, guild_id, channel_id, starts_at, every_hours):
+        async with transaction(self.bot.db):
+            cursor = await self.bot.db.execute(
+                """
+                INSERT INTO tournaments (guild_id, channel_id, starts_at, every_hours, status)
+                VALUES (?, ?, ?, ?, 'signup')
+                """,
+                (guild_id, channel_id, starts_at, every_hours),
+            )
+        tournament = Tournament(
+            cursor.lastrowid,
+            guild_id,
+            channel_id,
+            starts_at,
+            every_hours,
+            "signup",
+            "{}",
+        )
+        self.tournaments[tournament.id] = tournament
+        return tournament
+
+    def guild_tournament(self, guild_id):
+        for tournament in self.tournaments.values():
+            if tournament.guild_id == guild_id:
+                return tournament
+        return None
+
+    def advance(self, tournament_id, r, m, side):
+        """Put the winner of bracket match (r, m) through to the next round."""
+        tournament = self.tournaments.get(tournament_id)
+        if tournament is None or tournament.bracket is None:
+            return
+        a, b, _ = tournament.bracket.rounds[r][m]
+        tournament.bracket.report(r, m, (a, b)[side])
+        tournament.matches.pop(f"{r}:{m}", None)
+        self.dirty.add(tournament_id)
+
+    @tasks.loop(seconds=30)
+    async def tournament_loop(self):
+        now = int(time.time())
+        for tournament in list(self.tournaments.values()):
+            if tournament.status == "signup" and now >= tournament.starts_at:
+                await self.begin(tournament)
+            if tournament.status == "running":
+                await self.play_round(tournament, now)
+        try:
+            await self.flush_tournaments()
+        except Exception as e:
+            print(f"Tournament flush failed, retrying next time: {e}")
+
+    async def flush_tournaments(self):
+        """Write every tournament changed since the last write."""
+        written = self.dirty & self.tournaments.keys()
+        self.dirty.clear()
+        if not written:
+            return
+        rows = [
+            (self.tournaments[t].status, self.tournaments[t].state(), t)
+            for t in written
+        ]
+        try:
+            async with transaction(self.bot.db):
+                await self.bot.db.executemany(
+                    "UPDATE tournaments SET status = ?, state = ? WHERE id = ?",
+                    rows,
+                )
+        except Exception:
+            # Nothing was written: they go with the next flush
+            self.dirty |= written
+            raise
+
+    async def begin(self, tournament: Tournament):
+        if len(tournament.entrants) < 2:
+            await self.finish(tournament, None)
+            return
+        # Seed by rating: the best two can only meet in the final
+        ratings = {}
+        for discord_id, name in tournament.entrants:
+            user_uuid = await get_or_create_uuid(self.bot.db, discord_id, name)
+            ratings[discord_id] = await self.rating_of(user_uuid)
+        tournament.entrants.sort(key=lambda entrant: -ratings[entrant[0]])
+        tournament.bracket = Bracket.seeded(len(tournament.entrants))
+        tournament.status = "running"
+        self.dirty.add(tournament.id)
+
+        channel = self.bot.get_channel(tournament.channel_id)
+        if channel:
+            seeds = "\n".join(
+                f"`#{seed}` {name} ({ratings[discord_id]:.0f})"
+                for seed, (discord_id, name) in enumerate(tournament.entrants, start=1)
+            )
+            await channel.send(
+                embed=discord.Embed(
+                    title="🏟️ The tournament begins!",
+                    description=seeds,
+                    color=discord.Color.gold(),
+                )
+            )
+
+    async def play_round(self, tournament: Tournament, now: int):
+        """Start every match that is ready and settle the ones that ran too long."""
+        combat = self.bot.get_cog("Combat")
+        channel = self.bot.get_channel(tournament.channel_id)
+        for r, m, a, b in tournament.bracket.ready():
+            p1, p2 = tournament.entrants[a], tournament.entrants[b]
+            match = tournament.matches.get(f"{r}:{m}")
+            if match is None:
+                duel, error = await combat.create_duel(
+                    tuple(p1), tuple(p2), f"cup:{tournament.id}:{r}:{m}"
+                )
+                if error:  # Walkover for the higher seed
+                    self.advance(tournament.id, r, m, 0)
+                    if channel:
+                        await channel.send(f"🏟️ {error} **{p1[1]}** advances.")
+                    continue
+                tournament.matches[f"{r}:{m}"] = [duel.id, now]
+                self.dirty.add(tournament.id)
+                if channel:
+                    await combat.send_duel(
+                        channel,
+                        duel,
+                        f"🏟️ **Round {r + 1}**: <@{p1[0]}> 🆚 <@{p2[0]}>",
+                    )
+            elif now - match[1] > TOURNAMENT_MATCH_TIME:
+                # Out of time: whoever has more HP left (as a share) goes through
+                duel = await combat.get_duel(match[0])
+                side = 0
+                if duel is not None:
+                    left = [f.hp / f.max_hp for f in duel.battle.fighters]
+                    side = int(left[1] > left[0])
+                    combat.close_duel(duel)
+                self.advance(tournament.id, r, m, side)
+                if channel:
+                    await channel.send(
+                        f"⏰ Time! **{(p1, p2)[side][1]}** advances on remaining HP."
+                    )
+
+        if tournament.bracket.champion is not None:
+            await self.finish(tournament, tournament.bracket.champion)
+
+    async def finish(self, tournament: Tournament, champion):
+        """Close the tournament, pay the champion and schedule the next one."""
+        del self.tournaments[tournament.id]
+        self.dirty.discard(tournament.id)
+        db = self.bot.db
+        winner = tournament.entrants[champion] if champion is not None else None
+        if winner:
+            winner_uuid = await get_or_create_uuid(db, *winner)
+        async with transaction(db):
+            await db.execute(
+                "UPDATE tournaments SET status = 'done', state = ? WHERE id = ?",
+                (tournament.state(), tournament.id),
+            )
+            if winner:
+                await db.execute(
+                    """
+                    INSERT INTO game_profile (user_uuid, coins) VALUES (?, ?)
+                    ON CONFLICT(user_uuid) DO UPDATE SET coins = coins + excluded.coins
+                    """,
+                    (winner_uuid, TOURNAMENT_PRIZE),
+                )
+
+        nxt = None
+        if tournament.every_hours:
+            starts_at = tournament.starts_at
+            while starts_at <= time.time():
+                starts_at += tournament.every_hours * 3600
+            nxt = await self.schedule(
+                tournament.guild_id,
+                tournament.channel_id,
+                starts_at,
+                tournament.every_hours,
+            )
+
+        channel = self.bot.get_channel(tournament.channel_id)
+        if channel is None:
+            return
+        if winner:
+            text = f"🏆 <@{winner[0]}> won the tournament and **{TOURNAMENT_PRIZE} Coins**!"
+        else:
+            text = "🏟️ Not enough entrants, the tournament is cancelled."
+        if nxt:
+            text += (
+                f"\nNext tournament <t:{nxt.starts_at}:R> - `/ranked join` to enter."
+            )
+        await channel.send(text)
+
+    # --- COMMANDS ---
+    ranked_group = app_commands.Group(
+        name="ranked", description="Rated battles, the ladder and tournaments"
+    )
+
+    @ranked_group.command(
+        name="queue", description="Find an opponent close to your rating"
+    )
+    async def join_queue(self, interaction: discord.Interaction):
+        user = interaction.user
+        if user.id in self.queue:
+            await interaction.response.send_message(
+                "🔎 You are already in the queue.", ephemeral=True
+            )
+            return
+        await interaction.response.defer(ephemeral=True)
+        if not await self.bot.get_cog("Combat").get_buddy_data(user.id, user.name):
+            await interaction.followup.send("❌ Set a buddy first! `/pokemon buddy`")
+            return
+        user_uuid = await get_or_create_uuid(self.bot.db, user.id, user.name)
+        rating = await self.rating_of(user_uuid)
+        if user.id in self.queue:  # Clicked twice while we were looking things up
+            return
+
+        start = time.perf_counter()
+        match = self.queue.join(
+            (user.id, user.name, user_uuid),
+            rating,
+            time.monotonic(),
+            interaction.channel.id,
+        )
+        METRICS.since("ranked.join", "queue", start)
+        if match:
+            await interaction.followup.send("⚔️ Opponent found!")
+            await self.start_match(*match)
+        else:
+            await interaction.followup.send(
+                f"🔎 Looking for an opponent near **{rating:.0f}** "
+                f"({len(self.queue)} in queue). `/ranked leave` to stop."
+            )
+
+    @ranked_group.command(name="leave", description="Leave the ranked queue")
+    async def leave_queue(self, interaction: discord.Interaction):
+        if self.queue.leave(interaction.user.id):
+            await interaction.response.send_message(
+                "👋 You left the queue.", ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                "❌ You are not in the queue.", ephemeral=True
+            )
+
+    @ranked_group.command(name="ladder", description="Top rated trainers")
+    async def ladder(
+        self,
+        interaction: discord.Interaction,
+        page: app_commands.Range[int, 1, None] = 1,
+    ):
+        await interaction.response.defer()
+        await self.flush()
+        offset = (page - 1) * LADDER_PAGE
+        async with self.bot.db.execute(
+            """
+            SELECT users.username, ratings.rating, ratings.games, ratings.wins
+            FROM ratings
+            JOIN users ON ratings.user_uuid = users.user_uuid
+            ORDER BY ratings.rating DESC LIMIT ? OFFSET ?
+            """,
+            (LADDER_PAGE, offset),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            await interaction.followup.send("No ranked games on this page yet!")
+            return
+
+        lines = []
+        for index, (username, rating, games, wins) in enumerate(rows, start=offset + 1):
+            medal = {1: "🥇", 2: "🥈", 3: "🥉"}.get(index, f"#{index}")
+            lines.append(
+                f"{medal} **{username or 'Unknown User'}** — {rating:.0f} "
+                f"({wins}W / {games - wins}L)"
+            )
+        embed = discord.Embed(
+            title="🏅 Ranked Ladder",
+            description="\n".join(lines),
+            color=discord.Color.gold(),
+        )
+        embed.set_footer(text=f"Page {page} • /ranked ladder page:{page + 1}")
+        await interaction.followup.send(embed=embed)
+
+    @ranked_group.command(name="rating", description="Check a ranked rating")
+    async def rating(
+        self, interaction: discord.Interaction, member: discord.Member = None
+    ):
+        target = member or interaction.user
+        await interaction.response.defer()
+        await self.flush()
+        target_uuid = await get_or_create_uuid(self.bot.db, target.id, target.name)
+        async with self.bot.db.execute(
+            "SELECT rating, games, wins FROM ratings WHERE user_uuid = ?",
+            (target_uuid,),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            await interaction.followup.send(
+                f"**{target.name}** is unrated ({DEFAULT_RATING:.0f}). `/ranked queue` to play!"
+            )
+            return
+        rating, games, wins = row
+        async with self.bot.db.execute(
+            "SELECT COUNT(*) + 1 FROM ratings WHERE rating > ?", (rating,)
+        ) as cursor:
+            (position,) = await cursor.fetchone()
+        await interaction.followup.send(
+            f"🏅 **{target.name}**: **{rating:.0f}** • Rank #{position} • "
+            f"{wins}W / {games - wins}L"
+        )
+
+    @ranked_group.command(
+        name="tournament", description="ADMIN: Schedule (recurring) tournaments here"
+    )
+    @app_commands.describe(
+        signup_minutes="Time to sign up before the bracket starts",
+        every_hours="Start a new one this often (0: just once / stop the series)",
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def tournament(
+        self,
+        interaction: discord.Interaction,
+        signup_minutes: app_commands.Range[int, 1, 24 * 60] = 30,
+        every_hours: app_commands.Range[int, 0, 7 * 24] = 24,
+    ):
+        current = self.guild_tournament(interaction.guild.id)
+        if current:
+            current.every_hours = every_hours
+            async with transaction(self.bot.db):
+                await self.bot.db.execute(
+                    "UPDATE tournaments SET every_hours = ? WHERE id = ?",
+                    (every_hours, current.id),
+                )
+            await interaction.response.send_message(
+                "🏟️ A tournament is already scheduled; "
+                + (
+                    f"it now repeats every {every_hours}h."
+                    if every_hours
+                    else "it won't repeat."
+                ),
+                ephemeral=True,
+            )
+            return
+
+        tournament = await self.schedule(
+            interaction.guild.id,
+            interaction.channel.id,
+            int(time.time()) + signup_minutes * 60,
+            every_hours,
+        )
+        await interaction.response.send_message(
+            f"🏟️ **Tournament!** Starts <t:{tournament.starts_at}:R>, "
+            f"the champion wins **{TOURNAMENT_PRIZE} Coins**. `/ranked join` to enter."
+        )
+
+    @ranked_group.command(
+        name="join", description="Sign up for this server's tournament"
+    )
+    async def join_tournament(self, interaction: discord.Interaction):
+        tournament = self.guild_tournament(interaction.guild.id)
+        if tournament is None or tournament.status != "signup":
+            await interaction.response.send_message(
+                "❌ No tournament is open for sign-ups.", ephemeral=True
+            )
+            return
+        user = interaction.user
+        if any(entrant[0] == user.id for entrant in tournament.entrants):
+            await interaction.response.send_message(
+                "✅ You are already signed up.", ephemeral=True
+            )
+            return
+        await interaction.response.defer(ephemeral=True)
+        if not await self.bot.get_cog("Combat").get_buddy_data(user.id, user.name):
+            await interaction.followup.send("❌ Set a buddy first! `/pokemon buddy`")
+            return
+        if tournament.status == "signup" and all(
+            entrant[0] != user.id for entrant in tournament.entrants
+        ):
+            tournament.entrants.append([user.id, user.name])
+            self.dirty.add(tournament.id)
+        await interaction.followup.send(
+            f"✅ Signed up! {len(tournament.entrants)} entrants so far, "
+            f"starts <t:{tournament.starts_at}:R>."
+        )
+
+
+async def setup(bot):
+    await bot.add_cog(Ranked(bot))
@@ -0,0 +1,217 @@
+import asyncio
+import time
+
+import aiohttp
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from utils.autocomplete import OWNED
+from utils.database import get_or_create_uuid, transaction
+from utils.inventory import add_pokemon
+from utils.spawns import ActivityTracker
+from utils.species import SPECIES, check_shiny_art, mark_caught, sprite_url
+
+SPAWN_TTL = 120  # Seconds before a wild Pokémon flees
+
+
+class SpawnView(discord.ui.View):
+    def __init__(self, cog, spawn_id, pokemon_id, is_shiny, is_legendary):
+        super().__init__(timeout=SPAWN_TTL)
+        self.cog = cog
+        self.spawn_id = spawn_id
+        self.pokemon_id = pokemon_id
+        self.is_shiny = is_shiny
+        self.is_legendary = is_legendary
+        self.claimer = None  # First click, set before any await
+        self.winner = None  # Set once the conditional write succeeded
+        self.message = None
+
+    @discord.ui.button(label="Catch!", emoji="🎯", style=discord.ButtonStyle.green)
+    async def catch(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.claim(interaction, self)
+
+    async def on_timeout(self):
+        if self.winner is None and self.message:
+            embed = self.message.embeds[0]
+            embed.title = "💨 The wild Pokémon fled..."
+            try:
+                await self.message.edit(embed=embed, view=None)
+            except discord.HTTPException:
+                pass
+
+
+class Spawns(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.tracker = ActivityTracker()
+        self._tasks = set()  # Spawns in progress (keeps a reference)
+        # Hot path overhead, shown by /spawnstats
+        self.messages = 0
+        self.hot_ns = 0
+        self.spawned = 0
+        self.claims = 0
+        self.lost_races = 0
+
+    async def cog_load(self):
+        self.prune_loop.start()
+
+    async def cog_unload(self):
+        self.prune_loop.cancel()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print("Spawns Cog is ready.")
+
+    @tasks.loop(minutes=10)
+    async def prune_loop(self):
+        self.tracker.prune(time.monotonic())
+        # Expired spawns can't be claimed any more; their rows are dead weight
+        db = self.bot.db
+        async with transaction(db):
+            await db.execute(
+                "DELETE FROM wild_spawns WHERE expires_at <= ?", (int(time.time()),)
+            )
+
+    # --- HOT PATH: every guild message ---
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot or message.guild is None:
+            return
+        start = time.perf_counter_ns()
+        spawn = self.tracker.hit(message.channel.id, time.monotonic())
+        self.hot_ns += time.perf_counter_ns() - start
+        self.messages += 1
+
+        if spawn:
+            task = asyncio.create_task(self.spawn(message.channel))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    # --- SPAWNING ---
+    async def spawn(self, channel):
+        game = self.bot.get_cog("PokemonGame")
+        if game is None or not channel.permissions_for(channel.guild.me).send_messages:
+            return
+        ((pokemon_id, tier, is_shiny),) = game.gacha.pulls(1)
+        is_legendary = tier == "legendary"
+        if pokemon_id not in SPECIES.names:  # Learn its name before showing it
+            async with aiohttp.ClientSession() as session:
+                await game.fetch_pokemon(session, pokemon_id, is_shiny, is_legendary)
+            if pokemon_id not in SPECIES.names:
+                return
+        if is_shiny and pokemon_id not in SPECIES.shiny_art:
+            async with aiohttp.ClientSession() as session:
+                await check_shiny_art(session, [pokemon_id])
+
+        db = self.bot.db
+        async with transaction(db):
+            cursor = await db.execute(
+                """
+                INSERT INTO wild_spawns
+                    (guild_id, channel_id, pokemon_id, is_shiny, is_legendary, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    channel.guild.id,
+                    channel.id,
+                    pokemon_id,
+                    is_shiny,
+                    is_legendary,
+                    int(time.time()) + SPAWN_TTL,
+                ),
+            )
+
+        view = SpawnView(self, cursor.lastrowid, pokemon_id, is_shiny, is_legendary)
+        embed = discord.Embed(
+            title=f"🌿 A wild {'✨ ' if is_shiny else ''}{SPECIES.name(pokemon_id)} appeared!",
+            description="First one to press **Catch!** keeps it.",
+            color=discord.Color.gold() if is_legendary else discord.Color.green(),
+        )
+        embed.set_image(url=sprite_url(pokemon_id, is_shiny))
+        view.message = await channel.send(embed=embed, view=view)
+        self.spawned += 1
+
+    async def claim(self, interaction: discord.Interaction, view: SpawnView):
+        # Only the first click goes to the DB; everyone else is answered from
+        # memory at once, however busy the write lock is
+        if view.claimer is not None:
+            self.lost_races += 1
+            await interaction.response.send_message(
+                f"💨 Too slow! {view.claimer.mention} got there first.",
+                ephemeral=True,
+            )
+            return
+        view.claimer = interaction.user
+        await interaction.response.defer()  # The write may queue behind others
+
+        db = self.bot.db
+        name = SPECIES.name(view.pokemon_id)
+        try:
+            async with transaction(db):
+                user_uuid = await get_or_create_uuid(
+                    db, interaction.user.id, interaction.user.name
+                )
+                # The single conditional write that decides the race (also
+                # against expiry and other bot instances)
+                cursor = await db.execute(
+                    """
+                    UPDATE wild_spawns SET claimed_by = ?
+                    WHERE id = ? AND claimed_by IS NULL AND expires_at > ?
+                    """,
+                    (user_uuid, view.spawn_id, int(time.time())),
+                )
+                won = cursor.rowcount == 1
+                if won:
+                    await add_pokemon(
+                        db,
+                        [
+                            (
+                                user_uuid,
+                                view.pokemon_id,
+                                name,
+                                view.is_shiny,
+                                view.is_legendary,
+                                1,
+                            )
+                        ],
+                    )
+                    await mark_caught(db, user_uuid, [view.pokemon_id])
+        except Exception:
+            view.claimer = None  # Let the next click try again
+            raise
+        if not won:
+            self.lost_races += 1
+            await interaction.followup.send(
+                "💨 Too late! The wild Pokémon is gone.", ephemeral=True
+            )
+            return
+
+        view.winner = interaction.user
+        view.stop()
+        OWNED.invalidate(interaction.user.id)
+        self.claims += 1
+
+        embed = interaction.message.embeds[0]
+        embed.title = f"🎉 {interaction.user.display_name} caught {'✨ ' if view.is_shiny else ''}{name}!"
+        embed.description = None
+        await interaction.edit_original_response(embed=embed, view=None)
+
+    # --- STATS ---
+    @app_commands.command(
+        name="spawnstats", description="ADMIN: Wild spawn engine statistics"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def spawn_stats(self, interaction: discord.Interaction):
+        per_message = self.hot_ns / self.messages if self.messages else 0
+        await interaction.response.send_message(
+            f"📊 **Wild Spawns**\n"
+            f"Messages seen: **{self.messages}** • Overhead: **{per_message / 1000:.2f} µs**/message\n"
+            f"Active channels: **{len(self.tracker.channels)}**\n"
+            f"Spawned: **{self.spawned}** • Caught: **{self.claims}** • Lost races: **{self.lost_races}**",
+            ephemeral=True,
+        )
+
+
+async def setup(bot):
+    await bot.add_cog(Spawns(bot))
@@ -6,6 +6,8 @@ import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
+from utils.data_manager import load_data
+
 # Import database configuration
 # This ensures main.py uses the exact same DB path as your setup script
 from utils.database import DB_NAME, initialize_database
@@ -37,15 +39,22 @@ class MyBot(commands.Bot):
         self.db = await aiosqlite.connect(DB_NAME)
         print(f"--- Connected to Database at {DB_NAME} ---")
 
-        # 3. Load Cogs
+        # 3. Load Guild Settings into memory (imports server_data.json once)
+        await load_data(self.db)
+
+        # 4. Load Cogs
         # Add any new cogs to this list (filename without .py)
         initial_extensions = [
             "cogs.leveling",
             "cogs.pokemon",
+            "cogs.market",
+            "cogs.spawns",
+            "cogs.raids",
             "cogs.music",
             "cogs.admin",
             "cogs.help",
             "cogs.combat",
+            "cogs.ranked",
         ]
 
         for extension in initial_extensions:
@@ -55,7 +64,7 @@ class MyBot(commands.Bot):
             except Exception as e:
                 print(f"Failed to load extension {extension}: {e}")
 
-        # 4. Sync Slash Commands
+        # 5. Sync Slash Commands
         # This registers your /commands with Discord
         try:
             synced = await self.tree.sync()
@@ -64,11 +73,11 @@ class MyBot(commands.Bot):
             print(f"Failed to sync commands: {e}")
 
     async def close(self):
-        # Safely close the database when the bot shuts down
+        # Unload the cogs first: their final flushes still need the database
+        await super().close()
         if self.db:
             await self.db.close()
             print("--- Database Connection Closed ---")
-        await super().close()
 
     async def on_ready(self):
         print(f"Logged in as {self.user} (ID: {self.user.id})")
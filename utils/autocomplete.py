@@ -0,0 +1,195 @@
+import bisect
+import time
+from collections import OrderedDict
+
+from utils.species import SPECIES
+
+# Discord shows at most 25 autocomplete choices
+MAX_CHOICES = 25
+
+MAX_CACHED_USERS = 512
+OWNED_TTL = 300  # seconds; writes invalidate earlier, this only bounds staleness
+MAX_OWNED_UNITS = 5000  # newest rows offered for ID parameters
+
+SPECIES_LIST_URL = "https://pokeapi.co/api/v2/pokemon-species?limit=1025"
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # First MAX_CHOICES completions below this node, sorted
+
+
+class PrefixTrie:
+    """Case-insensitive prefix trie over display names.
+
+    Every node keeps its first MAX_CHOICES completions, so a lookup is just a
+    walk down the typed prefix, whatever the number of names.
+    """
+
+    def __init__(self, names=()):
+        self.root = _Node()
+        self._names = set()
+        for name in names:
+            self.insert(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def insert(self, name: str):
+        if name in self._names:
+            return
+        self._names.add(name)
+        entry = (name.lower(), name)
+        node = self.root
+        self._offer(node, entry)
+        for char in entry[0]:
+            node = node.children.setdefault(char, _Node())
+            self._offer(node, entry)
+
+    @staticmethod
+    def _offer(node, entry):
+        if len(node.top) < MAX_CHOICES or entry < node.top[-1]:
+            bisect.insort(node.top, entry)
+            del node.top[MAX_CHOICES:]
+
+    def complete(self, prefix: str):
+        """Up to MAX_CHOICES names starting with `prefix`, alphabetically."""
+        node = self.root
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [name for _, name in node.top]
+
+
+class Owned:
+    """What one user owns, as far as autocomplete needs to know."""
+
+    __slots__ = ("names", "units", "loaded_at")
+
+    def __init__(self, names: PrefixTrie, units):
+        self.names = names  # Species names
+        self.units = units  # [(row id, lowercase name/nickname, label)], newest first
+        self.loaded_at = time.monotonic()
+
+    def match_units(self, current: str):
+        """Rows whose ID, species or nickname starts with what was typed."""
+        current = current.lower().lstrip("#")
+        matches = []
+        for row_id, words, label in self.units:
+            if (
+                not current
+                or str(row_id).startswith(current)
+                or any(word.startswith(current) for word in words)
+            ):
+                matches.append((row_id, label))
+                if len(matches) == MAX_CHOICES:
+                    break
+        return matches
+
+
+def _unit_label(row_id, name, nickname, is_shiny, quantity):
+    label = f"#{row_id} {nickname} ({name})" if nickname else f"#{row_id} {name}"
+    if is_shiny:
+        label += " ✨"
+    if quantity > 1:
+        label += f" ×{quantity}"
+    return label[:100]
+
+
+class OwnedCache:
+    """Per-user LRU of owned species and Pokémon IDs, keyed by Discord ID.
+
+    Commands that change a collection call invalidate(); entries also expire
+    after OWNED_TTL as a safety net.
+    """
+
+    def __init__(self, max_users: int = MAX_CACHED_USERS, ttl: float = OWNED_TTL):
+        self.db = None
+        self.max_users = max_users
+        self.ttl = ttl
+        self._cache = OrderedDict()  # discord_id -> Owned
+        self._loading = {}  # discord_id -> token of the load in flight
+
+    def bind(self, db):
+        self.db = db
+        self._cache.clear()
+
+    def invalidate(self, *discord_ids: int):
+        for discord_id in discord_ids:
+            self._cache.pop(discord_id, None)
+            self._loading.pop(discord_id, None)
+
+    async def get(self, discord_id: int) -> Owned:
+        owned = self._cache.get(discord_id)
+        if owned is not None and time.monotonic() - owned.loaded_at < self.ttl:
+            self._cache.move_to_end(discord_id)
+            return owned
+
+        token = self._loading[discord_id] = object()
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                """
+                SELECT DISTINCT c.pokemon_name
+                FROM users u JOIN collection c ON c.user_uuid = u.user_uuid
+                WHERE u.discord_id = ?
+                """,
+                (discord_id,),
+            )
+            names = PrefixTrie(row[0] for row in await cursor.fetchall())
+            await cursor.execute(
+                """
+                SELECT c.id, c.pokemon_name, c.nickname, c.is_shiny, c.quantity
+                FROM users u JOIN collection c ON c.user_uuid = u.user_uuid
+                WHERE u.discord_id = ?
+                ORDER BY c.id DESC LIMIT ?
+                """,
+                (discord_id, MAX_OWNED_UNITS),
+            )
+            units = [
+                (
+                    row[0],
+                    tuple(word.lower() for word in row[1:3] if word),
+                    _unit_label(*row),
+                )
+                for row in await cursor.fetchall()
+            ]
+        owned = Owned(names, units)
+
+        # Don't cache a snapshot that a write made stale while we were reading
+        if self._loading.get(discord_id) is token:
+            del self._loading[discord_id]
+            self._cache[discord_id] = owned
+            self._cache.move_to_end(discord_id)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        return owned
+
+
+SPECIES_NAMES = PrefixTrie()
+OWNED = OwnedCache()
+
+
+async def load_species_names(session, names=()):
+    """Fill SPECIES_NAMES with every species PokeAPI knows, plus `names`.
+
+    SPECIES learns each listed name's id too, so whatever autocomplete offers
+    resolves with SPECIES.id_of.
+    """
+    for name in names:
+        SPECIES_NAMES.insert(name)
+    async with session.get(SPECIES_LIST_URL) as resp:
+        if resp.status != 200:
+            return
+        data = await resp.json()
+    for species in data["results"]:
+        name = species["name"].capitalize()
+        SPECIES_NAMES.insert(name)
+        # ".../pokemon-species/25/"
+        SPECIES.add_name(int(species["url"].rstrip("/").rsplit("/", 1)[1]), name)
@@ -0,0 +1,635 @@
+"""Battle engine, free of Discord.
+
+DuelView drives a Battle with button presses; the simulator drives it with
+an AI on both sides. Simulation mode plays every species pair over a
+process pool and writes the win-rate matrix:
+    python -m utils.battle --fetch            # build the roster from PokeAPI once
+    python -m utils.battle --battles 4 --workers 8
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+import numpy as np
+
+from utils.species import MAX_SPECIES_ID, TYPES
+from utils.typechart import (
+    MOVE_NAMES,
+    MOVE_POWER,
+    TYPE_INDEX,
+    deck_damage,
+    deck_of,
+    type_ids,
+)
+
+STARTER_ABILITIES = ("blaze", "torrent", "overgrow", "swarm")
+SHOWN_ABILITIES = ("intimidate", "blaze", "huge-power")  # Listed on the embed
+MAX_TURNS = 200  # A battle still running after this many moves is a draw
+LOG_SIZE = 8  # Lines kept per battle (the embed shows the last 4)
+
+_POWER = [int(p) for p in MOVE_POWER]  # Plain ints index faster than NumPy
+
+ROSTER_FILE = "data/battle_roster.json"
+
+# --- REPLAY FORMAT ---
+# header: version byte, then per fighter base hp/attack/defense (u16) and four
+# length-prefixed strings (name, ability, primary type, "/"-joined types).
+# Every move after that is one 4-byte TURN record: flags, global move index,
+# damage dealt or HP healed (u16, saturating).
+REPLAY_VERSION = 1
+TURN = struct.Struct("<BBH")
+_STATS = struct.Struct("<HHH")
+# Flag bits
+SIDE = 0x01  # Side that moved
+EFFECT = 0x06  # Effectiveness code << 1 (see EFFECT_*)
+ABILITY = 0x08  # An ability boosted the move
+SURRENDER = 0x80  # SIDE gave up (move and amount are 0)
+EFFECT_HEAL, EFFECT_WEAK, EFFECT_NORMAL, EFFECT_SUPER = range(4)
+
+
+def parse_battle_data(data: dict) -> dict:
+    """Stats, types and first ability out of a PokeAPI /pokemon response."""
+    types = [t["type"]["name"] for t in data["types"]]
+    return {
+        "stats": {s["stat"]["name"]: s["base_stat"] for s in data["stats"]},
+        "type": types[0],  # Primary type picks the move deck
+        "types": types,
+        "ability": data["abilities"][0]["ability"]["name"],
+    }
+
+
+class Fighter:
+    """One side's Pokémon, as small as it can be (no per-instance dict)."""
+
+    __slots__ = (
+        "name",
+        "ability",
+        "type",
+        "types",
+        "deck",
+        "base_hp",
+        "attack",
+        "defense",
+        "max_hp",
+        "hp",
+        "damage",
+        "multipliers",
+    )
+
+    def __init__(self, data: dict):
+        stats = data["stats"]
+        self.name = data["name"]
+        self.ability = data["ability"]
+        self.type = data["type"]
+        self.types = type_ids(data.get("types") or data["type"])
+        self.deck = tuple(deck_of(data["type"]).tolist())
+        self.base_hp = stats["hp"]
+        self.attack = stats["attack"]  # Intimidate lowers it on entry
+        self.defense = stats["defense"]
+        # Level 50 approximation
+        self.max_hp = self.base_hp * 2 + 50
+        self.hp = self.max_hp
+        self.damage = self.multipliers = ()  # Filled in once per matchup
+
+    @property
+    def moves(self):
+        return [(MOVE_NAMES[i], _POWER[i]) for i in self.deck]
+
+    def copy(self) -> "Fighter":
+        clone = Fighter.__new__(Fighter)
+        for name in Fighter.__slots__:  # Everything but hp is immutable
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def data(self) -> dict:
+        """Constructor input for this fighter as it is now (for snapshots)."""
+        return {
+            "name": self.name,
+            "ability": self.ability,
+            "type": self.type,
+            "types": [TYPES[t] for t in self.types],
+            "stats": {
+                "hp": self.base_hp,
+                "attack": self.attack,
+                "defense": self.defense,
+            },
+        }
+
+
+class Battle:
+    """Two fighters taking turns; side 0 moves first.
+
+    The log is a ring buffer of the last LOG_SIZE lines, which is all the
+    embed shows.
+    """
+
+    __slots__ = ("fighters", "turn", "turns", "winner", "logs", "replay")
+
+    def __init__(
+        self,
+        a: dict,
+        b: dict,
+        log: bool = True,
+        entry: bool = True,
+        record: bool = False,
+    ):
+        self.fighters = (Fighter(a), Fighter(b))
+        self.turn = 0
+        self.turns = 0
+        self.winner = None  # Side index once the battle is over, -1 for a draw
+        self.logs = deque(["🛑 Battle Start!"], maxlen=LOG_SIZE) if log else None
+        # Replay bytes (header + one TURN per move) when recording
+        self.replay = bytearray(encode_header(self.fighters)) if record else None
+
+        # ABILITY: Intimidate Check (On Entry); skipped when restoring
+        if entry:
+            self.apply_entry_abilities()
+
+        # Stats are fixed from here on: score both decks once per matchup
+        for side, fighter in enumerate(self.fighters):
+            foe = self.fighters[1 - side]
+            damage, multipliers = deck_damage(
+                np.array(fighter.deck),
+                fighter.types,
+                foe.types,
+                fighter.attack,
+                foe.defense,
+                fighter.ability,
+            )
+            fighter.damage = tuple(damage.tolist())
+            fighter.multipliers = tuple(multipliers.tolist())
+
+    # --- SNAPSHOTS ---
+    def snapshot(self) -> dict:
+        """JSON-ready state; Battle.restore() turns it back into a Battle."""
+        return {
+            "fighters": [fighter.data() for fighter in self.fighters],
+            "hp": [fighter.hp for fighter in self.fighters],
+            "turn": self.turn,
+            "turns": self.turns,
+            "winner": self.winner,
+            "logs": list(self.logs or ()),
+            "replay": self.replay and base64.b64encode(self.replay).decode(),
+        }
+
+    def copy(self) -> "Battle":
+        """Log-free clone for search playouts."""
+        clone = Battle.__new__(Battle)
+        clone.fighters = (self.fighters[0].copy(), self.fighters[1].copy())
+        clone.turn = self.turn
+        clone.turns = self.turns
+        clone.winner = self.winner
+        clone.logs = None
+        clone.replay = None
+        return clone
+
+    @classmethod
+    def restore(cls, snapshot: dict) -> "Battle":
+        battle = cls(*snapshot["fighters"], entry=False)
+        for fighter, hp in zip(battle.fighters, snapshot["hp"]):
+            fighter.hp = hp
+        battle.turn = snapshot["turn"]
+        battle.turns = snapshot["turns"]
+        battle.winner = snapshot["winner"]
+        battle.logs.clear()
+        battle.logs.extend(snapshot["logs"])
+        if snapshot.get("replay"):
+            battle.replay = bytearray(base64.b64decode(snapshot["replay"]))
+        return battle
+
+    def log(self, line: str):
+        if self.logs is not None:
+            self.logs.append(line)
+
+    def apply_entry_abilities(self):
+        for side, fighter in enumerate(self.fighters):
+            foe = self.fighters[1 - side]
+            if fighter.ability == "intimidate":
+                foe.attack *= 0.66
+                self.log(f"😤 {fighter.name}'s Intimidate cut {foe.name}'s Attack!")
+        # Drizzle / Drought could go here
+
+    def hit(self, side: int, slot: int):
+        """(damage, multiplier, ability_msg) of `side` using deck[slot] right now."""
+        fighter = self.fighters[side]
+        damage = fighter.damage[slot]
+        ability_msg = " (Huge Power!)" if fighter.ability == "huge-power" else ""
+        # Blaze/Torrent/Overgrow (Boosts Type moves at < 1/3 HP)
+        if fighter.ability in STARTER_ABILITIES and fighter.hp < fighter.max_hp / 3:
+            damage = int(damage * 1.5)
+            ability_msg = f" ({fighter.ability.upper()}!)"
+        return damage, fighter.multipliers[slot], ability_msg
+
+    def play(self, slot: int) -> bool:
+        """The side to move uses deck[slot]. True once the battle is over."""
+        attacker = self.fighters[self.turn]
+        defender = self.fighters[1 - self.turn]
+        move_index = attacker.deck[slot]
+        move_name = MOVE_NAMES[move_index]
+
+        # HEAL / STATUS
+        if _POWER[move_index] == 0:
+            heal_amt = int(attacker.base_hp * 0.5)  # Heal 50% base HP
+            attacker.hp = min(attacker.max_hp, attacker.hp + heal_amt)
+            self.log(f"💚 {attacker.name} used {move_name} and healed!")
+            if self.replay is not None:
+                self.replay += TURN.pack(self.turn, move_index, min(heal_amt, 0xFFFF))
+
+        # DAMAGE
+        else:
+            dmg, multiplier, ability_msg = self.hit(self.turn, slot)
+            defender.hp -= dmg
+            if self.logs is not None:
+                eff_text = ""
+                if multiplier > 1:
+                    eff_text = " It's Super Effective! 💥"
+                elif multiplier < 1:
+                    eff_text = " It's not very effective..."
+                self.log(
+                    f"⚔️ {attacker.name} used {move_name}!{eff_text}{ability_msg} (-{dmg})"
+                )
+            if self.replay is not None:
+                effect = (
+                    EFFECT_SUPER
+                    if multiplier > 1
+                    else EFFECT_WEAK
+                    if multiplier < 1
+                    else EFFECT_NORMAL
+                )
+                flags = self.turn | effect << 1 | (ABILITY if ability_msg else 0)
+                self.replay += TURN.pack(flags, move_index, min(dmg, 0xFFFF))
+
+        # Win Check
+        self.turns += 1
+        if defender.hp <= 0:
+            self.winner = self.turn
+            return True
+        if self.turns >= MAX_TURNS:
+            self.winner = -1
+            return True
+
+        # Switch Turn
+        self.turn = 1 - self.turn
+        return False
+
+    def surrender(self, side: int):
+        self.fighters[side].hp = 0
+        self.winner = 1 - side
+        if self.replay is not None:
+            self.replay += TURN.pack(SURRENDER | side, 0, 0)
+
+
+# --- REPLAYS ---
+def _pack_text(text: str) -> bytes:
+    raw = text.encode()[:255]
+    return bytes((len(raw),)) + raw
+
+
+def encode_header(fighters) -> bytes:
+    """Replay header for two fighters, as they were before entry abilities."""
+    out = bytearray((REPLAY_VERSION,))
+    for fighter in fighters:
+        out += _STATS.pack(fighter.base_hp, int(fighter.attack), int(fighter.defense))
+        for text in (
+            fighter.name,
+            fighter.ability,
+            fighter.type,
+            "/".join(TYPES[t] for t in fighter.types),
+        ):
+            out += _pack_text(text)
+    return bytes(out)
+
+
+def decode_header(data) -> tuple:
+    """(fighter a data, fighter b data, offset of the first TURN record)."""
+    if data[0] != REPLAY_VERSION:
+        raise ValueError(f"Unknown replay version {data[0]}")
+    offset = 1
+    fighters = []
+    for _ in range(2):
+        hp, attack, defense = _STATS.unpack_from(data, offset)
+        offset += _STATS.size
+        texts = []
+        for _ in range(4):
+            length = data[offset]
+            texts.append(
+                bytes(data[offset + 1 : offset + 1 + length]).decode(errors="ignore")
+            )
+            offset += 1 + length
+        name, ability, p_type, types = texts
+        fighters.append(
+            {
+                "name": name,
+                "ability": ability,
+                "type": p_type,
+                "types": [t for t in types.split("/") if t in TYPE_INDEX],
+                "stats": {"hp": hp, "attack": attack, "defense": defense},
+            }
+        )
+    return fighters[0], fighters[1], offset
+
+
+def replay_turns(data):
+    """Raw TURN tuples (flags, move index, amount): a scan without the engine."""
+    offset = decode_header(data)[2]
+    return TURN.iter_unpack(memoryview(data)[offset:])
+
+
+def replay(data):
+    """Re-run a recorded battle through the engine.
+
+    Yields the Battle at the start and after every recorded move (the same
+    object, with an unbounded log). Raises ValueError if the engine no longer
+    produces the recorded numbers.
+    """
+    a, b, _ = decode_header(data)
+    battle = Battle(a, b)
+    battle.logs = deque(battle.logs)  # Keep every line
+    yield battle
+    for flags, move_index, amount in replay_turns(data):
+        side = flags & SIDE
+        if flags & SURRENDER:
+            battle.surrender(side)
+        else:
+            fighter = battle.fighters[side]
+            if battle.turn != side or move_index not in fighter.deck:
+                raise ValueError(f"Replay diverged on move {battle.turns + 1}")
+            slot = fighter.deck.index(move_index)
+            if _POWER[move_index]:
+                dealt = battle.hit(side, slot)[0]
+            else:
+                dealt = int(fighter.base_hp * 0.5)
+            if min(dealt, 0xFFFF) != amount:
+                raise ValueError(f"Replay diverged on move {battle.turns + 1}")
+            battle.play(slot)
+        yield battle
+
+
+def transcript(data) -> list:
+    """Every log line of a recorded battle."""
+    battle = None
+    for battle in replay(data):
+        pass
+    return list(battle.logs)
+
+
+def footprint(obj, seen=None) -> int:
+    """Approximate bytes held by `obj` and everything it references."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(footprint(k, seen) + footprint(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, deque, set)):
+        size += sum(footprint(item, seen) for item in obj)
+    for name in getattr(type(obj), "__slots__", ()):
+        size += footprint(getattr(obj, name, None), seen)
+    return size
+
+
+# --- AI ---
+HEAL_BELOW = 1 / 3  # Consider healing under this share of max HP
+EXPLORE = 0.1  # Chance of a random move, so repeated battles differ
+
+
+def choose_move(battle: Battle, rng=random, explore: float = EXPLORE) -> int:
+    """Deck slot for the side to move: finish the foe, heal when low, else hit hardest."""
+    side = battle.turn
+    fighter = battle.fighters[side]
+    foe = battle.fighters[1 - side]
+    if rng.random() < explore:
+        return rng.randrange(len(fighter.deck))
+
+    best, best_damage, heal = 0, -1, None
+    for slot, move_index in enumerate(fighter.deck):
+        if _POWER[move_index] == 0:
+            heal = slot
+            continue
+        damage = battle.hit(side, slot)[0]
+        if damage > best_damage:
+            best, best_damage = slot, damage
+    if best_damage >= foe.hp or heal is None:
+        return best
+    if fighter.hp < fighter.max_hp * HEAL_BELOW and rng.random() < 0.5:
+        return heal
+    return best
+
+
+def play_out(a: dict, b: dict, rng=random) -> int:
+    """AI vs AI without a log; returns the winning side or -1 for a draw."""
+    battle = Battle(a, b, log=False)
+    while not battle.play(choose_move(battle, rng)):
+        pass
+    return battle.winner
+
+
+# --- SEARCH AI ---
+UCB_C = 1.4  # Exploration constant of UCB1
+
+
+def search_move(
+    battle: Battle,
+    budget: float,
+    explore: float = EXPLORE,
+    seed=None,
+    mistake: float = 0.0,
+):
+    """Monte Carlo search for the side to move, bounded by `budget` seconds.
+
+    Each candidate move is scored by playing the battle out with
+    choose_move(); UCB1 spends more playouts on the promising ones. With
+    probability `mistake` one of the other moves is played instead, which is
+    what makes easier rivals weaker. Returns (slot, playouts). Runs in a
+    worker process, so it only sees a copy.
+    """
+    rng = random.Random(seed)
+    side = battle.turn
+    slots = range(len(battle.fighters[side].deck))
+    wins = [0.0] * len(slots)
+    plays = [0] * len(slots)
+    deadline = time.perf_counter() + budget
+
+    total = 0
+    while True:
+        if total < len(slots):
+            slot = total  # Every move once first
+        else:
+            log_total = math.log(total)
+            slot = max(
+                slots,
+                key=lambda s: (
+                    wins[s] / plays[s] + UCB_C * math.sqrt(log_total / plays[s])
+                ),
+            )
+        sim = battle.copy()
+        over = sim.play(slot)
+        while not over:
+            over = sim.play(choose_move(sim, rng, explore))
+        wins[slot] += 1.0 if sim.winner == side else 0.5 if sim.winner == -1 else 0.0
+        plays[slot] += 1
+        total += 1
+        if total >= len(slots) and time.perf_counter() >= deadline:
+            break
+
+    # The most-visited move is the robust choice under UCB1
+    best = max(slots, key=lambda s: plays[s])
+    if len(slots) > 1 and rng.random() < mistake:
+        return rng.choice([s for s in slots if s != best]), total
+    return best, total
+
+
+# --- SIMULATION MODE ---
+def load_roster(path: str = ROSTER_FILE) -> list:
+    with open(path) as f:
+        return json.load(f)
+
+
+async def fetch_roster(concurrency: int = 20) -> list:
+    """Battle data for every species, downloaded from PokeAPI."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(session, species_id):
+        url = f"https://pokeapi.co/api/v2/pokemon/{species_id}"
+        async with semaphore, session.get(url) as resp:
+            if resp.status != 200:
+                return None
+            data = await resp.json()
+            return {
+                "id": data["id"],
+                "name": data["name"].capitalize(),
+                **parse_battle_data(data),
+            }
+
+    async with aiohttp.ClientSession() as session:
+        roster = await asyncio.gather(
+            *(fetch(session, i) for i in range(1, MAX_SPECIES_ID + 1))
+        )
+    return [entry for entry in roster if entry]
+
+
+_roster = None
+
+
+def _init_worker(roster):
+    global _roster
+    _roster = roster
+
+
+def _simulate_row(job):
+    """Win rate of species `row` against every species (each side moves first half the time)."""
+    row, battles, seed, ablate = job
+    rng = random.Random(seed * 1_000_003 + row)
+    roster = _roster
+    if ablate:  # Same roster with one ability switched off everywhere
+        roster = [
+            {**entry, "ability": "none"} if entry["ability"] == ablate else entry
+            for entry in roster
+        ]
+    me = roster[row]
+    wins = np.zeros(len(roster), dtype=np.float32)
+    for col, foe in enumerate(roster):
+        score = 0.0
+        for n in range(battles):
+            if n % 2 == 0:
+                winner = play_out(me, foe, rng)
+                score += 1.0 if winner == 0 else 0.5 if winner == -1 else 0.0
+            else:
+                winner = play_out(foe, me, rng)
+                score += 1.0 if winner == 1 else 0.5 if winner == -1 else 0.0
+        wins[col] = score / battles
+    return row, wins
+
+
+def simulate(roster, battles, workers, seed=0, rows=None, ablate=None):
+    """Win-rate matrix (rows x all species), rows played in parallel."""
+    rows = list(range(len(roster))) if rows is None else list(rows)
+    matrix = np.zeros((len(rows), len(roster)), dtype=np.float32)
+    position = {row: i for i, row in enumerate(rows)}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(roster,)
+    ) as pool:
+        jobs = [(row, battles, seed, ablate) for row in rows]
+        for row, wins in pool.map(_simulate_row, jobs, chunksize=4):
+            matrix[position[row]] = wins
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate AI-vs-AI battles")
+    parser.add_argument("--roster", default=ROSTER_FILE, help="Roster JSON")
+    parser.add_argument(
+        "--fetch", action="store_true", help="Download the roster from PokeAPI first"
+    )
+    parser.add_argument("--battles", type=int, default=2, help="Battles per pair")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--limit", type=int, default=None, help="First N species only")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/winrates.npz")
+    parser.add_argument(
+        "--abilities",
+        nargs="*",
+        default=["huge-power", "intimidate", *STARTER_ABILITIES],
+        help="Abilities to measure by switching them off",
+    )
+    args = parser.parse_args()
+
+    if args.fetch:
+        roster = asyncio.run(fetch_roster())
+        os.makedirs(os.path.dirname(args.roster) or ".", exist_ok=True)
+        with open(args.roster, "w") as f:
+            json.dump(roster, f)
+        print(f"Fetched {len(roster)} species into {args.roster}")
+    roster = load_roster(args.roster)[: args.limit]
+    names = [entry["name"] for entry in roster]
+
+    start = time.perf_counter()
+    matrix = simulate(roster, args.battles, args.workers, args.seed)
+    seconds = time.perf_counter() - start
+    total = len(roster) ** 2 * args.battles
+    print(
+        f"{total:,} battles ({len(roster)} species) in {seconds:.1f}s "
+        f"({total / seconds:,.0f} battles/s on {args.workers} workers)"
+    )
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    np.savez_compressed(args.out, names=np.array(names), winrates=matrix)
+    print(f"Win-rate matrix written to {args.out}")
+
+    overall = matrix.mean(axis=1)
+    print("\nStrongest species:")
+    for i in np.argsort(overall)[::-1][:10]:
+        print(f"  {names[i]:<16} {overall[i]:.1%}  ({roster[i]['ability']})")
+
+    # Ability impact: holders' win rate with the ability vs with it switched off
+    print("\nAbility        holders   with    without  impact")
+    for ability in args.abilities:
+        holders = [i for i, entry in enumerate(roster) if entry["ability"] == ability]
+        if not holders:
+            print(f"  {ability:<13} {0:>5}")
+            continue
+        ablated = simulate(
+            roster, args.battles, args.workers, args.seed, holders, ability
+        )
+        with_it = float(overall[holders].mean())
+        without = float(ablated.mean())
+        print(
+            f"  {ability:<13} {len(holders):>5}   {with_it:.1%}   {without:.1%}   "
+            f"{with_it - without:+.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
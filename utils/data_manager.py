@@ -1,43 +1,187 @@
+import asyncio
 import json
 import os
+from collections import OrderedDict, defaultdict
 
+from utils.database import transaction
+
+# Legacy store: imported once into the guild_settings table, then renamed
 DATA_FILE = "server_data.json"
-SERVER_DATA = {}
-
-
-def load_data():
-    """Load the JSON data from the file into memory."""
-    global SERVER_DATA
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            try:
-                SERVER_DATA = json.load(f)
-            except json.JSONDecodeError:
-                SERVER_DATA = {}
-                print("⚠️ server_data.json was corrupted. Started fresh.")
-    else:
-        SERVER_DATA = {}
-    print("--- Server Data (JSON) Loaded ---")
-
-
-def save_data():
-    """Save the memory data back to the JSON file."""
-    with open(DATA_FILE, "w") as f:
-        json.dump(SERVER_DATA, f, indent=4)
-
-
-def get_guild_data(guild_id: int) -> dict:
-    """Retrieve or initialize data for a specific guild."""
-    guild_id_str = str(guild_id)
-
-    if guild_id_str not in SERVER_DATA:
-        SERVER_DATA[guild_id_str] = {
-            "settings": {
-                "log_channel_id": None,
-                "welcome_channel_id": None,
-            },
-            "custom_commands": {},
-        }
-        save_data()  # Save immediately so the file updates
-
-    return SERVER_DATA[guild_id_str]
+
+# Only guilds that are actually used are loaded, least recently used evicted
+MAX_CACHED_GUILDS = 1000
+
+
+class GuildSettings:
+    """Settings of one guild. Slotted: thousands of these stay in memory."""
+
+    __slots__ = ("guild_id", "log_channel_id", "welcome_channel_id", "custom_commands")
+
+    FIELDS = ("log_channel_id", "welcome_channel_id", "custom_commands")
+
+    def __init__(
+        self,
+        guild_id: int,
+        log_channel_id: int | None = None,
+        welcome_channel_id: int | None = None,
+        custom_commands: dict | None = None,
+    ):
+        self.guild_id = guild_id
+        self.log_channel_id = log_channel_id
+        self.welcome_channel_id = welcome_channel_id
+        self.custom_commands = custom_commands if custom_commands is not None else {}
+
+
+class GuildSettingsCache:
+    """Bounded LRU of GuildSettings, loaded lazily from the guild_settings table.
+
+    Subscribers are called as callback(settings, old_value) whenever the field
+    they subscribed to changes, so cogs can keep derived state (resolved
+    channels, etc.) up to date without re-reading settings.
+    """
+
+    def __init__(self, max_guilds: int = MAX_CACHED_GUILDS):
+        self.db = None
+        self.max_guilds = max_guilds
+        self._cache = OrderedDict()  # guild_id -> GuildSettings
+        self._subscribers = defaultdict(list)  # field -> [callback]
+
+    def bind(self, db):
+        self.db = db
+        self._cache.clear()
+
+    def subscribe(self, field: str, callback):
+        self._subscribers[field].append(callback)
+
+    def unsubscribe(self, field: str, callback):
+        if callback in self._subscribers[field]:
+            self._subscribers[field].remove(callback)
+
+    def _remember(self, settings: GuildSettings):
+        self._cache[settings.guild_id] = settings
+        self._cache.move_to_end(settings.guild_id)
+        while len(self._cache) > self.max_guilds:
+            self._cache.popitem(last=False)
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        settings = self._cache.get(guild_id)
+        if settings is not None:
+            self._cache.move_to_end(guild_id)
+            return settings
+
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                "SELECT log_channel_id, welcome_channel_id, custom_commands FROM guild_settings WHERE guild_id = ?",
+                (guild_id,),
+            )
+            row = await cursor.fetchone()
+
+        # Another coroutine may have loaded (or updated) it while we waited
+        if guild_id in self._cache:
+            return self._cache[guild_id]
+
+        if row:
+            settings = GuildSettings(
+                guild_id, row[0], row[1], json.loads(row[2] or "{}")
+            )
+        else:
+            settings = GuildSettings(guild_id)  # Not written until something changes
+        self._remember(settings)
+        return settings
+
+    async def update(self, guild_id: int, **changes) -> GuildSettings:
+        """Change some fields, upsert the guild's row and notify subscribers."""
+        settings = await self.get(guild_id)
+        for field in changes:
+            if field not in GuildSettings.FIELDS:
+                raise AttributeError(f"Unknown guild setting: {field}")
+        if not changes:
+            return settings
+
+        # Only the changed columns are written, so concurrent updates of
+        # different fields can't overwrite each other with cached values
+        columns = list(changes)
+        values = [
+            json.dumps(value) if field == "custom_commands" else value
+            for field, value in changes.items()
+        ]
+        async with transaction(self.db):
+            await self.db.execute(
+                f"""
+                INSERT INTO guild_settings (guild_id, {", ".join(columns)})
+                VALUES (?, {", ".join("?" * len(columns))})
+                ON CONFLICT(guild_id) DO UPDATE SET
+                    {", ".join(f"{c} = excluded.{c}" for c in columns)}
+                """,
+                (guild_id, *values),
+            )
+
+        # Only touch the cached object once the row is safely written
+        for field, value in changes.items():
+            old = getattr(settings, field)
+            setattr(settings, field, value)
+            if old != value:
+                for callback in list(self._subscribers[field]):
+                    callback(settings, old)
+        return settings
+
+
+GUILD_SETTINGS = GuildSettingsCache()
+
+
+def _read_legacy_json() -> dict:
+    with open(DATA_FILE, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            print("⚠️ server_data.json was corrupted. Nothing imported.")
+            return {}
+
+
+async def import_legacy_json(db):
+    """One-time import of server_data.json into the guild_settings table."""
+    if not os.path.exists(DATA_FILE):
+        return
+
+    legacy = await asyncio.to_thread(_read_legacy_json)
+
+    rows = []
+    for guild_id, data in legacy.items():
+        settings = data.get("settings", {})
+        rows.append(
+            (
+                int(guild_id),
+                settings.get("log_channel_id"),
+                settings.get("welcome_channel_id"),
+                json.dumps(data.get("custom_commands", {})),
+            )
+        )
+
+    # Rows already in SQLite are newer than the JSON file, keep them
+    async with transaction(db):
+        await db.executemany(
+            """
+            INSERT OR IGNORE INTO guild_settings
+                (guild_id, log_channel_id, welcome_channel_id, custom_commands)
+            VALUES (?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+    os.replace(DATA_FILE, f"{DATA_FILE}.imported")
+    print(f"--- Imported {len(rows)} guild(s) from {DATA_FILE} ---")
+
+
+async def load_data(db):
+    """Prepare the guild settings cache. Guilds themselves load on first use."""
+    await import_legacy_json(db)
+    GUILD_SETTINGS.bind(db)
+    print("--- Guild Settings Ready ---")
+
+
+async def get_guild_settings(guild_id: int) -> GuildSettings:
+    return await GUILD_SETTINGS.get(guild_id)
+
+
+async def update_guild_settings(guild_id: int, **changes) -> GuildSettings:
+    return await GUILD_SETTINGS.update(guild_id, **changes)
@@ -1,16 +1,23 @@
+import asyncio
 import os
 import uuid
+from contextlib import asynccontextmanager
 
 import aiosqlite
 
 DB_FOLDER = "data"
 DB_NAME = f"{DB_FOLDER}/bot_database.db"
 
+# Every write on the shared connection goes through transaction(), one at a
+# time: a commit (or rollback) can then never cut another one in half
+_write_lock = asyncio.Lock()
+_write_owner = None  # Task inside transaction(); its nested calls join in
 
-async def initialize_database():
-    os.makedirs(DB_FOLDER, exist_ok=True)
 
-    async with aiosqlite.connect(DB_NAME) as db:
+async def initialize_database(db_name: str = DB_NAME):
+    os.makedirs(os.path.dirname(db_name) or ".", exist_ok=True)
+
+    async with aiosqlite.connect(db_name) as db:
         await db.execute("PRAGMA journal_mode=WAL;")
         await db.execute("PRAGMA synchronous=NORMAL;")
 
@@ -69,6 +76,185 @@ async def initialize_database():
                 )
             """)
 
+            # Rank lookups (/xp rank) count users above a (level, xp) pair
+            await cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_levels_rank ON levels (level, xp)"
+            )
+
+            # 6. Guild Settings (replaces server_data.json)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS guild_settings (
+                    guild_id INTEGER PRIMARY KEY,
+                    log_channel_id INTEGER,
+                    welcome_channel_id INTEGER,
+                    custom_commands TEXT DEFAULT '{}'
+                )
+            """)
+
+            # 7. Species seen so far (names/types from PokeAPI)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS species (
+                    species_id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    types TEXT
+                )
+            """)
+
+            # 8. Pokédex: one caught-species bitmap per user
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pokedex_bitmaps (
+                    user_uuid TEXT PRIMARY KEY,
+                    caught BLOB NOT NULL
+                )
+            """)
+
+            # 9. Trades: one row per accepted trade id (idempotent accepts)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS trades (
+                    trade_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # 10. Market: orders hold their escrow until filled or cancelled
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS market_orders (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_uuid TEXT NOT NULL,
+                    side TEXT NOT NULL,
+                    pokemon_id INTEGER NOT NULL,
+                    is_shiny BOOLEAN DEFAULT 0,
+                    price INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    remaining INTEGER NOT NULL,
+                    cancelled BOOLEAN DEFAULT 0,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_market_open ON market_orders (user_uuid, id) WHERE remaining > 0"
+            )
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS market_fills (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    buy_order_id INTEGER NOT NULL,
+                    sell_order_id INTEGER NOT NULL,
+                    price INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    filled_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # 11. Wild spawns: claimed_by is set exactly once (first claim wins)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS wild_spawns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER,
+                    channel_id INTEGER,
+                    pokemon_id INTEGER NOT NULL,
+                    is_shiny BOOLEAN DEFAULT 0,
+                    is_legendary BOOLEAN DEFAULT 0,
+                    expires_at INTEGER NOT NULL,
+                    claimed_by TEXT DEFAULT NULL
+                )
+            """)
+
+            # 12. Raids: hp and per-player damage are flushed in batches
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS raids (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER,
+                    channel_id INTEGER,
+                    pokemon_id INTEGER NOT NULL,
+                    max_hp INTEGER NOT NULL,
+                    hp INTEGER NOT NULL,
+                    started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    ended_at DATETIME DEFAULT NULL,
+                    defeated BOOLEAN DEFAULT 0
+                )
+            """)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS raid_damage (
+                    raid_id INTEGER NOT NULL,
+                    user_uuid TEXT NOT NULL,
+                    damage INTEGER NOT NULL DEFAULT 0,
+                    attacks INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (raid_id, user_uuid)
+                )
+            """)
+
+            # 13. Duels: latest snapshot of each open battle (survives restarts)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS duels (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at INTEGER NOT NULL
+                )
+            """)
+
+            # 14. Ranked: Elo ladder, game history and tournaments
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ratings (
+                    user_uuid TEXT PRIMARY KEY,
+                    rating REAL NOT NULL,
+                    games INTEGER NOT NULL DEFAULT 0,
+                    wins INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Ladder pages and "how many are above me" both walk this index
+            await cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ratings_ladder ON ratings (rating DESC)"
+            )
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ranked_matches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    player_a TEXT NOT NULL,
+                    player_b TEXT NOT NULL,
+                    winner INTEGER NOT NULL,
+                    delta REAL NOT NULL,
+                    mode TEXT NOT NULL,
+                    played_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS tournaments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
+                    channel_id INTEGER NOT NULL,
+                    starts_at INTEGER NOT NULL,
+                    every_hours INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}'
+                )
+            """)
+
+            # 15. Replays: append-only, a few bytes per turn (see utils.battle)
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS replays (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    player_a INTEGER,
+                    player_b INTEGER,
+                    name_a TEXT,
+                    name_b TEXT,
+                    mode TEXT NOT NULL,
+                    winner INTEGER,
+                    turns INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    played_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            for index in (
+                "idx_replays_a ON replays (player_a)",
+                "idx_replays_b ON replays (player_b)",
+            ):
+                await cursor.execute(f"CREATE INDEX IF NOT EXISTS {index}")
+
+            # Species lookups per user (bitmap backfill, "still owns one?")
+            await cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_collection_user_species ON collection (user_uuid, pokemon_id)"
+            )
+
             # --- MIGRATION: Force Add Columns if Missing ---
             # This fixes your error!
             try:
@@ -85,29 +271,114 @@ async def initialize_database():
             except aiosqlite.OperationalError:
                 pass
 
+            # Columns that used to only be added by /pokemon repair_db
+            for alter in (
+                "ALTER TABLE collection ADD COLUMN nickname TEXT DEFAULT NULL",
+                "ALTER TABLE game_profile ADD COLUMN buddy_id INTEGER DEFAULT NULL",
+                # Inventory stacks: one row per (user, species, shiny) holding
+                # `quantity` plain duplicates. Unique Pokémon keep stacked = 0.
+                "ALTER TABLE collection ADD COLUMN stacked BOOLEAN DEFAULT 0",
+                "ALTER TABLE collection ADD COLUMN quantity INTEGER DEFAULT 1",
+            ):
+                try:
+                    await cursor.execute(alter)
+                except aiosqlite.OperationalError:
+                    pass
+
+            await cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_collection_stack
+                ON collection (user_uuid, pokemon_id, is_shiny) WHERE stacked = 1
+            """)
+
+            # Box pages: keyset pagination on id, one index per server-side filter.
+            # The rowid is the last column of every index, so "ORDER BY id" is free.
+            for index in (
+                "idx_collection_user_id ON collection (user_uuid, id)",
+                "idx_collection_user_name ON collection (user_uuid, pokemon_name)",
+                "idx_collection_shiny ON collection (user_uuid) WHERE is_shiny = 1",
+                "idx_collection_legendary ON collection (user_uuid) WHERE is_legendary = 1",
+                "idx_collection_nicknamed ON collection (user_uuid) WHERE nickname IS NOT NULL",
+            ):
+                await cursor.execute(f"CREATE INDEX IF NOT EXISTS {index}")
+
+            # --- VERSIONED MIGRATIONS (PRAGMA user_version) ---
+            await cursor.execute("PRAGMA user_version")
+            (version,) = await cursor.fetchone()
+
+            if version < 1:
+                await migrate_to_stacks(cursor)
+                await cursor.execute("PRAGMA user_version = 1")
+
         await db.commit()
-        print(f"--- Database Initialized (WAL Mode) at {DB_NAME} ---")
+        print(f"--- Database Initialized (WAL Mode) at {db_name} ---")
+
+
+async def migrate_to_stacks(cursor):
+    """Merge plain duplicates (no nickname, not a buddy) into quantity stacks.
+
+    Rows with unique state are left alone, so their IDs don't change.
+    """
+    plain = """
+        stacked = 0 AND nickname IS NULL
+        AND id NOT IN (SELECT buddy_id FROM game_profile WHERE buddy_id IS NOT NULL)
+    """
+    await cursor.execute(f"""
+        INSERT INTO collection
+            (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary, caught_at, stacked, quantity)
+        SELECT user_uuid, pokemon_id, MIN(pokemon_name), is_shiny, MAX(is_legendary), MIN(caught_at), 1, COUNT(*)
+        FROM collection WHERE {plain}
+        GROUP BY user_uuid, pokemon_id, is_shiny
+    """)
+    await cursor.execute(f"DELETE FROM collection WHERE {plain}")
+    print(
+        f"--- Migrated plain duplicates into stacks ({cursor.rowcount} rows merged) ---"
+    )
 
 
 async def get_or_create_uuid(db, discord_id: int, username: str = None):
-    async with db.cursor() as cursor:
-        await cursor.execute(
-            "SELECT user_uuid FROM users WHERE discord_id = ?", (discord_id,)
-        )
+    async with db.execute(
+        "SELECT user_uuid, username FROM users WHERE discord_id = ?", (discord_id,)
+    ) as cursor:
         result = await cursor.fetchone()
 
+    # Only a new user or a changed name costs a write
+    if result and (not username or result[1] == username):
+        return result[0]
+    async with transaction(db):
         if result:
-            uuid_str = result[0]
-            if username:
-                await cursor.execute(
-                    "UPDATE users SET username = ? WHERE discord_id = ?",
-                    (username, discord_id),
-                )
-            return uuid_str
-        else:
-            new_uuid = str(uuid.uuid4())
-            await cursor.execute(
-                "INSERT INTO users (user_uuid, discord_id, username) VALUES (?, ?, ?)",
-                (new_uuid, discord_id, username),
+            await db.execute(
+                "UPDATE users SET username = ? WHERE discord_id = ?",
+                (username, discord_id),
             )
-            return new_uuid
+            return result[0]
+        new_uuid = str(uuid.uuid4())
+        await db.execute(
+            "INSERT INTO users (user_uuid, discord_id, username) VALUES (?, ?, ?)",
+            (new_uuid, discord_id, username),
+        )
+        return new_uuid
+
+
+@asynccontextmanager
+async def transaction(db):
+    """Run several statements as one unit: commit on success, roll back on error.
+
+    All writes (and commits) on the shared connection must go through here.
+    A nested call from the same task joins the outer transaction.
+    """
+    global _write_owner
+    task = asyncio.current_task()
+    if _write_owner is task:
+        yield db
+        return
+    async with _write_lock:
+        _write_owner = task
+        try:
+            yield db
+        except BaseException:
+            await db.rollback()
+            raise
+        else:
+            await db.commit()
+        finally:
+            _write_owner = None
@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_PATHS = ["/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "arial.ttf"]
+
+
+# FreeType faces aren't safe to share between threads, and cards/collages are
+# drawn in asyncio.to_thread workers: each thread keeps its own fonts
+_fonts = threading.local()
+
+
+def load_font(size: int):
+    """Load the bot's font once per size and thread (TrueType parsing is slow)."""
+    cache = getattr(_fonts, "by_size", None)
+    if cache is None:
+        cache = _fonts.by_size = {}
+    if size not in cache:
+        cache[size] = _open_font(size)
+    return cache[size]
+
+
+def _open_font(size: int):
+    for path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+# --- RANK CARD ---
+CARD_W, CARD_H = 900, 250
+AVATAR_SIZE = 180
+AVATAR_POS = (35, 35)
+BAR_BOX = (250, 170, 860, 205)  # x0, y0, x1, y1
+BAR_RADIUS = 17
+CARD_BG = (35, 39, 42)
+BAR_TRACK = (72, 75, 78)
+BAR_FILL = (88, 101, 242)  # Discord Blurple
+TEXT_MUTED = (185, 187, 190)
+
+MAX_CACHED_AVATARS = 256
+_avatar_cache = OrderedDict()  # avatar hash -> circular RGBA Image
+
+
+@lru_cache(maxsize=1)
+def _card_template():
+    """Everything on the card that doesn't depend on the user, drawn once."""
+    # Opaque RGB so the card can be encoded as JPEG
+    card = Image.new("RGB", (CARD_W, CARD_H), CARD_BG)
+    draw = ImageDraw.Draw(card)
+    draw.rounded_rectangle(BAR_BOX, radius=BAR_RADIUS, fill=BAR_TRACK)
+
+    # Ring around the avatar
+    x, y = AVATAR_POS
+    draw.ellipse(
+        (x - 5, y - 5, x + AVATAR_SIZE + 4, y + AVATAR_SIZE + 4), fill=BAR_TRACK
+    )
+    return card
+
+
+@lru_cache(maxsize=1)
+def _avatar_mask():
+    mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE - 1, AVATAR_SIZE - 1), fill=255)
+    return mask
+
+
+def prepare_avatar(avatar_bytes: bytes):
+    """Decode, resize and circle-crop an avatar so it can be pasted as-is."""
+    with Image.open(BytesIO(avatar_bytes)) as img:
+        img = img.convert("RGBA").resize(
+            (AVATAR_SIZE, AVATAR_SIZE), resample=Image.LANCZOS
+        )
+    avatar = Image.new("RGBA", (AVATAR_SIZE, AVATAR_SIZE), (0, 0, 0, 0))
+    avatar.paste(img, (0, 0), _avatar_mask())
+    return avatar
+
+
+def get_cached_avatar(avatar_key: str):
+    avatar = _avatar_cache.get(avatar_key)
+    if avatar is not None:
+        _avatar_cache.move_to_end(avatar_key)
+    return avatar
+
+
+def cache_avatar(avatar_key: str, avatar):
+    _avatar_cache[avatar_key] = avatar
+    _avatar_cache.move_to_end(avatar_key)
+    while len(_avatar_cache) > MAX_CACHED_AVATARS:
+        _avatar_cache.popitem(last=False)
+
+
+def render_rank_card(avatar, name: str, level: int, rank: int, xp: int, xp_needed):
+    """Draw a rank card on top of the cached template. Returns a JPEG buffer."""
+    card = _card_template().copy()
+    draw = ImageDraw.Draw(card)
+
+    if avatar is not None:
+        card.paste(avatar, AVATAR_POS, avatar)
+
+    # Name (left) and Rank / Level (right)
+    draw.text((250, 115), name[:20], font=load_font(40), fill="white", anchor="ls")
+    draw.text(
+        (860, 70),
+        f"RANK #{rank}   LEVEL {level}",
+        font=load_font(34),
+        fill="white",
+        anchor="rs",
+    )
+    draw.text(
+        (860, 155),
+        f"{xp} / {xp_needed} XP",
+        font=load_font(26),
+        fill=TEXT_MUTED,
+        anchor="rs",
+    )
+
+    # Progress Bar
+    ratio = min(1.0, max(0.0, xp / xp_needed))
+    x0, y0, x1, y1 = BAR_BOX
+    fill_x = x0 + int((x1 - x0) * ratio)
+    if fill_x - x0 >= BAR_RADIUS * 2:
+        draw.rounded_rectangle((x0, y0, fill_x, y1), radius=BAR_RADIUS, fill=BAR_FILL)
+
+    output_buffer = BytesIO()
+    # Encoding dominates render time: JPEG is ~5x faster than PNG for this card.
+    # No chroma subsampling (4:4:4) keeps the text edges clean.
+    card.save(output_buffer, format="JPEG", quality=95, subsampling=0)
+    output_buffer.seek(0)
+    return output_buffer
@@ -0,0 +1,365 @@
+# Inventory helpers for the `collection` table.
+#
+# Plain duplicates live in one "stack" row per (user, species, shiny) with a
+# `quantity` (stacked = 1). Pokémon with unique state (nickname, buddy, traded)
+# are single rows (stacked = 0, quantity = 1) and keep their IDs forever.
+# None of these helpers commit: callers run them inside utils.database.transaction().
+
+# Singles that may be released/evolved by species name like a duplicate
+LOOSE_SINGLE = """
+    stacked = 0 AND nickname IS NULL
+    AND id NOT IN (SELECT buddy_id FROM game_profile WHERE buddy_id IS NOT NULL)
+"""
+
+# Normal Pokémon that bulk commands may consume. Shinies are always protected.
+SPARE = f"is_shiny = 0 AND (stacked = 1 OR ({LOOSE_SINGLE}))"
+
+# Species with at least `?` spare units after keeping one of each. A protected
+# copy (shiny, nicknamed, buddy) counts as the one that is kept.
+SPARE_SPECIES = f"""
+    SELECT pokemon_id FROM collection
+    WHERE user_uuid = ?
+    GROUP BY pokemon_id
+    HAVING SUM(CASE WHEN {SPARE} THEN quantity ELSE 0 END)
+        - (1 - MAX(NOT ({SPARE}))) >= ?
+"""
+
+
+async def add_pokemon(db, rows):
+    """Add Pokémon to stacks in one multi-row upsert.
+
+    rows: [(user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary, quantity)]
+    """
+    rows = list(rows)
+    # 6 parameters per row, well below SQLite's 32766 variable limit
+    for start in range(0, len(rows), 1000):
+        chunk = rows[start : start + 1000]
+        values = ", ".join(["(?, ?, ?, ?, ?, 1, ?)"] * len(chunk))
+        await db.execute(
+            f"""
+            INSERT INTO collection
+                (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary, stacked, quantity)
+            VALUES {values}
+            ON CONFLICT(user_uuid, pokemon_id, is_shiny) WHERE stacked = 1
+            DO UPDATE SET quantity = quantity + excluded.quantity
+            """,
+            [value for row in chunk for value in row],
+        )
+
+
+async def take_units(
+    db,
+    user_uuid: str,
+    pokemon_name: str,
+    amount: int,
+    is_shiny: bool | None = None,
+):
+    """Remove `amount` Pokémon of one species by name.
+
+    Normal before shiny (unless is_shiny picks one), stacks before loose
+    singles. Nicknamed Pokémon and the buddy are never taken. Returns
+    (taken, available) where taken is a list of (pokemon_id, is_shiny,
+    is_legendary) per unit; if fewer than `amount` are available nothing is
+    removed and taken is empty.
+    """
+    shiny_filter, params = "", [user_uuid, pokemon_name]
+    if is_shiny is not None:
+        shiny_filter = "AND is_shiny = ?"
+        params.append(is_shiny)
+    # Few round trips to the connection's thread: at this size they cost more
+    # than the SQL itself
+    rows = await db.execute_fetchall(
+        f"""
+        SELECT id, pokemon_id, is_shiny, is_legendary, quantity, stacked
+        FROM collection
+        WHERE user_uuid = ? AND pokemon_name = ? {shiny_filter}
+          AND (stacked = 1 OR ({LOOSE_SINGLE}))
+        ORDER BY is_shiny ASC, stacked DESC, id ASC
+        """,
+        params,
+    )
+
+    available = sum(r[4] for r in rows)
+    if available < amount:
+        return [], available
+
+    # Rows used up entirely (singles and emptied stacks) are deleted by id;
+    # only the last, partly used stack is decremented
+    taken, stack_updates, emptied_ids = [], [], []
+    remaining = amount
+    for row_id, pokemon_id, shiny, legendary, quantity, _ in rows:
+        if remaining == 0:
+            break
+        n = min(quantity, remaining)
+        remaining -= n
+        taken.extend([(pokemon_id, shiny, legendary)] * n)
+        if n < quantity:
+            stack_updates.append((n, row_id))
+        else:
+            emptied_ids.append(row_id)
+
+    if stack_updates:
+        await db.executemany(
+            "UPDATE collection SET quantity = quantity - ? WHERE id = ?",
+            stack_updates,
+        )
+    if emptied_ids:
+        placeholders = ",".join("?" * len(emptied_ids))
+        await db.execute(
+            f"DELETE FROM collection WHERE id IN ({placeholders})", tuple(emptied_ids)
+        )
+    return taken, available
+
+
+async def split_units(db, user_uuid: str, row_id: int, amount: int = 1):
+    """Ids of `amount` unique Pokémon taken from the user's row `row_id`.
+
+    A unique row is its own single unit. From a stack, `amount` units are
+    split off into rows of their own (they are about to get a nickname, buddy
+    status or new owner). Returns None, changing nothing, if the user doesn't
+    own `row_id` or it holds fewer than `amount` units.
+    """
+    async with db.cursor() as cursor:
+        await cursor.execute(
+            """
+            SELECT stacked, pokemon_id, pokemon_name, is_shiny, is_legendary, caught_at, quantity
+            FROM collection WHERE id = ? AND user_uuid = ? AND quantity > 0
+            """,
+            (row_id, user_uuid),
+        )
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        (
+            stacked,
+            pokemon_id,
+            pokemon_name,
+            is_shiny,
+            is_legendary,
+            caught_at,
+            quantity,
+        ) = row
+        if not stacked:
+            return [row_id] if amount == 1 else None
+        if quantity < amount:
+            return None
+
+        await cursor.execute(
+            "UPDATE collection SET quantity = quantity - ? WHERE id = ?",
+            (amount, row_id),
+        )
+        await cursor.execute(
+            "DELETE FROM collection WHERE id = ? AND quantity <= 0", (row_id,)
+        )
+        unit_ids = []
+        for _ in range(amount):
+            await cursor.execute(
+                """
+                INSERT INTO collection
+                    (user_uuid, pokemon_id, pokemon_name, is_shiny, is_legendary, caught_at, stacked, quantity)
+                VALUES (?, ?, ?, ?, ?, ?, 0, 1)
+                """,
+                (
+                    user_uuid,
+                    pokemon_id,
+                    pokemon_name,
+                    is_shiny,
+                    is_legendary,
+                    caught_at,
+                ),
+            )
+            unit_ids.append(cursor.lastrowid)
+        return unit_ids
+
+
+async def detach_unit(db, user_uuid: str, row_id: int):
+    """Make sure `row_id` names one unique Pokémon owned by the user.
+
+    Unique rows are returned as-is; for a stack, one unit is split off and the
+    new row's id is returned. Returns None if the user doesn't own `row_id`.
+    """
+    unit_ids = await split_units(db, user_uuid, row_id)
+    return unit_ids[0] if unit_ids else None
+
+
+async def spare_species(db, user_uuid: str, min_units: int = 1):
+    """Species ids the user has at least `min_units` spare Pokémon of."""
+    async with db.execute(SPARE_SPECIES, (user_uuid, min_units)) as cursor:
+        return [row[0] for row in await cursor.fetchall()]
+
+
+async def take_spares(db, user_uuid: str, min_units: int = 1, species_ids=None):
+    """Delete all spare Pokémon of qualifying species in one statement.
+
+    Returns {pokemon_id: (pokemon_name, is_legendary, units, keep)} where keep
+    is how many units the caller must put back (1, or 0 if a protected copy
+    of the species remains).
+    """
+    only = ""
+    params = [user_uuid, user_uuid, min_units]
+    if species_ids is not None:
+        species_ids = list(species_ids)
+        if not species_ids:
+            return {}
+        only = f"AND pokemon_id IN ({','.join('?' * len(species_ids))})"
+        params += species_ids
+
+    async with db.execute(
+        f"""
+        DELETE FROM collection
+        WHERE user_uuid = ? AND {SPARE}
+          AND pokemon_id IN ({SPARE_SPECIES}) {only}
+        RETURNING pokemon_id, pokemon_name, is_legendary, quantity
+        """,
+        params,
+    ) as cursor:
+        deleted = await cursor.fetchall()
+
+    spares = {}
+    for pokemon_id, pokemon_name, is_legendary, quantity in deleted:
+        name, legendary, units = spares.get(pokemon_id, (pokemon_name, False, 0))
+        spares[pokemon_id] = (name, legendary or bool(is_legendary), units + quantity)
+
+    if not spares:
+        return {}
+
+    # Whatever is left of these species now is protected
+    async with db.execute(
+        f"""
+        SELECT DISTINCT pokemon_id FROM collection
+        WHERE user_uuid = ? AND pokemon_id IN ({",".join("?" * len(spares))})
+        """,
+        [user_uuid, *spares],
+    ) as cursor:
+        protected = {row[0] for row in await cursor.fetchall()}
+
+    return {
+        pokemon_id: (name, legendary, units, 0 if pokemon_id in protected else 1)
+        for pokemon_id, (name, legendary, units) in spares.items()
+    }
+
+
+async def release_duplicates(db, user_uuid: str):
+    """Release every spare normal Pokémon, keeping one of each species.
+
+    Returns (released, species_count).
+    """
+    spares = await take_spares(db, user_uuid)
+    kept = [
+        (user_uuid, pokemon_id, name, False, legendary, keep)
+        for pokemon_id, (name, legendary, units, keep) in spares.items()
+        if keep
+    ]
+    await add_pokemon(db, kept)
+    released = sum(units - keep for _, _, units, keep in spares.values())
+    return released, len(spares)
+
+
+async def evolve_spares(db, user_uuid: str, evolutions: dict, cost: int):
+    """Merge spare Pokémon into their evolutions, `cost` per evolved Pokémon.
+
+    evolutions: {pokemon_id: (next_id, next_name)}. Leftovers go back to
+    their stack. Returns [(pokemon_name, next_id, next_name, evolved), ...].
+    """
+    spares = await take_spares(db, user_uuid, cost, evolutions)
+    rows, results = [], []
+    for pokemon_id, (name, legendary, units, keep) in spares.items():
+        evolved = (units - keep) // cost
+        leftover = units - evolved * cost
+        next_id, next_name = evolutions[pokemon_id]
+        if leftover:
+            rows.append((user_uuid, pokemon_id, name, False, legendary, leftover))
+        if evolved:
+            rows.append((user_uuid, next_id, next_name, False, legendary, evolved))
+            results.append((name, next_id, next_name, evolved))
+    # Leftovers and evolved forms in one multi-row insert
+    await add_pokemon(db, rows)
+    return results
+
+
+# --- BOX PAGES ---
+# sort name -> (key columns, their positions in BOX_COLUMNS, descending?)
+BOX_SORTS = {
+    "newest": (("id",), (0,), True),
+    "oldest": (("id",), (0,), False),
+    "species": (("pokemon_id", "id"), (1, 0), False),
+}
+
+BOX_FILTERS = {
+    "shiny": "is_shiny = 1",
+    "legendary": "is_legendary = 1",
+    "nicknamed": "nickname IS NOT NULL",
+}
+
+BOX_COLUMNS = "id, pokemon_id, pokemon_name, is_shiny, nickname, quantity"
+
+
+def _box_where(user_uuid: str, species: str | None = None, flags=()):
+    clauses, params = ["user_uuid = ?"], [user_uuid]
+    if species:
+        clauses.append("pokemon_name = ?")
+        params.append(species.capitalize())
+    clauses.extend(BOX_FILTERS[flag] for flag in flags)
+    return clauses, params
+
+
+async def box_totals(db, user_uuid: str, species: str | None = None, flags=()):
+    """(rows, Pokémon) matching the filters; rows are what the box lists."""
+    clauses, params = _box_where(user_uuid, species, flags)
+    async with db.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(quantity), 0) FROM collection WHERE {' AND '.join(clauses)}",
+        params,
+    ) as cursor:
+        return await cursor.fetchone()
+
+
+def box_key(sort: str, row):
+    """Keyset cursor of a box row for the given sort."""
+    return tuple(row[i] for i in BOX_SORTS[sort][1])
+
+
+async def box_page(
+    db,
+    user_uuid: str,
+    *,
+    species: str | None = None,
+    flags=(),
+    sort: str = "newest",
+    after=None,
+    before=None,
+    limit: int = 20,
+):
+    """One page of a user's box, without OFFSET.
+
+    after/before are the keys (box_key) of the last/first row of the current
+    page. Returns (rows, more): more tells whether another page exists in the
+    direction we moved.
+    """
+    columns, _, descending = BOX_SORTS[sort]
+    clauses, params = _box_where(user_uuid, species, flags)
+
+    backwards = before is not None
+    key = before if backwards else after
+    if key is not None:
+        op = ">" if descending == backwards else "<"
+        clauses.append(f"({', '.join(columns)}) {op} ({', '.join('?' * len(columns))})")
+        params.extend(key)
+
+    direction = "DESC" if descending != backwards else "ASC"
+    order = ", ".join(f"{column} {direction}" for column in columns)
+    async with db.execute(
+        f"""
+        SELECT {BOX_COLUMNS} FROM collection
+        WHERE {" AND ".join(clauses)}
+        ORDER BY {order}
+        LIMIT ?
+        """,
+        [*params, limit + 1],
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    return rows, more
@@ -0,0 +1,120 @@
+import datetime
+from collections import defaultdict
+
+from utils.database import transaction
+
+# Each rolling window gets one table per bucket (e.g. xp_weekly_2026w42).
+# Expired buckets are dropped as whole tables instead of DELETEd row by row.
+PERIODS = {
+    "daily": lambda now: now.strftime("%Y%m%d"),
+    "weekly": lambda now: "{}w{:02d}".format(*now.isocalendar()[:2]),
+    "monthly": lambda now: now.strftime("%Y%m"),
+}
+
+# How many buckets of each period to keep (current + previous)
+RETENTION = {"daily": 2, "weekly": 2, "monthly": 2}
+
+
+def partition_name(period: str, now: datetime.datetime | None = None) -> str:
+    now = now or datetime.datetime.now(datetime.UTC)
+    return f"xp_{period}_{PERIODS[period](now)}"
+
+
+class XPBuckets:
+    """Buffers XP gains in memory and writes them to per-bucket tables in batches."""
+
+    def __init__(self):
+        self.pending = defaultdict(int)  # (guild_id, user_uuid) -> xp
+        self._partitions = None  # Names of the bucket tables that exist
+
+    def record(self, guild_id: int, user_uuid: str, xp: int):
+        self.pending[(guild_id, user_uuid)] += xp
+
+    async def _load_partitions(self, db):
+        if self._partitions is None:
+            async with db.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'xp_*_*'"
+            ) as cursor:
+                self._partitions = {row[0] for row in await cursor.fetchall()}
+        return self._partitions
+
+    async def _ensure_partition(self, db, period, now):
+        table = partition_name(period, now)
+        partitions = await self._load_partitions(db)
+        if table in partitions:
+            return table
+
+        # WITHOUT ROWID: the secondary index carries the primary key columns,
+        # so "top N for a guild" is answered from the index alone.
+        await db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                guild_id INTEGER NOT NULL,
+                user_uuid TEXT NOT NULL,
+                xp INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_uuid)
+            ) WITHOUT ROWID
+        """)
+        await db.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_rank ON {table} (guild_id, xp DESC)"
+        )
+        partitions.add(table)
+
+        # A new bucket started, so the oldest one may have fallen out of the window
+        await self._drop_expired(db, period)
+        return table
+
+    async def _drop_expired(self, db, period):
+        partitions = await self._load_partitions(db)
+        # Bucket keys sort chronologically, so the newest tables sort last
+        tables = sorted(t for t in partitions if t.startswith(f"xp_{period}_"))
+        for table in tables[: -RETENTION[period]]:
+            await db.execute(f"DROP TABLE IF EXISTS {table}")
+            partitions.discard(table)
+
+    async def flush(self, db, now: datetime.datetime | None = None):
+        """Write all buffered XP to the current daily/weekly/monthly buckets."""
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, defaultdict(int)
+        rows = [(guild_id, uuid, xp) for (guild_id, uuid), xp in batch.items()]
+        now = now or datetime.datetime.now(datetime.UTC)
+
+        try:
+            async with transaction(db):
+                for period in PERIODS:
+                    table = await self._ensure_partition(db, period, now)
+                    await db.executemany(
+                        f"""
+                        INSERT INTO {table} (guild_id, user_uuid, xp) VALUES (?, ?, ?)
+                        ON CONFLICT(guild_id, user_uuid) DO UPDATE SET xp = xp + excluded.xp
+                        """,
+                        rows,
+                    )
+        except Exception:
+            # Rolled back, new bucket tables included: reload the table list
+            # and keep the XP for the next flush
+            self._partitions = None
+            for key, xp in batch.items():
+                self.pending[key] += xp
+            raise
+
+    async def top(self, db, guild_id: int, period: str, limit: int = 10, now=None):
+        """Return [(username, xp), ...] for the current bucket of a period."""
+        table = partition_name(period, now)
+        if table not in await self._load_partitions(db):
+            return []
+
+        async with db.execute(
+            f"""
+            SELECT users.username, top.xp
+            FROM (
+                SELECT user_uuid, xp FROM {table}
+                WHERE guild_id = ? ORDER BY xp DESC LIMIT ?
+            ) AS top
+            LEFT JOIN users ON users.user_uuid = top.user_uuid
+            ORDER BY top.xp DESC
+            """,
+            (guild_id, limit),
+        ) as cursor:
+            return await cursor.fetchall()
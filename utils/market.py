@@ -0,0 +1,141 @@
+# In-memory order book for the player market.
+#
+# One book per (species, shiny) with a heap of bids and a heap of asks, in
+# price-time priority (better price first, then lower order id = older).
+# Orders are persisted (with their escrow) when posted; fills are matched
+# here and written to the DB in batches by the market cog. On startup the
+# book is rebuilt by replaying open orders in id order, which also re-creates
+# any fills that were matched but not yet written before a restart.
+
+import heapq
+
+BUY = "buy"
+SELL = "sell"
+
+
+class Order:
+    __slots__ = (
+        "id",
+        "user_uuid",
+        "side",
+        "pokemon_id",
+        "is_shiny",
+        "price",
+        "remaining",
+    )
+
+    def __init__(self, id, user_uuid, side, pokemon_id, is_shiny, price, remaining):
+        self.id = id
+        self.user_uuid = user_uuid
+        self.side = side
+        self.pokemon_id = pokemon_id
+        self.is_shiny = bool(is_shiny)
+        self.price = price  # Coins per Pokémon
+        self.remaining = remaining
+
+    @property
+    def key(self):
+        return self.pokemon_id, self.is_shiny
+
+
+class Fill:
+    __slots__ = ("buy", "sell", "price", "quantity")
+
+    def __init__(self, buy: Order, sell: Order, price: int, quantity: int):
+        self.buy = buy
+        self.sell = sell
+        self.price = price  # The resting order's price
+        self.quantity = quantity
+
+
+class SpeciesBook:
+    __slots__ = ("bids", "asks")
+
+    def __init__(self):
+        self.bids = []  # (-price, id, order): highest price first
+        self.asks = []  # (price, id, order): lowest price first
+
+
+class OrderBook:
+    def __init__(self):
+        self.books = {}  # (pokemon_id, is_shiny) -> SpeciesBook
+        self.orders = {}  # order id -> resting Order
+
+    def __len__(self):
+        return len(self.orders)
+
+    def submit(self, order: Order):
+        """Match an incoming order, rest what's left. Returns [Fill]."""
+        book = self.books.get(order.key)
+        if book is None:
+            book = self.books[order.key] = SpeciesBook()
+
+        buying = order.side == BUY
+        opposite = book.asks if buying else book.bids
+        fills, own = [], []
+        while order.remaining and opposite:
+            resting = opposite[0][2]
+            if resting.remaining == 0:  # Cancelled: removed lazily
+                heapq.heappop(opposite)
+                continue
+            if buying and resting.price > order.price:
+                break
+            if not buying and resting.price < order.price:
+                break
+            if resting.user_uuid == order.user_uuid:  # No self-trades
+                own.append(heapq.heappop(opposite))
+                continue
+
+            quantity = min(order.remaining, resting.remaining)
+            order.remaining -= quantity
+            resting.remaining -= quantity
+            if buying:
+                fills.append(Fill(order, resting, resting.price, quantity))
+            else:
+                fills.append(Fill(resting, order, resting.price, quantity))
+            if resting.remaining == 0:
+                heapq.heappop(opposite)
+                del self.orders[resting.id]
+
+        for entry in own:
+            heapq.heappush(opposite, entry)
+
+        if order.remaining:
+            if buying:
+                heapq.heappush(book.bids, (-order.price, order.id, order))
+            else:
+                heapq.heappush(book.asks, (order.price, order.id, order))
+            self.orders[order.id] = order
+        return fills
+
+    def cancel(self, order_id: int):
+        """Take an order off the book. Returns it (with what was left) or None."""
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        left = Order(
+            order.id,
+            order.user_uuid,
+            order.side,
+            order.pokemon_id,
+            order.is_shiny,
+            order.price,
+            order.remaining,
+        )
+        order.remaining = 0  # The heap entry is skipped from now on
+        return left
+
+    def depth(self, pokemon_id: int, is_shiny: bool, levels: int = 5):
+        """Best price levels: ([(price, quantity)] bids, [(price, quantity)] asks)."""
+        book = self.books.get((pokemon_id, bool(is_shiny)))
+        if book is None:
+            return [], []
+
+        def aggregate(entries, best_first):
+            totals = {}
+            for _, _, order in entries:
+                if order.remaining:
+                    totals[order.price] = totals.get(order.price, 0) + order.remaining
+            return sorted(totals.items(), reverse=best_first)[:levels]
+
+        return aggregate(book.bids, True), aggregate(book.asks, False)
@@ -0,0 +1,42 @@
+import time
+from collections import defaultdict, deque
+
+# Samples kept per (metric, label); older ones roll off
+WINDOW = 500
+
+
+class LatencyStats:
+    """Rolling latency samples, e.g. ("pull.first_reply", 10) -> seconds."""
+
+    def __init__(self, window: int = WINDOW):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, metric: str, label, seconds: float):
+        self._samples[(metric, label)].append(seconds)
+
+    def since(self, metric: str, label, start: float):
+        """Record the time elapsed since a time.perf_counter() reading."""
+        self.record(metric, label, time.perf_counter() - start)
+
+    def summary(self):
+        """[(metric, label, count, p50, p95, max)] in seconds, sorted by key."""
+        rows = []
+        for (metric, label), samples in sorted(
+            self._samples.items(), key=lambda item: (item[0][0], str(item[0][1]))
+        ):
+            ordered = sorted(samples)
+            n = len(ordered)
+            rows.append(
+                (
+                    metric,
+                    label,
+                    n,
+                    ordered[n // 2],
+                    ordered[min(n - 1, int(n * 0.95))],
+                    ordered[-1],
+                )
+            )
+        return rows
+
+
+METRICS = LatencyStats()
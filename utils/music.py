@@ -0,0 +1,329 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlparse
+
+from utils.metrics import METRICS
+
+# Player states
+IDLE = "idle"  # Connected (or not yet), nothing playing
+PLAYING = "playing"
+CLOSED = "closed"  # Stopped for good; the cog drops it
+
+IDLE_TIMEOUT = 3 * 60  # Seconds idle before leaving the voice channel
+
+# --- STREAM CACHE ---
+CACHE_SIZE = 1024  # Resolved songs kept (least recently used go first)
+EXPIRY_MARGIN = 5 * 60  # Re-resolve this long before a signed URL expires
+DEFAULT_TTL = 60 * 60  # For stream URLs that don't say when they expire
+
+
+def stream_expiry(url: str, now: float) -> float:
+    """Wall-clock time after which a stream URL should be resolved again.
+
+    Signed googlevideo URLs carry their expiry as ?expire=<unix time> (or
+    /expire/<unix time>/ in the path).
+    """
+    parsed = urlparse(url)
+    expire = parse_qs(parsed.query).get("expire", [None])[0]
+    if expire is None:
+        parts = parsed.path.split("/")
+        if "expire" in parts[:-1]:
+            expire = parts[parts.index("expire") + 1]
+    try:
+        return float(expire) - EXPIRY_MARGIN
+    except (TypeError, ValueError):
+        return now + DEFAULT_TTL
+
+
+class StreamCache:
+    """Resolved songs by search key or page URL, until their stream URL expires."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._songs = OrderedDict()  # key -> song dict, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._songs)
+
+    def get(self, key: str, now: float):
+        song = self._songs.get(key)
+        if song is None or song["expires_at"] <= now:
+            self._songs.pop(key, None)
+            self.misses += 1
+            return None
+        self._songs.move_to_end(key)
+        self.hits += 1
+        return song
+
+    def put(self, keys, song: dict):
+        for key in keys:
+            if key:
+                self._songs[key] = song
+                self._songs.move_to_end(key)
+        while len(self._songs) > self.size:
+            self._songs.popitem(last=False)
+
+
+# --- PLAYLISTS ---
+MAX_PLAYLIST = 1000  # Entries queued from one playlist
+
+
+def is_playlist(query: str) -> bool:
+    """A playlist page, or a list= link that doesn't point at one video."""
+    if not query.startswith("http"):
+        return False
+    parsed = urlparse(query)
+    params = parse_qs(parsed.query)
+    return parsed.path.rstrip("/").endswith("/playlist") or (
+        "list" in params and "v" not in params
+    )
+
+
+def placeholders(entries, limit: int = MAX_PLAYLIST) -> list:
+    """Queue entries from a flat playlist listing: title and page URL only.
+
+    Stream URLs are resolved (by the player's resolve hook) just before each
+    one plays, since they expire long before a big playlist is done.
+    """
+    songs = []
+    for entry in entries:
+        if entry and entry.get("url"):
+            songs.append(
+                {"title": entry.get("title") or "Unknown", "url": entry["url"]}
+            )
+            if len(songs) == limit:
+                break
+    return songs
+
+
+# --- EXTRACTION POOL ---
+EXTRACT_WORKERS = 4  # yt-dlp extractions running at once (bot-wide)
+EXTRACT_TIMEOUT = 30  # Seconds a caller waits, queueing included
+
+
+class ExtractionPool:
+    """Bounded yt-dlp work on its own threads, served round-robin by guild.
+
+    Extractions never touch the loop's default executor, so they can't starve
+    asyncio.to_thread rendering (or the other way round). Waiting jobs are
+    queued per guild and guilds take turns, so one guild's burst only delays
+    itself.
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="extract")
+        # guild_id -> deque of (future, fn, args), guilds in turn order
+        self.waiting = OrderedDict()
+        self.running = 0
+
+    def __len__(self):
+        return sum(len(jobs) for jobs in self.waiting.values())
+
+    async def run(self, guild_id, fn, *args):
+        """fn(*args) on a worker. Raises TimeoutError after `timeout` seconds."""
+        future = asyncio.get_running_loop().create_future()
+        job = (future, fn, args)
+        self.waiting.setdefault(guild_id, deque()).append(job)
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except (asyncio.CancelledError, TimeoutError):
+            self._forget(guild_id, job)  # Never started: don't keep its place
+            raise
+
+    def _forget(self, guild_id, job):
+        jobs = self.waiting.get(guild_id)
+        if jobs and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del self.waiting[guild_id]
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self.running < self.workers and self.waiting:
+            guild_id, jobs = next(iter(self.waiting.items()))
+            future, fn, args = jobs.popleft()
+            if jobs:
+                self.waiting.move_to_end(guild_id)  # Next guild's turn
+            else:
+                del self.waiting[guild_id]
+            if future.done():
+                continue  # Cancelled or timed out while waiting
+            self.running += 1
+            work = loop.run_in_executor(self.executor, fn, *args)
+            work.add_done_callback(partial(self._finished, future))
+
+    def _finished(self, future, work):
+        self.running -= 1
+        if not future.done():
+            if work.exception() is not None:
+                future.set_exception(work.exception())
+            else:
+                future.set_result(work.result())
+        self._dispatch()
+
+    def cancel(self, guild_id) -> int:
+        """Drop a guild's waiting jobs (running ones finish, but nobody waits)."""
+        jobs = self.waiting.pop(guild_id, ())
+        for future, _, _ in jobs:
+            future.cancel()
+        return len(jobs)
+
+    def shutdown(self):
+        for guild_id in list(self.waiting):
+            self.cancel(guild_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- PLAYER ---
+class GuildPlayer:
+    """Queue and playback state for one guild.
+
+    Only touches the voice client (play/stop/disconnect) and a text channel
+    (send), so any object with those methods will do. State only changes on
+    the event loop, and transitions hold `lock`; the voice thread's "track
+    ended" callback is handed back to the loop first.
+
+    `resolve(song)` (optional) makes a queued song playable in place and
+    returns False if it can't be. It runs for the next song as soon as a
+    track starts, so the gap between tracks is usually just a dict check.
+    """
+
+    __slots__ = (
+        "guild_id",
+        "loop",
+        "make_source",
+        "resolve",
+        "queue",
+        "state",
+        "current",
+        "lock",
+        "voice",
+        "channel",
+        "last_active",
+        "prefetching",
+        "loading",
+    )
+
+    def __init__(self, guild_id: int, loop, make_source, resolve=None):
+        self.guild_id = guild_id
+        self.loop = loop
+        self.make_source = make_source  # song dict -> audio source for voice.play
+        self.resolve = resolve
+        self.queue = deque()
+        self.state = IDLE
+        self.current = None  # Song playing now
+        self.lock = asyncio.Lock()
+        self.voice = None
+        self.channel = None  # Where "Now Playing" goes (last channel used)
+        self.last_active = time.monotonic()
+        self.prefetching = None  # Task resolving the next song
+        self.loading = None  # Task resolving the song about to play
+
+    def idle_for(self, now: float) -> float:
+        return now - self.last_active if self.state == IDLE else 0.0
+
+    async def enqueue(self, song: dict) -> int:
+        """Queue a song; 0 if it starts right away, else its queue position."""
+        return await self.enqueue_many((song,))
+
+    async def enqueue_many(self, songs) -> int:
+        """Queue songs in order; 0 if the first starts at once, else its position."""
+        async with self.lock:
+            if self.state == CLOSED:
+                raise RuntimeError("Player is closed")
+            position = len(self.queue) + 1
+            self.queue.extend(songs)
+            if self.state == IDLE:
+                await self._play_next()
+                return 0
+            if position == 1:
+                self._prefetch()
+            return position
+
+    async def _play_next(self):
+        """Start the next playable song. False (and idle) if there is none."""
+        self.last_active = time.monotonic()
+        while self.queue and self.voice is not None and self.state != CLOSED:
+            song = self.queue.popleft()
+            if self.resolve:
+                # The prefetch (if any) was started on this very song, at the
+                # head of the queue. Its own task, so /music skip can cancel it.
+                task, self.prefetching = self.prefetching, None
+                if task is None or task.cancelled():
+                    task = self.loop.create_task(self.resolve(song))
+                self.loading = task
+                if not task.done():
+                    await asyncio.wait((task,))
+                if task.cancelled() or task.exception() or not task.result():
+                    continue  # Skipped or unavailable: on to the next one
+                if self.state == CLOSED:
+                    break
+            self.state = PLAYING
+            self.current = song
+            self.voice.play(self.make_source(song), after=self._after)
+            self._prefetch()
+            return True
+        if self.state != CLOSED:
+            self.state = IDLE
+        self.current = None
+        return False
+
+    def _prefetch(self):
+        if self.resolve and self.queue:
+            self.prefetching = self.loop.create_task(self.resolve(self.queue[0]))
+
+    def _after(self, error):
+        # Runs on the voice thread
+        ended = time.perf_counter()
+        asyncio.run_coroutine_threadsafe(self._advance(error, ended), self.loop)
+
+    async def _advance(self, error, ended: float):
+        async with self.lock:
+            if self.state != PLAYING:
+                return  # Stopped meanwhile
+            finished = self.current
+            started = await self._play_next()
+            if started:
+                METRICS.since("music.gap", "next", ended)
+        if self.state == CLOSED:
+            return
+        if error:
+            print(f"Player error in guild {self.guild_id}: {error}")
+        if self.channel is None:
+            return
+        if started:
+            await self.channel.send(f"🎶 **Now Playing:** {self.current['title']}")
+        elif finished is not None:
+            await self.channel.send("✅ Queue finished. Waiting for more songs...")
+
+    async def skip(self) -> bool:
+        if self.loading is not None and not self.loading.done():
+            self.loading.cancel()  # Skip a song that is still being resolved
+            return True
+        async with self.lock:
+            if self.state != PLAYING:
+                return False
+            self.voice.stop()  # Fires _after, which plays the next one
+            return True
+
+    async def close(self):
+        """Clear the queue and leave the voice channel."""
+        self.state = CLOSED  # Seen at once by a _play_next waiting on a resolve
+        self.queue.clear()
+        for task in (self.loading, self.prefetching):
+            if task is not None:
+                task.cancel()  # Don't wait for extractions nobody wants now
+        async with self.lock:
+            self.queue.clear()
+            self.current = None
+            if self.voice is not None:
+                self.voice.stop()
+                await self.voice.disconnect()
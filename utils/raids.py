@@ -0,0 +1,85 @@
+class Raid:
+    """One boss fight, aggregated in memory. Pure bookkeeping, no I/O.
+
+    attack() only adds to dicts; the cog drains them on a timer
+    (take_unflushed for the DB, dirty for the embed).
+    """
+
+    __slots__ = (
+        "id",
+        "pokemon_id",
+        "name",
+        "boss",
+        "max_hp",
+        "hp",
+        "damage",
+        "attacks",
+        "unflushed",
+        "dirty",
+        "ends_at",
+        "message",
+    )
+
+    def __init__(
+        self,
+        raid_id: int,
+        pokemon_id: int,
+        name: str,
+        boss,
+        max_hp: int,
+        ends_at: float,
+    ):
+        self.id = raid_id
+        self.pokemon_id = pokemon_id
+        self.name = name
+        self.boss = boss  # {"stats", "types", ...} from Combat.fetch_full_data
+        self.max_hp = max_hp
+        self.hp = max_hp
+        self.damage = {}  # user_uuid -> total damage this raid
+        self.attacks = {}  # user_uuid -> total attacks this raid
+        self.unflushed = {}  # user_uuid -> (damage, attacks) since the last flush
+        self.dirty = True  # HP changed since the embed was last edited
+        self.ends_at = ends_at  # time.monotonic() deadline, then the boss flees
+        self.message = None
+
+    @property
+    def defeated(self) -> bool:
+        return self.hp <= 0
+
+    def attack(self, user_uuid: str, damage: int) -> bool:
+        """Apply one hit. True only for the hit that knocks the boss out."""
+        if self.hp <= 0:
+            return False
+        damage = min(damage, self.hp)  # Overkill doesn't count for rewards
+        self.hp -= damage
+        self.damage[user_uuid] = self.damage.get(user_uuid, 0) + damage
+        self.attacks[user_uuid] = self.attacks.get(user_uuid, 0) + 1
+        dealt, hits = self.unflushed.get(user_uuid, (0, 0))
+        self.unflushed[user_uuid] = (dealt + damage, hits + 1)
+        self.dirty = True
+        return self.hp <= 0
+
+    def take_unflushed(self):
+        """Hand over [(user_uuid, damage, attacks)] since the last call."""
+        rows = [(user, dealt, hits) for user, (dealt, hits) in self.unflushed.items()]
+        self.unflushed = {}
+        return rows
+
+    def restore_unflushed(self, rows):
+        """Give back rows from take_unflushed() whose write failed."""
+        for user, dealt, hits in rows:
+            more_dealt, more_hits = self.unflushed.get(user, (0, 0))
+            self.unflushed[user] = (dealt + more_dealt, hits + more_hits)
+
+    def top(self, n: int = 5):
+        return sorted(self.damage.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def reward_shares(damage: dict, pool: int, minimum: int) -> dict:
+    """Split `pool` coins by share of damage; every attacker gets `minimum`."""
+    total = sum(damage.values())
+    if not total:
+        return {}
+    return {
+        user: minimum + pool * dealt // total for user, dealt in damage.items() if dealt
+    }
@@ -0,0 +1,176 @@
+from bisect import bisect_left
+from itertools import count
+
+DEFAULT_RATING = 1000.0
+K_FACTOR = 32
+
+# A queued player accepts opponents within BASE_WINDOW rating points, and
+# WIDEN_RATE more for every second spent waiting (up to MAX_WINDOW).
+BASE_WINDOW = 50
+WIDEN_RATE = 5
+MAX_WINDOW = 400
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def elo_update(winner: float, loser: float, draw: bool = False, k: int = K_FACTOR):
+    """New (winner, loser) ratings after one game."""
+    delta = k * ((0.5 if draw else 1.0) - expected_score(winner, loser))
+    return winner + delta, loser - delta
+
+
+# --- MATCHMAKING ---
+class QueueEntry:
+    __slots__ = ("key", "player", "joined", "channel_id")
+
+    def __init__(self, key, player, joined, channel_id):
+        self.key = key  # (rating, seq): sort order in the queue
+        self.player = player  # (discord_id, name, user_uuid)
+        self.joined = joined
+        self.channel_id = channel_id
+
+    @property
+    def rating(self) -> float:
+        return self.key[0]
+
+    def window(self, now: float) -> float:
+        return min(MAX_WINDOW, BASE_WINDOW + WIDEN_RATE * (now - self.joined))
+
+
+class MatchQueue:
+    """Players waiting for a ranked game, kept sorted by rating.
+
+    The closest-rated opponents of a player are always its neighbours in the
+    sorted list, so joining is a bisect plus two comparisons, and the
+    periodic sweep only compares adjacent entries.
+    """
+
+    def __init__(self):
+        self._keys = []  # Sorted (rating, seq)
+        self._by_key = {}  # (rating, seq) -> QueueEntry
+        self._by_player = {}  # discord_id -> QueueEntry
+        self._seq = count()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, discord_id):
+        return discord_id in self._by_player
+
+    def join(self, player, rating: float, now: float, channel_id=None):
+        """Queue `player`, or return (opponent, entry) if one fits right away."""
+        entry = QueueEntry((rating, next(self._seq)), player, now, channel_id)
+        i = bisect_left(self._keys, entry.key)
+        best = None
+        for j in (i - 1, i):  # Neighbours just below and just above
+            if 0 <= j < len(self._keys):
+                other = self._by_key[self._keys[j]]
+                gap = abs(other.rating - rating)
+                if gap <= other.window(now) and (
+                    best is None or gap < abs(best.rating - rating)
+                ):
+                    best = other
+        if best is not None:
+            self._remove(best)
+            return best, entry
+
+        self._keys.insert(i, entry.key)
+        self._by_key[entry.key] = entry
+        self._by_player[player[0]] = entry
+        return None
+
+    def leave(self, discord_id) -> bool:
+        entry = self._by_player.get(discord_id)
+        if entry is None:
+            return False
+        self._remove(entry)
+        return True
+
+    def _remove(self, entry: QueueEntry):
+        del self._keys[bisect_left(self._keys, entry.key)]
+        del self._by_key[entry.key]
+        del self._by_player[entry.player[0]]
+
+    def expire(self, before: float):
+        """Drop (and return) everyone who joined before `before`."""
+        stale = [entry for entry in self._by_player.values() if entry.joined < before]
+        for entry in stale:
+            self._remove(entry)
+        return stale
+
+    def pair(self, now: float):
+        """Pair neighbours whose gap fits the wider of their (grown) windows."""
+        pairs, keys = [], []
+        i = 0
+        while i < len(self._keys):
+            a = self._by_key[self._keys[i]]
+            if i + 1 < len(self._keys):
+                b = self._by_key[self._keys[i + 1]]
+                if b.rating - a.rating <= max(a.window(now), b.window(now)):
+                    pairs.append((a, b))
+                    del self._by_key[a.key], self._by_key[b.key]
+                    del self._by_player[a.player[0]], self._by_player[b.player[0]]
+                    i += 2
+                    continue
+            keys.append(a.key)
+            i += 1
+        self._keys = keys
+        return pairs
+
+
+# --- TOURNAMENTS ---
+def seed_order(size: int):
+    """Bracket positions of seeds 1..size (1 meets size, 2 meets size-1, ...)."""
+    order = [1]
+    while len(order) < size:
+        order = [s for seed in order for s in (seed, 2 * len(order) + 1 - seed)]
+    return order
+
+
+class Bracket:
+    """Single elimination over entrant indices 0..n-1 (0 is the top seed).
+
+    rounds[r][m] is [a, b, winner]; None marks a bye or a slot still waiting
+    for a winner. Plain lists, so it goes into JSON as is.
+    """
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+
+    @classmethod
+    def seeded(cls, entrants: int) -> "Bracket":
+        size = 2
+        while size < entrants:
+            size *= 2
+        slots = [seed - 1 if seed <= entrants else None for seed in seed_order(size)]
+        rounds = [[[slots[i], slots[i + 1], None] for i in range(0, size, 2)]]
+        while len(rounds[-1]) > 1:
+            rounds.append([[None, None, None] for _ in range(len(rounds[-1]) // 2)])
+        bracket = cls(rounds)
+        for m, (a, b, _) in enumerate(rounds[0]):  # Byes go straight through
+            if a is None or b is None:
+                bracket.report(0, m, a if b is None else b)
+        return bracket
+
+    @property
+    def champion(self):
+        return self.rounds[-1][0][2]
+
+    def ready(self):
+        """(round, match, a, b) of every match that can be played now."""
+        return [
+            (r, m, a, b)
+            for r, matches in enumerate(self.rounds)
+            for m, (a, b, winner) in enumerate(matches)
+            if winner is None and a is not None and b is not None
+        ]
+
+    def report(self, r: int, m: int, winner):
+        match = self.rounds[r][m]
+        if match[2] is not None:
+            return  # Already decided
+        match[2] = winner
+        if r + 1 < len(self.rounds):
+            self.rounds[r + 1][m // 2][m % 2] = winner
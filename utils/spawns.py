@@ -0,0 +1,71 @@
+import math
+import random
+
+# A channel's activity score gains 1 per message and halves every HALF_LIFE
+# seconds, so it reads roughly as "messages in the last few minutes".
+HALF_LIFE = 120.0
+SPAWN_THRESHOLD = 12.0  # Score a channel needs before anything can spawn
+SPAWN_CHANCE = 0.08  # Per message once the channel is above the threshold
+CHANNEL_COOLDOWN = 300.0  # Seconds between two spawns in one channel
+IDLE_SCORE = 0.05  # Below this a channel is forgotten by prune()
+
+_DECAY = math.log(2) / HALF_LIFE
+
+
+class ChannelActivity:
+    __slots__ = ("score", "updated", "cooldown_until")
+
+    def __init__(self, now: float):
+        self.score = 0.0
+        self.updated = now
+        self.cooldown_until = 0.0
+
+
+class ActivityTracker:
+    """Decayed per-channel message counters. Pure arithmetic, no I/O.
+
+    hit() runs for every guild message, so it only touches one slotted object
+    and decays lazily (on the next hit) instead of on a timer.
+    """
+
+    def __init__(self, rng=random.random):
+        self.channels = {}  # channel_id -> ChannelActivity
+        self.rng = rng
+
+    def score(self, channel_id: int, now: float) -> float:
+        activity = self.channels.get(channel_id)
+        if activity is None:
+            return 0.0
+        return activity.score * math.exp(-_DECAY * (now - activity.updated))
+
+    def hit(self, channel_id: int, now: float) -> bool:
+        """Count one message. True means: spawn something in this channel now."""
+        activity = self.channels.get(channel_id)
+        if activity is None:
+            activity = self.channels[channel_id] = ChannelActivity(now)
+        activity.score = (
+            activity.score * math.exp(-_DECAY * (now - activity.updated)) + 1.0
+        )
+        activity.updated = now
+
+        if (
+            activity.score < SPAWN_THRESHOLD
+            or now < activity.cooldown_until
+            or self.rng() >= SPAWN_CHANCE
+        ):
+            return False
+        activity.score = 0.0
+        activity.cooldown_until = now + CHANNEL_COOLDOWN
+        return True
+
+    def prune(self, now: float):
+        """Forget channels that went quiet (bounds memory)."""
+        idle = [
+            channel_id
+            for channel_id, activity in self.channels.items()
+            if now >= activity.cooldown_until
+            and self.score(channel_id, now) < IDLE_SCORE
+        ]
+        for channel_id in idle:
+            del self.channels[channel_id]
+        return len(idle)
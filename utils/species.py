@@ -0,0 +1,292 @@
+import asyncio
+
+import aiohttp
+
+from utils.database import transaction
+
+# Highest National Dex number the bot knows about
+MAX_SPECIES_ID = 1025
+
+# Complete list of Legendaries (Gen 1-9)
+LEGENDARY_IDS = [
+    144,
+    145,
+    146,
+    150,
+    151,
+    243,
+    244,
+    245,
+    249,
+    250,
+    251,
+    377,
+    378,
+    379,
+    380,
+    381,
+    382,
+    383,
+    384,
+    385,
+    386,
+    480,
+    481,
+    482,
+    483,
+    484,
+    485,
+    486,
+    487,
+    488,
+    490,
+    491,
+    492,
+    493,
+    494,
+    638,
+    639,
+    640,
+    641,
+    642,
+    643,
+    644,
+    645,
+    646,
+    647,
+    648,
+    649,
+    716,
+    717,
+    718,
+    719,
+    720,
+    721,
+    772,
+    773,
+    785,
+    786,
+    787,
+    788,
+    789,
+    790,
+    791,
+    792,
+    800,
+    801,
+    802,
+    807,
+    793,
+    794,
+    795,
+    796,
+    797,
+    798,
+    799,
+    803,
+    804,
+    805,
+    806,
+    888,
+    889,
+    890,
+    891,
+    892,
+    894,
+    895,
+    896,
+    897,
+    898,
+    1001,
+    1002,
+    1003,
+    1004,
+    1007,
+    1008,
+]
+
+NON_LEGENDARY_IDS = sorted(set(range(1, MAX_SPECIES_ID + 1)) - set(LEGENDARY_IDS))
+
+TYPES = [
+    "normal",
+    "fire",
+    "water",
+    "grass",
+    "electric",
+    "ice",
+    "fighting",
+    "poison",
+    "ground",
+    "flying",
+    "psychic",
+    "bug",
+    "rock",
+    "ghost",
+    "dragon",
+    "dark",
+    "steel",
+    "fairy",
+]
+
+# Bit i of a species mask is species #i. A user's Pokédex is one such mask,
+# stored as a little-endian blob of BITMAP_BYTES bytes.
+BITMAP_BYTES = MAX_SPECIES_ID // 8 + 1
+
+
+def mask_of(species_ids) -> int:
+    mask = 0
+    for species_id in species_ids:
+        mask |= 1 << species_id
+    return mask
+
+
+def ids_in(mask: int):
+    """Species ids set in a mask, ascending."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SpeciesRegistry:
+    """Legendary flags as a bitset (a check is a shift and an AND), and names.
+
+    Names are learned from the PokeAPI responses the bot already fetches and
+    kept in the `species` table.
+    """
+
+    def __init__(self):
+        self.all = mask_of(range(1, MAX_SPECIES_ID + 1))
+        self.legendary = mask_of(LEGENDARY_IDS)
+        self.names = {}  # species_id -> name (species the bot has fetched)
+        self.ids = {}  # lowercase name -> species_id (every species once listed)
+        self.shiny_art = {}  # species_id -> whether a shiny sprite exists, once known
+
+    def is_legendary(self, species_id: int) -> bool:
+        return bool((self.legendary >> species_id) & 1)
+
+    def name(self, species_id: int) -> str:
+        return self.names.get(species_id, f"#{species_id:03d}")
+
+    def id_of(self, name: str):
+        return self.ids.get(name.lower())
+
+    def add_name(self, species_id: int, name: str):
+        """Resolve `name` to `species_id` (from the full species list)."""
+        self.ids[name.lower()] = species_id
+
+    def _remember(self, species_id, name):
+        self.names[species_id] = name
+        self.add_name(species_id, name)
+
+    async def load(self, db):
+        async with db.cursor() as cursor:
+            await cursor.execute("SELECT species_id, name FROM species")
+            for species_id, name in await cursor.fetchall():
+                self._remember(species_id, name)
+
+    async def learn(self, db, species_id: int, name: str, types):
+        """Record a species seen in an API response (no-op if already known)."""
+        if species_id in self.names:
+            return
+        self._remember(species_id, name)
+        async with transaction(db):
+            await db.execute(
+                "INSERT OR IGNORE INTO species (species_id, name, types) VALUES (?, ?, ?)",
+                (species_id, name, ",".join(types)),
+            )
+
+
+SPECIES = SpeciesRegistry()
+
+# Same files PokeAPI links to as front_default / front_shiny
+SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon"
+
+
+def sprite_url(species_id: int, is_shiny: bool) -> str:
+    """Sprite of a species; the regular one when it has no shiny sprite."""
+    if is_shiny and SPECIES.shiny_art.get(species_id, True):
+        return f"{SPRITE_URL}/shiny/{species_id}.png"
+    return f"{SPRITE_URL}/{species_id}.png"
+
+
+async def check_shiny_art(session, species_ids):
+    """Find out once per species whether its shiny sprite exists."""
+
+    async def check(species_id):
+        try:
+            async with session.head(f"{SPRITE_URL}/shiny/{species_id}.png") as resp:
+                SPECIES.shiny_art[species_id] = resp.status == 200
+        except aiohttp.ClientError:
+            pass  # Unknown: sprite_url() keeps trying the shiny one
+
+    unchecked = {s for s in species_ids if s not in SPECIES.shiny_art}
+    await asyncio.gather(*(check(species_id) for species_id in unchecked))
+
+
+# --- PER-USER POKÉDEX BITMAPS ---
+# Read-modify-write of a user's blob runs inside transaction(), so it can't
+# interleave with another coroutine's
+
+
+def completion(caught: int) -> float:
+    return (caught & SPECIES.all).bit_count() / MAX_SPECIES_ID
+
+
+async def get_caught(db, user_uuid: str) -> int:
+    """The user's caught-species mask. Built from the collection on first use."""
+    async with db.cursor() as cursor:
+        await cursor.execute(
+            "SELECT caught FROM pokedex_bitmaps WHERE user_uuid = ?", (user_uuid,)
+        )
+        row = await cursor.fetchone()
+        if row:
+            return int.from_bytes(row[0], "little")
+
+        # One-time backfill for users who caught Pokémon before bitmaps existed
+        await cursor.execute(
+            "SELECT DISTINCT pokemon_id FROM collection WHERE user_uuid = ?",
+            (user_uuid,),
+        )
+        caught = mask_of(r[0] for r in await cursor.fetchall())
+    async with transaction(db):
+        await db.execute(
+            "INSERT OR IGNORE INTO pokedex_bitmaps (user_uuid, caught) VALUES (?, ?)",
+            (user_uuid, caught.to_bytes(BITMAP_BYTES, "little")),
+        )
+    return caught
+
+
+async def _store_caught(db, user_uuid: str, caught: int):
+    await db.execute(
+        "UPDATE pokedex_bitmaps SET caught = ? WHERE user_uuid = ?",
+        (caught.to_bytes(BITMAP_BYTES, "little"), user_uuid),
+    )
+
+
+async def mark_caught(db, user_uuid: str, species_ids):
+    """Set the bits of newly caught species."""
+    async with transaction(db):
+        caught = await get_caught(db, user_uuid)
+        updated = caught | mask_of(species_ids)
+        if updated != caught:
+            await _store_caught(db, user_uuid, updated)
+
+
+async def refresh_lost(db, user_uuid: str, species_ids):
+    """After Pokémon left a collection, clear species the user no longer owns."""
+    species_ids = set(species_ids)
+    if not species_ids:
+        return
+    async with transaction(db):
+        caught = await get_caught(db, user_uuid)
+        placeholders = ",".join("?" * len(species_ids))
+        async with db.cursor() as cursor:
+            await cursor.execute(
+                f"SELECT DISTINCT pokemon_id FROM collection WHERE user_uuid = ? AND pokemon_id IN ({placeholders})",
+                (user_uuid, *species_ids),
+            )
+            still_owned = {r[0] for r in await cursor.fetchall()}
+        updated = caught & ~mask_of(species_ids - still_owned)
+        if updated != caught:
+            await _store_caught(db, user_uuid, updated)
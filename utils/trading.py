@@ -0,0 +1,126 @@
+# Trade engine. A trade is a list of legs (giver -> receiver: Pokémon and/or
+# coins), so two-way swaps and multi-party trades go through the same code.
+#
+# Concurrency is optimistic: an offer only names rows and unit counts, and
+# nothing is locked or written while players look at it. On accept, inside
+# one savepoint, offered stack units are split off and every leg moves its
+# units with one conditional UPDATE ("... WHERE id IN (...) AND user_uuid =
+# giver"). A row that changed owner or shrank in the meantime rejects the
+# whole trade, and rolling back the savepoint undoes the splits too.
+# The trade_id makes accepting idempotent (double-clicks, retries).
+
+from utils.inventory import split_units
+
+TRADE_COMPLETED = "completed"
+TRADE_REJECTED = "rejected"
+TRADE_PENDING = "pending"
+
+
+class TradeLeg:
+    __slots__ = ("giver", "receiver", "units", "coins")
+
+    def __init__(self, giver: str, receiver: str, units=(), coins: int = 0):
+        if giver == receiver:
+            raise ValueError("A trade leg needs two different users")
+        if coins < 0:
+            raise ValueError("Coins in a trade leg can't be negative")
+        merged = {}  # row_id -> units taken from it
+        for row_id, quantity in units:
+            if quantity < 1:
+                raise ValueError("A traded row needs at least one unit")
+            merged[row_id] = merged.get(row_id, 0) + quantity
+        self.giver = giver
+        self.receiver = receiver
+        self.units = tuple(merged.items())  # ((row_id, quantity), ...)
+        self.coins = coins
+
+
+def _check_legs(legs):
+    seen = set()
+    for leg in legs:
+        row_ids = {row_id for row_id, _ in leg.units}
+        if seen.intersection(row_ids):
+            raise ValueError("A Pokémon can only be in one leg of a trade")
+        seen.update(row_ids)
+
+
+async def _apply_leg(db, cursor, leg: TradeLeg) -> bool:
+    if leg.units:
+        unit_ids = []
+        for row_id, quantity in leg.units:
+            split = await split_units(db, leg.giver, row_id, quantity)
+            if split is None:
+                return False  # Changed owner or shrank since the offer
+            unit_ids.extend(split)
+
+        placeholders = ",".join("?" * len(unit_ids))
+        await cursor.execute(
+            f"""
+            UPDATE collection SET user_uuid = ?
+            WHERE id IN ({placeholders}) AND user_uuid = ?
+            """,
+            (leg.receiver, *unit_ids, leg.giver),
+        )
+        if cursor.rowcount != len(unit_ids):
+            return False
+        await cursor.execute(
+            f"UPDATE game_profile SET buddy_id = NULL WHERE user_uuid = ? AND buddy_id IN ({placeholders})",
+            (leg.giver, *unit_ids),
+        )
+
+    if leg.coins:
+        await cursor.execute(
+            "UPDATE game_profile SET coins = coins - ? WHERE user_uuid = ? AND coins >= ?",
+            (leg.coins, leg.giver, leg.coins),
+        )
+        if cursor.rowcount != 1:
+            return False
+        await cursor.execute(
+            """
+            INSERT INTO game_profile (user_uuid, coins) VALUES (?, ?)
+            ON CONFLICT(user_uuid) DO UPDATE SET coins = coins + excluded.coins
+            """,
+            (leg.receiver, leg.coins),
+        )
+    return True
+
+
+async def execute_trade(db, trade_id: str, legs):
+    """Apply all legs of a trade, or none of them.
+
+    Returns (status, replayed): status is TRADE_COMPLETED or TRADE_REJECTED,
+    replayed is True if this trade_id was already handled (nothing changed).
+    Does not commit; the caller commits (see utils.database.transaction).
+    """
+    legs = list(legs)
+    _check_legs(legs)
+
+    async with db.cursor() as cursor:
+        # Claim the trade id first: a second click finds the row and stops here
+        await cursor.execute(
+            "INSERT OR IGNORE INTO trades (trade_id, status) VALUES (?, ?)",
+            (trade_id, TRADE_PENDING),
+        )
+        if cursor.rowcount == 0:
+            await cursor.execute(
+                "SELECT status FROM trades WHERE trade_id = ?", (trade_id,)
+            )
+            (status,) = await cursor.fetchone()
+            return status, True
+
+        # A savepoint undoes only this trade's statements on a conflict
+        await cursor.execute("SAVEPOINT trade")
+        ok = True
+        for leg in legs:
+            if not await _apply_leg(db, cursor, leg):
+                ok = False
+                break
+        if not ok:
+            await cursor.execute("ROLLBACK TO trade")
+        await cursor.execute("RELEASE trade")
+
+        status = TRADE_COMPLETED if ok else TRADE_REJECTED
+        await cursor.execute(
+            "UPDATE trades SET status = ? WHERE trade_id = ?", (status, trade_id)
+        )
+    return status, False
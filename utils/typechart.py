@@ -0,0 +1,302 @@
+"""Type effectiveness and move tables as NumPy arrays.
+
+Types are small integers (their index in utils.species.TYPES). The 18x18
+EFFECTIVENESS matrix is built once from TYPE_CHART; a (dual-type) defender
+is multiplied out into one 18-vector per type combination and cached, so a
+whole move deck is scored with a single fancy-indexing lookup.
+"""
+
+from functools import cache
+
+import numpy as np
+
+from utils.species import TYPES
+
+# --- 1. TYPE CHART (Simplified) ---
+# Multipliers for damage calculations
+TYPE_CHART = {
+    "normal": {"rock": 0.5, "ghost": 0.0, "steel": 0.5},
+    "fire": {
+        "fire": 0.5,
+        "water": 0.5,
+        "grass": 2.0,
+        "ice": 2.0,
+        "bug": 2.0,
+        "rock": 0.5,
+        "dragon": 0.5,
+        "steel": 2.0,
+    },
+    "water": {
+        "fire": 2.0,
+        "water": 0.5,
+        "grass": 0.5,
+        "ground": 2.0,
+        "rock": 2.0,
+        "dragon": 0.5,
+    },
+    "grass": {
+        "fire": 0.5,
+        "water": 2.0,
+        "grass": 0.5,
+        "poison": 0.5,
+        "ground": 2.0,
+        "flying": 0.5,
+        "bug": 0.5,
+        "rock": 2.0,
+        "dragon": 0.5,
+        "steel": 0.5,
+    },
+    "electric": {
+        "water": 2.0,
+        "grass": 0.5,
+        "electric": 0.5,
+        "ground": 0.0,
+        "flying": 2.0,
+        "dragon": 0.5,
+    },
+    "ice": {
+        "fire": 0.5,
+        "water": 0.5,
+        "grass": 2.0,
+        "ice": 0.5,
+        "ground": 2.0,
+        "flying": 2.0,
+        "dragon": 2.0,
+        "steel": 0.5,
+    },
+    "fighting": {
+        "normal": 2.0,
+        "ice": 2.0,
+        "poison": 0.5,
+        "flying": 0.5,
+        "psychic": 0.5,
+        "bug": 0.5,
+        "rock": 2.0,
+        "ghost": 0.0,
+        "dark": 2.0,
+        "steel": 2.0,
+        "fairy": 0.5,
+    },
+    "poison": {
+        "grass": 2.0,
+        "poison": 0.5,
+        "ground": 0.5,
+        "rock": 0.5,
+        "ghost": 0.5,
+        "steel": 0.0,
+        "fairy": 2.0,
+    },
+    "ground": {
+        "fire": 2.0,
+        "water": 0.5,
+        "grass": 0.5,
+        "ice": 0.5,
+        "poison": 2.0,
+        "flying": 0.0,
+        "electric": 2.0,
+        "rock": 2.0,
+        "steel": 2.0,
+    },
+    "flying": {
+        "grass": 2.0,
+        "electric": 0.5,
+        "fighting": 2.0,
+        "bug": 2.0,
+        "rock": 0.5,
+        "steel": 0.5,
+    },
+    "psychic": {
+        "fighting": 2.0,
+        "poison": 2.0,
+        "psychic": 0.5,
+        "dark": 0.0,
+        "steel": 0.5,
+    },
+    "bug": {
+        "fire": 0.5,
+        "grass": 2.0,
+        "fighting": 0.5,
+        "poison": 0.5,
+        "flying": 0.5,
+        "psychic": 2.0,
+        "ghost": 0.5,
+        "dark": 2.0,
+        "steel": 0.5,
+        "fairy": 0.5,
+    },
+    "rock": {
+        "fire": 2.0,
+        "ice": 2.0,
+        "fighting": 0.5,
+        "ground": 0.5,
+        "flying": 2.0,
+        "bug": 2.0,
+        "steel": 0.5,
+    },
+    "ghost": {"normal": 0.0, "psychic": 2.0, "ghost": 2.0, "dark": 0.5},
+    "dragon": {"dragon": 2.0, "steel": 0.5, "fairy": 0.0},
+    "dark": {"fighting": 0.5, "psychic": 2.0, "ghost": 2.0, "dark": 0.5, "fairy": 0.5},
+    "steel": {
+        "fire": 0.5,
+        "water": 0.5,
+        "electric": 0.5,
+        "ice": 2.0,
+        "rock": 2.0,
+        "steel": 0.5,
+        "fairy": 2.0,
+    },
+    "fairy": {
+        "fire": 0.5,
+        "fighting": 2.0,
+        "poison": 0.5,
+        "dragon": 2.0,
+        "dark": 2.0,
+        "steel": 0.5,
+    },
+}
+
+# --- 2. MOVES POOL (Auto-Assigned based on Type) ---
+MOVES_DB = {
+    "normal": [("Tackle", 40), ("Quick Attack", 40), ("Hyper Beam", 120), ("Rest", 0)],
+    "fire": [
+        ("Ember", 40),
+        ("Flamethrower", 90),
+        ("Fire Blast", 110),
+        ("Will-O-Wisp", 0),
+    ],
+    "water": [("Water Gun", 40), ("Surf", 90), ("Hydro Pump", 110), ("Rain Dance", 0)],
+    "grass": [
+        ("Vine Whip", 45),
+        ("Razor Leaf", 55),
+        ("Solar Beam", 120),
+        ("Synthesis", 0),
+    ],
+    "electric": [
+        ("Thundershock", 40),
+        ("Thunderbolt", 90),
+        ("Thunder", 110),
+        ("Thunder Wave", 0),
+    ],
+    "ice": [("Ice Shard", 40), ("Ice Beam", 90), ("Blizzard", 110), ("Hail", 0)],
+    "fighting": [
+        ("Karate Chop", 50),
+        ("Brick Break", 75),
+        ("Close Combat", 120),
+        ("Bulk Up", 0),
+    ],
+    "poison": [("Acid", 40), ("Sludge Bomb", 90), ("Gunk Shot", 120), ("Toxic", 0)],
+    "ground": [
+        ("Mud Shot", 55),
+        ("Earthquake", 100),
+        ("Fissure", 120),
+        ("Sandstorm", 0),
+    ],
+    "flying": [("Peck", 35), ("Aerial Ace", 60), ("Brave Bird", 120), ("Roost", 0)],
+    "psychic": [
+        ("Confusion", 50),
+        ("Psychic", 90),
+        ("Future Sight", 120),
+        ("Calm Mind", 0),
+    ],
+    "bug": [
+        ("Bug Bite", 60),
+        ("X-Scissor", 80),
+        ("Megahorn", 120),
+        ("Quiver Dance", 0),
+    ],
+    "rock": [
+        ("Rock Throw", 50),
+        ("Rock Slide", 75),
+        ("Stone Edge", 100),
+        ("Polish", 0),
+    ],
+    "ghost": [
+        ("Lick", 30),
+        ("Shadow Ball", 80),
+        ("Poltergeist", 110),
+        ("Confuse Ray", 0),
+    ],
+    "dragon": [
+        ("Twister", 40),
+        ("Dragon Claw", 80),
+        ("Outrage", 120),
+        ("Dragon Dance", 0),
+    ],
+    "dark": [("Bite", 60), ("Crunch", 80), ("Dark Pulse", 80), ("Nasty Plot", 0)],
+    "steel": [
+        ("Metal Claw", 50),
+        ("Iron Head", 80),
+        ("Flash Cannon", 80),
+        ("Iron Defense", 0),
+    ],
+    "fairy": [
+        ("Fairy Wind", 40),
+        ("Moonblast", 95),
+        ("Play Rough", 90),
+        ("Moonlight", 0),
+    ],
+}
+
+# --- 3. DENSE TABLES ---
+TYPE_INDEX = {p_type: i for i, p_type in enumerate(TYPES)}
+NORMAL = TYPE_INDEX["normal"]
+
+# EFFECTIVENESS[attacking type, defending type]
+EFFECTIVENESS = np.ones((len(TYPES), len(TYPES)), dtype=np.float32)
+for _attacker, _row in TYPE_CHART.items():
+    for _defender, _multiplier in _row.items():
+        EFFECTIVENESS[TYPE_INDEX[_attacker], TYPE_INDEX[_defender]] = _multiplier
+
+# Every move once, in MOVES_DB order; a move's type is the pool it is listed in
+MOVE_NAMES = []
+MOVE_INDEX = {}  # move name -> index into the arrays below
+_powers, _types = [], []
+for _p_type, _moves in MOVES_DB.items():
+    for _name, _power in _moves:
+        if _name not in MOVE_INDEX:
+            MOVE_INDEX[_name] = len(MOVE_NAMES)
+            MOVE_NAMES.append(_name)
+            _powers.append(_power)
+            _types.append(TYPE_INDEX[_p_type])
+MOVE_POWER = np.array(_powers, dtype=np.float32)
+MOVE_TYPE = np.array(_types, dtype=np.intp)
+
+LEVEL_FACTOR = 2 * 50 / 5 + 2  # Everyone battles at level 50
+
+
+def type_ids(types) -> tuple:
+    """'fire' or ['fire', 'flying'] -> (1, 9). Unknown names count as normal."""
+    if isinstance(types, str):
+        types = (types,)
+    return tuple(TYPE_INDEX.get(p_type, NORMAL) for p_type in types) or (NORMAL,)
+
+
+@cache
+def defender_multipliers(defender: tuple) -> np.ndarray:
+    """Multiplier of every attacking type against a (dual-type) defender."""
+    return EFFECTIVENESS[:, defender].prod(axis=1)
+
+
+def deck_of(p_type: str) -> np.ndarray:
+    """Move indices of a type's deck: 2 type moves, Tackle, 1 heal/status."""
+    moves = MOVES_DB.get(p_type, MOVES_DB["normal"])
+    deck = [moves[0], moves[1], MOVES_DB["normal"][0], moves[3]]
+    return np.array([MOVE_INDEX[name] for name, _ in deck], dtype=np.intp)
+
+
+def deck_damage(deck, attacker, defender, attack, defense, ability=None):
+    """Damage and type multiplier of every move in `deck`, in one lookup.
+
+    `attacker`/`defender` are type_ids() tuples. The attacker's primary
+    type sets the effectiveness of every move, and only moves from that
+    type's pool get STAB. Status moves deal 0.
+    """
+    primary = attacker[0]
+    power = MOVE_POWER[deck]
+    multiplier = np.full(len(deck), defender_multipliers(defender)[primary])
+    damage = (LEVEL_FACTOR * power * (attack / defense)) / 50 + 2
+    damage *= np.where(MOVE_TYPE[deck] == primary, 1.5, 1.0) * multiplier
+    if ability == "huge-power":
+        damage *= 2
+    damage[power == 0] = 0
+    return damage.astype(np.int64), multiplier